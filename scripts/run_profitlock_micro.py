@@ -24,11 +24,15 @@ def fetch_df(symbol, interval, limit):
     return df
 
 # ---------- load last sweep winner ----------
-paths=sorted(glob.glob("data/backtests/regime_switch_v2_sweep_*.csv"))
-assert paths, "No regime_switch_v2_sweep CSVs found."
-best=(pd.read_csv(paths[-1])
-        .sort_values(["equity_multiple","win_rate_pct","trades"], ascending=[False,False,False])
-        .iloc[0].to_dict())
+from src import results_db
+best=results_db.best("regime_switch_v2_sweep", metric=["equity_multiple","win_rate_pct","trades"], latest=True)
+if best is None:
+    # results DB not populated yet: fall back to the newest CSV
+    paths=sorted(glob.glob("data/backtests/regime_switch_v2_sweep_*.csv"))
+    assert paths, "No regime_switch_v2_sweep results found (python -m src.results_db import)."
+    best=(pd.read_csv(paths[-1])
+            .sort_values(["equity_multiple","win_rate_pct","trades"], ascending=[False,False,False])
+            .iloc[0].to_dict())
 
 SYM="SOLUSDT"
 d15=fetch_df(SYM,"15m",5000)
@@ -132,3 +136,4 @@ print(df.head(15).to_string(index=False))
 out=Path("data/backtests")/("regime_v2_profitlock_"+time.strftime("%Y%m%d_%H%M%S")+".csv")
 df.to_csv(out, index=False)
 print("WROTE:", str(out))
+results_db.record(rows, "regime_v2_profitlock", "SOLUSDT_15m", name=out.stem, source=out)
@@ -3,6 +3,10 @@ import os, json, requests
 import pandas as pd
 import numpy as np
 from typing import List, Dict, Any
+try:
+    from src import profiling as prof
+except ModuleNotFoundError:   # run as a script (python3 src/backtest_hybrid.py, e.g. sweep_4h_fast)
+    import profiling as prof
 
 SYMBOL = os.getenv("BB_SYMBOL", "SOLUSDT").upper()
 INTERVAL = os.getenv("BB_INTERVAL", os.getenv("HY_INTERVAL", "15m"))
@@ -33,9 +37,12 @@ REQUIRE_TREND = int(float(os.getenv("REQUIRE_TREND", "1")))  # 1=enforce, 0=igno
 
 SESSION = requests.Session()
 
-def fetch_klines(symbol: str, interval: str, limit: int) -> pd.DataFrame:
+@prof.timed("load.fetch_klines")
+def fetch_klines(symbol: str, interval: str, limit: int, start_ms: int | None = None) -> pd.DataFrame:
     url = "https://api.binance.com/api/v3/klines"
     params = {"symbol": symbol, "interval": interval, "limit": limit}
+    if start_ms is not None:
+        params["startTime"] = int(start_ms)
     r = SESSION.get(url, params=params, timeout=15)
     r.raise_for_status()
     data = r.json()
@@ -48,9 +55,11 @@ def fetch_klines(symbol: str, interval: str, limit: int) -> pd.DataFrame:
     df["close_time"] = pd.to_datetime(df["close_time"], unit="ms")
     return df[["open_time","open","high","low","close","volume","close_time"]].reset_index(drop=True)
 
+@prof.timed("ind.ema")
 def ema(s: pd.Series, n: int) -> pd.Series:
     return s.ewm(span=n, adjust=False).mean()
 
+@prof.timed("ind.rsi")
 def rsi(series: pd.Series, n: int) -> pd.Series:
     delta = series.diff()
     gain = (delta.where(delta > 0, 0.0)).ewm(alpha=1/n, adjust=False).mean()
@@ -59,6 +68,7 @@ def rsi(series: pd.Series, n: int) -> pd.Series:
     out = 100 - (100 / (1 + rs))
     return out.fillna(50.0)
 
+@prof.timed("ind.atr")
 def atr(high: pd.Series, low: pd.Series, close: pd.Series, n: int) -> pd.Series:
     prev_close = close.shift(1)
     tr = pd.concat([
@@ -68,6 +78,7 @@ def atr(high: pd.Series, low: pd.Series, close: pd.Series, n: int) -> pd.Series:
     ], axis=1).max(axis=1)
     return tr.ewm(span=n, adjust=False).mean()
 
+@prof.timed("ind.bollinger")
 def bollinger(close: pd.Series, period: int, k: float):
     mid = close.rolling(period).mean()
     std = close.rolling(period).std(ddof=0)
@@ -87,7 +98,9 @@ def max_drawdown(equity_curve: List[float]) -> float:
     return max_dd
 
 def run_backtest() -> Dict[str, Any]:
+    lap = prof.laps("run_backtest.")
     df = fetch_klines(SYMBOL, INTERVAL, LIMIT)
+    lap("load")
     close = df["close"]; high = df["high"]; low = df["low"]; vol = df["volume"]
 
     mid, upper, lower = bollinger(close, BB_PERIOD, BB_K)
@@ -100,6 +113,7 @@ def run_backtest() -> Dict[str, Any]:
     df["bb_mid"] = mid; df["bb_up"] = upper; df["bb_lo"] = lower
     df["rsi"] = r; df["atr"] = a
     df["ema_trend"] = ema_trend; df["vol_ma"] = vol_ma
+    lap("indicators")
 
     start = max(BB_PERIOD, RSI_PERIOD, ATR_PERIOD, EMA_TREND_N, VOL_MA_N) + 2
     in_pos = False
@@ -129,6 +143,7 @@ def run_backtest() -> Dict[str, Any]:
                     trend_gate = (c > ema_now) and (ema_now > ema_prev)
                 if entry_cross and rsi_gate and vol_gate and trend_gate:
                     in_pos = True
+                    entry_px = c
                     entry_price = c * (1.0 + COST_BPS_PER_SIDE)
                     entry_idx = i
                     stop_lvl = c - ATR_STOP_MULT * a_now
@@ -147,7 +162,8 @@ def run_backtest() -> Dict[str, Any]:
             if should_exit:
                 exit_price = c * (1.0 - COST_BPS_PER_SIDE)
                 ret = (exit_price - entry_price) / entry_price
-                trades.append({"entry_i": int(entry_idx), "exit_i": int(i), "ret": float(ret), "reason": exit_reason})
+                trades.append({"entry_i": int(entry_idx), "exit_i": int(i), "ret": float(ret), "reason": exit_reason,
+                               "entry_px": float(entry_px), "exit_px": float(c)})
                 equity *= (1.0 + ret); eq_curve.append(equity)
                 in_pos = False; entry_price = entry_idx = stop_lvl = tp_lvl = None
                 cooldown = COOLDOWN_BARS
@@ -155,6 +171,8 @@ def run_backtest() -> Dict[str, Any]:
         if not trades or (trades and trades[-1]["exit_i"] != i):
             eq_curve.append(equity)
 
+    lap("simulate")
+    prof.count("bars", len(df) - start); prof.count("trades", len(trades))
     open_ret = None
     if in_pos and entry_price is not None:
         last_c = close.iloc[-1] * (1.0 - COST_BPS_PER_SIDE)
@@ -181,7 +199,8 @@ def run_backtest() -> Dict[str, Any]:
         "equity_multiple": round(float(eq_curve[-1]), 6) if eq_curve else 1.0,
         "max_drawdown_pct": round(100.0 * mdd, 2),
         "open_position_ret_pct": round(100.0 * open_ret, 4) if open_ret is not None else None,
-        "note": "LIMIT clamped to 1000 on Binance public API" if REQ_LIMIT > 1000 else ""
+        "note": "LIMIT clamped to 1000 on Binance public API" if REQ_LIMIT > 1000 else "",
+        "trade_list": trades,
     }
 
 
@@ -272,6 +291,98 @@ def run_backtest_ema():
         "avg_trade_ret_pct": round(100.0 * (np.mean([t["ret"] for t in trades]) if trades else 0.0), 4),
     }
 # === /EMA CROSS STRAT ===
+
+# === BB/ATR FIRST-TOUCH EXITS ===
+def bb_atr_signals(df):
+    """
+    Vectorized run_backtest rules: (entry_ok, exit_sig, rsi, atr) Series.
+    exit_sig covers the close-based exits only (RSI / upper-band cross-down).
+    """
+    close = df["close"].astype(float); high = df["high"].astype(float)
+    low = df["low"].astype(float); vol = df["volume"].astype(float)
+    mid, upper, lower = bollinger(close, BB_PERIOD, BB_K)
+    r = rsi(close, RSI_PERIOD)
+    a = atr(high, low, close, ATR_PERIOD)
+    ema_trend = ema(close, EMA_TREND_N)
+    vol_ma = vol.rolling(VOL_MA_N).mean()
+
+    start = max(BB_PERIOD, RSI_PERIOD, ATR_PERIOD, EMA_TREND_N, VOL_MA_N) + 2
+    c_prev = close.shift(1)
+    entry_ok = (c_prev < lower.shift(1)) & (close > lower) & (r <= RSI_BUY_MAX) & (vol > vol_ma * VOL_MULT)
+    if REQUIRE_TREND:
+        entry_ok &= (close > ema_trend) & (ema_trend > ema_trend.shift(1))
+    entry_ok.iloc[:start] = False
+    exit_sig = (r >= RSI_SELL_MIN) | ((c_prev > upper.shift(1)) & (close < upper))
+    return entry_ok, exit_sig, r, a
+
+def run_backtest_touch(data=None):
+    """
+    Same entries as run_backtest, but ATR stop/TP exits fill on the first bar whose
+    low/high touches the level (src.fills.first_touch) instead of the close.
+    RSI / upper-band exits stay close-based. Exits for every candidate entry are
+    resolved in one vectorized pass; only the trade chain is walked in Python.
+    TOUCH_REFINE_1M=1 settles bars that hit both levels using the 1m OHLCV store.
+    """
+    from src import fills
+    df = fetch_klines(SYMBOL, INTERVAL, LIMIT) if data is None else data
+    close = df["close"].astype(float); high = df["high"].astype(float)
+    low = df["low"].astype(float)
+    open_ = df["open"].astype(float) if "open" in df else close
+
+    entry_ok, exit_sig, r, a = bb_atr_signals(df)
+
+    cand = np.flatnonzero(entry_ok.to_numpy())
+    c_np, a_np = close.to_numpy(), a.to_numpy()
+    stop = c_np[cand] - ATR_STOP_MULT * a_np[cand]
+    tp = c_np[cand] + ATR_TP_MULT * a_np[cand]
+    ex, reason, amb = fills.first_touch(high.to_numpy(), low.to_numpy(), cand, stop, tp,
+                                        exit_mask=exit_sig.to_numpy())
+    if int(os.getenv("TOUCH_REFINE_1M", "0")) and amb.any() and "open_time" in df:
+        from src import ohlcv_store
+        if ohlcv_store.exists(SYMBOL, "1m"):
+            t_ms = df["open_time"].to_numpy().astype("datetime64[ms]").astype("int64")
+            fills.refine_with_1m(t_ms, ohlcv_store.INTERVAL_MS[INTERVAL], ex, reason, amb,
+                                 stop, tp, ohlcv_store.columns(SYMBOL, "1m"))
+    px = fills.fill_prices(open_.to_numpy(), c_np, ex, reason, stop, tp)
+
+    # walk the chain: next entry must come after the previous exit + cooldown
+    trades = []; eq_curve = [1.0]; open_ret = None
+    k = 0
+    while k < len(cand):
+        entry_price = c_np[cand[k]] * (1.0 + COST_BPS_PER_SIDE)
+        if ex[k] < 0:
+            open_ret = (c_np[-1] * (1.0 - COST_BPS_PER_SIDE) - entry_price) / entry_price
+            break
+        exit_price = px[k] * (1.0 - COST_BPS_PER_SIDE)
+        ret = (exit_price - entry_price) / entry_price
+        why = fills.REASONS[int(reason[k])]
+        if reason[k] == fills.SIGNAL:
+            why = "RSI_EXIT" if r.iat[ex[k]] >= RSI_SELL_MIN else "BB_UP_CROSSDOWN"
+        trades.append({"entry_i": int(cand[k]), "exit_i": int(ex[k]), "ret": float(ret),
+                       "reason": why, "ambiguous": bool(amb[k]),
+                       "entry_px": float(c_np[cand[k]]), "exit_px": float(px[k])})
+        eq_curve.append(eq_curve[-1] * (1.0 + ret))
+        k = int(np.searchsorted(cand, ex[k] + COOLDOWN_BARS + 1, side="left"))
+
+    wins = sum(1 for t in trades if t["ret"] > 0)
+    avg_ret = float(np.mean([t["ret"] for t in trades])) if trades else 0.0
+    return {
+        "symbol": SYMBOL, "interval": INTERVAL,
+        "bb_period": BB_PERIOD, "bb_k": BB_K,
+        "atr_stop_mult": ATR_STOP_MULT, "atr_tp_mult": ATR_TP_MULT,
+        "fee_bps_per_side": FEE_BPS, "slip_bps_per_side": SLIP_BPS,
+        "bars": int(len(df)), "trades": int(len(trades)),
+        "wins": int(wins), "losses": int(len(trades) - wins),
+        "win_rate_pct": round(100.0 * wins / max(1, len(trades)), 2),
+        "avg_trade_ret_pct": round(100.0 * avg_ret, 4),
+        "equity_multiple": round(float(eq_curve[-1]), 6),
+        "max_drawdown_pct": round(100.0 * float(max_drawdown(eq_curve)), 2),
+        "open_position_ret_pct": round(100.0 * open_ret, 4) if open_ret is not None else None,
+        "ambiguous_exits": int(sum(t["ambiguous"] for t in trades)),
+        "exit_model": "first_touch",
+        "trade_list": trades,
+    }
+# === /BB/ATR FIRST-TOUCH EXITS ===
 # === AUTO-MAIN PATCH (do not edit) ===
 def _auto_find_entry():
     import inspect
@@ -330,11 +441,13 @@ if __name__ == "__main__":
     data = None
     df = os.getenv("DATA_FILE")
     if df and Path(df).exists():
-        data = json.loads(Path(df).read_text(encoding="utf-8", errors="ignore"))
+        with prof.stage("load.json"):
+            data = json.loads(Path(df).read_text(encoding="utf-8", errors="ignore"))
     if data is None:
         cached = Path(f"data/{SYMBOL}_{INTERVAL}_{LIMIT}.json")
         if cached.exists():
-            data = json.loads(cached.read_text(encoding="utf-8", errors="ignore"))
+            with prof.stage("load.json"):
+                data = json.loads(cached.read_text(encoding="utf-8", errors="ignore"))
     if data is None:
         if _orig_fetch_klines is None:
             print(json.dumps({"error":"no data and fetch_klines unavailable"}))
@@ -363,7 +476,8 @@ if __name__ == "__main__":
     if ac == 0:
         import sys as _sys
         import types as _types
-        normed_df = _to_dataframe(data)
+        with prof.stage("load.to_frame"):
+            normed_df = _to_dataframe(data)
 
         def _patched_fetch(*_a, **_k):
             return normed_df
@@ -375,7 +489,8 @@ if __name__ == "__main__":
             globals()['_orig_fetch_klines'] = _patched_fetch
 
     try:
-        res = fn(_to_dataframe(data)) if ac == 1 else fn()
+        with prof.stage("run." + name):
+            res = fn(_to_dataframe(data)) if ac == 1 else fn()
     except Exception as e:
         print(json.dumps({"error":"entry function raised", "func":name, "type":type(e).__name__, "msg":str(e)}))
         raise
@@ -390,6 +505,11 @@ if __name__ == "__main__":
         ]) or res)
     else:
         out["result"] = str(res)
+    if os.getenv("BT_TRADES") == "1" and isinstance(res, dict):
+        # per-trade returns, for src.robustness on sweep winners
+        out["trade_list"] = [{"ret": t["ret"]} for t in res.get("trade_list") or []]
+    if prof.ENABLED:
+        out["profile"] = prof.snapshot()
     print(json.dumps(out, separators=(",",":")))
 # === AUTO-MAIN PATCH (do not edit) ===
 
@@ -579,14 +699,16 @@ def run_bb_tv(data=None):
         if not pos:
             # cross UNDER lower band -> buy at next bar open proxy (use next close for simplicity)
             if c_prev >= lo_prev and c_now < lo_now and not math.isnan(lo_now):
-                entry = float(close.iloc[i+1]) * (1.0 + COST_PER_SIDE)
+                entry_px = float(close.iloc[i+1])
+                entry = entry_px * (1.0 + COST_PER_SIDE)
                 pos = True
         else:
             # cross ABOVE middle band -> exit at next bar
             if c_prev <= mid_prev and c_now > mid_now and not math.isnan(mid_now):
                 exit_price = float(close.iloc[i+1]) * (1.0 - COST_PER_SIDE)
                 ret = (exit_price - entry) / entry
-                trades.append({"i":i, "ret":float(ret)})
+                trades.append({"i":i, "ret":float(ret),
+                               "entry_px":entry_px, "exit_px":float(close.iloc[i+1])})
                 eq *= (1.0 + ret)
                 eq_curve.append(eq)
                 pos = False
@@ -594,7 +716,9 @@ def run_bb_tv(data=None):
 
     # if still open, mark-to-market
     open_ret = None
+    open_trade = None
     if pos and entry is not None:
+        open_trade = {"entry_px": entry_px, "exit_px": float(close.iloc[-1])}
         last = float(close.iloc[-1]) * (1.0 - COST_PER_SIDE)
         open_ret = (last - entry) / entry
         eq *= (1.0 + open_ret)
@@ -625,6 +749,8 @@ def run_bb_tv(data=None):
         "equity_multiple": round(float(eq_curve[-1]) if eq_curve else 1.0, 6),
         "max_drawdown_pct": round(100.0*mdd, 2),
         "open_position_ret_pct": round(100.0*open_ret, 4) if open_ret is not None else None,
-        "note": "TV-style BB mean reversion"
+        "note": "TV-style BB mean reversion",
+        "trade_list": trades,
+        "open_trade": open_trade,  # marked to market in equity_multiple
     }
 
@@ -0,0 +1,58 @@
+from __future__ import annotations
+import os, time, asyncio
+
+from src.ohlcv_store import INTERVAL_MS
+
+# Wall-clock scheduling on bar boundaries. Exchange bars open at multiples of the
+# interval since the epoch (UTC), so the next close is pure arithmetic: no polling.
+# Wake LAG_MS after the boundary (Binance needs a moment to serve the closed bar),
+# evaluate once, and sleep until the next boundary. If the closed bar is not served
+# yet, retry every RETRY_MS up to RETRIES times; BarGate drops repeats of a bar that
+# was already evaluated.
+LAG_MS   = int(os.getenv("BAR_CLOCK_LAG_MS", "1500"))
+RETRY_MS = int(os.getenv("BAR_CLOCK_RETRY_MS", "1000"))
+RETRIES  = int(os.getenv("BAR_CLOCK_RETRIES", "5"))
+
+def step_ms(interval: str) -> int:
+    try:
+        return INTERVAL_MS[interval]
+    except KeyError:
+        raise ValueError(f"unknown interval {interval!r}; expected one of {', '.join(INTERVAL_MS)}") from None
+
+def now_ms() -> int:
+    return time.time_ns() // 1_000_000
+
+def last_boundary_ms(now: int, step: int) -> int:
+    """Open time of the bar forming at `now` (= close of the last closed bar + 1ms)."""
+    return now - now % step
+
+def next_boundary_ms(now: int, step: int) -> int:
+    return last_boundary_ms(now, step) + step
+
+def wait_ms(step: int, lag_ms: int = LAG_MS, now: int | None = None) -> int:
+    """Milliseconds until the next boundary + lag (0 < result <= step)."""
+    now = now_ms() if now is None else now
+    due = last_boundary_ms(now - lag_ms, step) + step + lag_ms
+    return due - now
+
+def sleep_to_next(step: int, lag_ms: int = LAG_MS) -> int:
+    """Block until the next boundary + lag; returns that boundary (epoch ms)."""
+    w = wait_ms(step, lag_ms)
+    time.sleep(w / 1000.0)
+    return last_boundary_ms(now_ms() - lag_ms, step)
+
+async def async_sleep_to_next(step: int, lag_ms: int = LAG_MS) -> int:
+    w = wait_ms(step, lag_ms)
+    await asyncio.sleep(w / 1000.0)
+    return last_boundary_ms(now_ms() - lag_ms, step)
+
+class BarGate:
+    """Lets each closed bar through once (keyed by its close time, any comparable)."""
+    def __init__(self):
+        self.last = None
+
+    def fresh(self, bar_close) -> bool:
+        if bar_close is None or (self.last is not None and bar_close <= self.last):
+            return False
+        self.last = bar_close
+        return True
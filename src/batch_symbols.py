@@ -0,0 +1,113 @@
+from __future__ import annotations
+import os, sys, json, time, argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+
+from src import backtest_hybrid as bh, ohlcv_store
+
+ROOT = Path(__file__).resolve().parents[1]
+TOKENS = ROOT / "config" / "tokens.json"
+OUT_DIR = ROOT / "data" / "backtests"
+
+# Screen one strategy across many symbols/intervals. Each (symbol, interval) is a
+# task in a process pool; workers read bars straight from the memory-mapped OHLCV
+# store (python -m src.ohlcv_store import SYMBOL INTERVAL FILE), so nothing is
+# fetched and no frame is pickled between processes. Strategy parameters come
+# from the usual env vars (BB_PERIOD, ATR_STOP_MULT, KC_N, ...), same for every pair.
+QUOTE   = os.getenv("BATCH_QUOTE", "USDT")
+STABLES = {"USDC", "USDT", "BUSD", "DAI", "FDUSD", "TUSD"}
+WORKERS = int(os.getenv("BATCH_WORKERS", str(os.cpu_count() or 2)))
+
+# per-trade detail isn't part of the comparison table
+DROP = ("trade_list", "open_trade", "exit_reasons", "note")
+
+def _bb_atr(sym, itv, bars):
+    from src import stream_backtest
+    if bars:
+        return stream_backtest.run(sym, itv, chunks=[ohlcv_store.load(sym, itv).tail(bars).reset_index(drop=True)])
+    return stream_backtest.run(sym, itv)
+
+def _frame(sym, itv, bars):
+    df = ohlcv_store.load(sym, itv)
+    return df.tail(bars).reset_index(drop=True) if bars else df
+
+# name -> runner(symbol, interval, bars) -> backtest_hybrid-style result dict
+STRATEGIES = {
+    "bb_atr":       _bb_atr,  # run_backtest rules, streamed from the store
+    "bb_atr_touch": lambda s, i, n: bh.run_backtest_touch(_frame(s, i, n)),
+    "kc_atr":       lambda s, i, n: bh.run_kc_atr(_frame(s, i, n)),
+    "bb_tv":        lambda s, i, n: bh.run_bb_tv(_frame(s, i, n)),
+}
+
+def registry_symbols(path: Path = TOKENS, quote: str = QUOTE) -> list[str]:
+    """Exchange pairs for every non-stable token in config/tokens.json (SOL -> SOLUSDT)."""
+    tokens = json.loads(Path(path).read_text(encoding="utf-8"))
+    return [f"{t.upper()}{quote}" for t in tokens if t.upper() not in STABLES]
+
+def _task(args) -> dict:
+    strategy, sym, itv, bars = args
+    t0 = time.perf_counter()
+    row = {"symbol": sym, "interval": itv}
+    if not ohlcv_store.exists(sym, itv):
+        row["error"] = "no_store"
+        return row
+    try:
+        res = STRATEGIES[strategy](sym, itv, bars)
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+        return row
+    row.update({k: v for k, v in res.items() if k not in DROP and k not in ("symbol", "interval")})
+    row["wall_s"] = round(time.perf_counter() - t0, 3)
+    return row
+
+def run(strategy: str, symbols: list[str], intervals: list[str], bars: int = 0,
+        workers: int = WORKERS) -> pd.DataFrame:
+    """One row per (symbol, interval), best equity multiple first; failures keep an `error`."""
+    tasks = [(strategy, s.upper(), i, bars) for s in symbols for i in intervals]
+    if workers <= 1 or len(tasks) == 1:
+        rows = [_task(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(min(workers, len(tasks))) as ex:
+            rows = list(ex.map(_task, tasks))
+    df = pd.DataFrame(rows)
+    if "equity_multiple" in df:
+        df = df.sort_values("equity_multiple", ascending=False, na_position="last")
+    return df.reset_index(drop=True)
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(prog="python -m src.batch_symbols",
+                                 description="Run one strategy across many symbols from the OHLCV store")
+    ap.add_argument("strategy", choices=sorted(STRATEGIES))
+    ap.add_argument("symbols", nargs="*", help=f"pairs (default: {TOKENS.relative_to(ROOT)} tokens + {QUOTE})")
+    ap.add_argument("--intervals", default=bh.INTERVAL, help="comma list, e.g. 15m,1h,4h")
+    ap.add_argument("--bars", type=int, default=0, help="only the last N bars of each series")
+    ap.add_argument("--workers", type=int, default=WORKERS)
+    ap.add_argument("--no-db", action="store_true", help="don't record into the results DB")
+    args = ap.parse_args(argv)
+
+    symbols = args.symbols or registry_symbols()
+    intervals = [i for i in args.intervals.split(",") if i]
+    t0 = time.time()
+    table = run(args.strategy, symbols, intervals, args.bars, args.workers)
+    print(f"{args.strategy}: {len(table)} series in {time.time() - t0:.1f}s")
+    cols = [c for c in ("symbol", "interval", "bars", "trades", "win_rate_pct", "equity_multiple",
+                        "max_drawdown_pct", "avg_trade_ret_pct", "wall_s", "error") if c in table]
+    print(table[cols].to_string(index=False))
+
+    stamp = time.strftime("%Y%m%d_%H%M%S")
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    out = OUT_DIR / f"batch_{args.strategy}_{stamp}.csv"
+    table.to_csv(out, index=False)
+    print(f"WROTE: {out}")
+
+    if not args.no_db and "equity_multiple" in table:
+        from src import results_db
+        ok = table[table["equity_multiple"].notna()]
+        for (sym, itv), g in ok.groupby(["symbol", "interval"], sort=False):
+            results_db.record(g.drop(columns=["symbol", "interval"]).to_dict("records"), args.strategy,
+                              f"{sym}_{itv}", name=out.stem, source=f"{results_db._source(out)}#{sym}_{itv}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,216 @@
+from __future__ import annotations
+import os, sys, json, time, sqlite3, argparse, subprocess, tempfile, resource
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+DB_PATH = ROOT / "data" / "bench.sqlite"
+
+# Every (engine, size) runs in its own child process, so peak RSS (ru_maxrss) belongs
+# to that run alone. Children run in a temp cwd because some engines write report
+# files relative to it (backtest_eclectic -> data/backtests/eclectic_*).
+SIZES = {"5k": 5_000, "100k": 100_000, "1m": 1_000_000}
+SEED = 42
+THRESHOLD = float(os.getenv("BENCH_THRESHOLD", "0.25"))         # allowed slowdown vs baseline
+RSS_THRESHOLD = float(os.getenv("BENCH_RSS_THRESHOLD", "0.25"))  # allowed peak-RSS growth
+BASELINE_RUNS = 5  # baseline = median of the last N saved runs per (engine, bars)
+MIN_DELTA_S = 0.05  # slowdowns smaller than this are timer noise on the 5k cases
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bench_runs (
+  ts INTEGER NOT NULL,        -- epoch ms
+  rev TEXT,                   -- git HEAD (short) at run time
+  engine TEXT NOT NULL,
+  bars INTEGER NOT NULL,
+  wall_s REAL NOT NULL,       -- best of --repeat
+  bars_per_s REAL NOT NULL,
+  peak_rss_mb REAL NOT NULL,
+  trades INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_bench_engine ON bench_runs(engine, bars, ts);
+"""
+
+def synth(n: int, seed: int = SEED) -> pd.DataFrame:
+    """Deterministic 15m GBM bars in fetch_klines shape (plus raw ms `time`)."""
+    rng = np.random.default_rng(seed)
+    c = 100.0 * np.exp(np.cumsum(rng.normal(0, 0.004, n)))
+    o = np.concatenate(([c[0]], c[:-1]))
+    wick = rng.uniform(0, 0.003, (2, n))
+    t = 1_577_836_800_000 + np.arange(n, dtype=np.int64) * 900_000
+    df = pd.DataFrame({
+        "open_time": pd.to_datetime(t, unit="ms"),
+        "open": o, "high": np.maximum(o, c) * (1 + wick[0]), "low": np.minimum(o, c) * (1 - wick[1]),
+        "close": c, "volume": rng.lognormal(3.0, 0.8, n),
+    })
+    df["close_time"] = df["open_time"] + pd.Timedelta(milliseconds=899_999)
+    df["time"] = t
+    return df
+
+# ---- engines: each takes the synthetic frame and returns a trade count (or None) ----
+def _hybrid(df):
+    from src import backtest_hybrid as bh
+    bh.fetch_klines = lambda *a, **k: df
+    return bh
+
+def eng_run_backtest(df):
+    return _hybrid(df).run_backtest()["trades"]
+
+def eng_run_backtest_touch(df):
+    return _hybrid(df).run_backtest_touch(df)["trades"]
+
+def eng_run_bb_tv(df):
+    return _hybrid(df).run_bb_tv(df).get("trades")
+
+def eng_run_kc_atr(df):
+    return _hybrid(df).run_kc_atr(df).get("trades")
+
+def eng_stream_backtest(df):
+    from src import stream_backtest
+    return stream_backtest.run(chunks=stream_backtest.frame_chunks(df, 250_000))["trades"]
+
+def eng_backtest_bb(df):
+    from src import backtest_bb
+    _report, trades = backtest_bb.backtest(df["time"].tolist(), df["close"].tolist())
+    return len(trades)
+
+def eng_backtest_eclectic(df):
+    from src import backtest_eclectic as be
+    rows = df[["open", "high", "low", "close", "volume"]].assign(open_time=df["time"]).to_dict("records")
+    be.fetch_klines = lambda *a, **k: rows
+    return be.run()["trades"]
+
+def eng_signals_15m(df):
+    from src.backtest_combo_mtf import add_indicators, signals_15m_with_filters
+    d = add_indicators(df)
+    out = signals_15m_with_filters(d, pd.Series(True, index=d.index))
+    return int((out["signal"] != "HOLD").sum())
+
+# name -> (fn, max bars by default); per-bar .iloc loops are capped so a default
+# run stays in minutes. --full lifts the caps.
+ENGINES = {
+    "run_backtest":       (eng_run_backtest, 100_000),
+    "run_backtest_touch": (eng_run_backtest_touch, None),
+    "run_bb_tv":          (eng_run_bb_tv, None),
+    "run_kc_atr":         (eng_run_kc_atr, None),
+    "stream_backtest":    (eng_stream_backtest, None),
+    "backtest_bb":        (eng_backtest_bb, None),
+    "backtest_eclectic":  (eng_backtest_eclectic, 100_000),
+    "signals_15m":        (eng_signals_15m, 100_000),
+}
+
+def _child(engine: str, bars: int, repeat: int) -> dict:
+    df = synth(bars)
+    fn = ENGINES[engine][0]
+    best, trades = float("inf"), None
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        trades = fn(df)
+        best = min(best, time.perf_counter() - t0)
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KB on Linux
+    return {"engine": engine, "bars": bars, "wall_s": best, "bars_per_s": bars / best if best else 0.0,
+            "peak_rss_mb": rss_kb / 1024.0, "trades": None if trades is None else int(trades)}
+
+def measure(engine: str, bars: int, repeat: int = 1, timeout: int = 1800) -> dict:
+    env = dict(os.environ, PYTHONPATH=str(ROOT), PYTHONWARNINGS="ignore")
+    with tempfile.TemporaryDirectory() as cwd:
+        proc = subprocess.run([sys.executable, "-m", "src.bench", "_child", engine, str(bars), str(repeat)],
+                              cwd=cwd, env=env, capture_output=True, text=True, timeout=timeout)
+    if proc.returncode != 0:
+        return {"engine": engine, "bars": bars, "error": (proc.stderr.strip().splitlines() or ["?"])[-1]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+# ---- history ----
+def connect(path: Path | None = None) -> sqlite3.Connection:
+    path = path or DB_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(path)
+    con.executescript(SCHEMA)
+    return con
+
+def _rev() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+def baseline(con: sqlite3.Connection, engine: str, bars: int):
+    """(median wall_s, median peak_rss_mb) of the last BASELINE_RUNS saved runs, or None."""
+    rows = con.execute("SELECT wall_s, peak_rss_mb FROM bench_runs WHERE engine=? AND bars=? "
+                       "ORDER BY ts DESC LIMIT ?", (engine, bars, BASELINE_RUNS)).fetchall()
+    if not rows:
+        return None
+    a = np.array(rows, dtype=float)
+    return float(np.median(a[:, 0])), float(np.median(a[:, 1]))
+
+def main(argv: list[str]) -> int:
+    if argv and argv[0] == "_child":
+        print(json.dumps(_child(argv[1], int(argv[2]), int(argv[3]))))
+        return 0
+
+    ap = argparse.ArgumentParser(prog="python -m src.bench", description="Backtest engine benchmarks")
+    ap.add_argument("--engines", default=",".join(ENGINES), help="comma list (default: all)")
+    ap.add_argument("--sizes", default=",".join(SIZES), help="comma list of " + "/".join(SIZES))
+    ap.add_argument("--repeat", type=int, default=3, help="runs per case; best time is kept")
+    ap.add_argument("--threshold", type=float, default=THRESHOLD, help="max slowdown vs baseline (0.25 = +25%%)")
+    ap.add_argument("--rss-threshold", type=float, default=RSS_THRESHOLD, help="max peak-RSS growth vs baseline")
+    ap.add_argument("--full", action="store_true", help="ignore per-engine bar caps")
+    ap.add_argument("--no-save", action="store_true", help="compare only; don't append to history")
+    ap.add_argument("--accept", action="store_true",
+                    help="save regressed cases too (make their numbers part of the new baseline)")
+    args = ap.parse_args(argv)
+
+    engines = [e for e in args.engines.split(",") if e]
+    unknown = [e for e in engines if e not in ENGINES]
+    if unknown:
+        ap.error(f"unknown engine(s): {', '.join(unknown)}")
+    bad = [s for s in args.sizes.split(",") if s and s.lower() not in SIZES]
+    if bad:
+        ap.error(f"unknown size(s): {', '.join(bad)}")
+    sizes = [SIZES[s.lower()] for s in args.sizes.split(",") if s]
+
+    con = connect()
+    rev, ts = _rev(), int(time.time() * 1000)
+    failed = []
+    print(f"{'engine':<20}{'bars':>9}{'wall_s':>10}{'bars/s':>12}{'rss_mb':>9}{'trades':>8}  vs baseline")
+    try:
+        for eng in engines:
+            cap = ENGINES[eng][1]
+            for n in sizes:
+                if cap and n > cap and not args.full:
+                    print(f"{eng:<20}{n:>9}  skipped (cap {cap}; --full to run)")
+                    continue
+                r = measure(eng, n, args.repeat)
+                if "error" in r:
+                    print(f"{eng:<20}{n:>9}  ERROR {r['error']}")
+                    failed.append(f"{eng}@{n}: error")
+                    continue
+                note, regressed = "new", False
+                base = baseline(con, eng, n)
+                if base:
+                    dt = r["wall_s"] / base[0] - 1.0
+                    dm = r["peak_rss_mb"] / base[1] - 1.0
+                    note = f"time {dt:+.0%} rss {dm:+.0%}"
+                    if dt > args.threshold and r["wall_s"] - base[0] > MIN_DELTA_S:
+                        failed.append(f"{eng}@{n}: time {dt:+.0%}"); note += "  SLOWER"; regressed = True
+                    if dm > args.rss_threshold:
+                        failed.append(f"{eng}@{n}: rss {dm:+.0%}"); note += "  MORE MEMORY"; regressed = True
+                print(f"{eng:<20}{n:>9}{r['wall_s']:>10.3f}{r['bars_per_s']:>12,.0f}{r['peak_rss_mb']:>9.0f}"
+                      f"{(r['trades'] if r['trades'] is not None else '-'):>8}  {note}")
+                # a regressed run is not saved unless accepted, or a few reruns would
+                # drag the median baseline up to it and the gate would stop firing
+                if not args.no_save and (not regressed or args.accept):
+                    con.execute("INSERT INTO bench_runs VALUES (?,?,?,?,?,?,?,?)",
+                                (ts, rev, eng, n, r["wall_s"], r["bars_per_s"], r["peak_rss_mb"], r["trades"]))
+                    con.commit()
+    finally:
+        con.close()
+    if failed:
+        print("REGRESSIONS: " + "; ".join(failed)
+              + ("" if args.accept or args.no_save else " (not saved; --accept to rebaseline)"))
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
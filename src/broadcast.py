@@ -0,0 +1,143 @@
+from __future__ import annotations
+import os, time, threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable
+
+from src.rpc_pool import pool, RpcPool
+
+# Fan-out transaction sender. The signed transaction goes to every healthy endpoint
+# of the RPC pool: first to the best one with preflight, and only once that passes
+# (or fails for transport reasons) to the rest with skip_preflight, so a swap whose
+# simulation fails is never broadcast. It is then re-sent every
+# REBROADCAST_MS until getSignatureStatuses reports it confirmed, the block height
+# passes the blockhash's lastValidBlockHeight, or BROADCAST_TIMEOUT_S runs out.
+# Re-sending the same signed bytes is idempotent: one signature, one landing.
+# broadcast_async() returns after the first fan-out and leaves the rebroadcasts to a
+# thread that stops once the confirmation tracker has a final status.
+REBROADCAST_MS = int(os.getenv("REBROADCAST_MS", "2000"))
+TIMEOUT_S      = float(os.getenv("BROADCAST_TIMEOUT_S", "90"))
+FANOUT         = int(os.getenv("BROADCAST_FANOUT", "3"))      # endpoints per (re)send
+COMMITMENT     = os.getenv("BROADCAST_COMMITMENT", "confirmed")
+_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="broadcast")
+
+@dataclass
+class Landing:
+    sig: str
+    status: str                 # pending | confirmed | failed | expired | timeout | rejected
+    sends: int = 0
+    landed_ms: float | None = None   # first send -> status at COMMITMENT
+    slot: int | None = None
+    err: str | None = None
+
+    @property
+    def landed(self) -> bool:
+        return self.status == "confirmed"
+
+def signature_of(raw: bytes) -> str:
+    from solders.transaction import VersionedTransaction
+    return str(VersionedTransaction.from_bytes(raw).signatures[0])
+
+def _send(node, raw: bytes, preflight: bool) -> None:
+    from solana.rpc.types import TxOpts
+    t0 = time.perf_counter()
+    try:
+        node.client.send_raw_transaction(raw, opts=TxOpts(skip_preflight=not preflight,
+                                                          preflight_commitment="processed", max_retries=0))
+    except Exception:
+        node.failed()
+        raise
+    node.ok(1000.0 * (time.perf_counter() - t0))
+
+def _fan_out(rpc: RpcPool, raw: bytes, prefer: str | None) -> list:
+    """Rebroadcast: skip_preflight to the top FANOUT endpoints (the bytes already passed preflight)."""
+    return [_POOL.submit(_send, n, raw, False) for n in rpc.ranked(prefer)[:max(1, FANOUT)]]
+
+def _status(rpc: RpcPool, sig: str):
+    from solders.signature import Signature
+    return rpc.call(lambda c: c.get_signature_statuses([Signature.from_string(sig)]).value[0])
+
+def _transport_error(e: BaseException) -> bool:
+    """The endpoint could not be reached; anything else from a preflight send is the node's verdict."""
+    try:
+        import httpx
+        if isinstance(e, httpx.TransportError):
+            return True
+    except ImportError:
+        pass
+    return isinstance(e, (OSError, TimeoutError))
+
+def send_first(raw: bytes, prefer: str | None = None, rpc: RpcPool | None = None) -> Landing:
+    """First send, with preflight, to the best endpoint, then the skip_preflight fan-out.
+    Status "pending", or "rejected" if the simulation failed or every endpoint refused it."""
+    rpc = rpc or pool()
+    out = Landing(signature_of(raw), "pending")
+    nodes = rpc.ranked(prefer)[:max(1, FANOUT)]
+    try:
+        out.sends += 1
+        _send(nodes[0], raw, preflight=True)
+        first_err = None
+    except Exception as e:
+        if not _transport_error(e):
+            # never broadcast a swap that already failed simulation (slippage, funds, ...)
+            out.status, out.err = "rejected", repr(e)
+            return out
+        first_err = e
+    futs = [_POOL.submit(_send, n, raw, False) for n in nodes[1:]]
+    wait(futs)
+    out.sends += len(futs)
+    if first_err is not None and all(f.exception() is not None for f in futs):
+        out.status, out.err = "rejected", repr(first_err)
+    return out
+
+def broadcast(raw: bytes, last_valid_block_height: int | None = None,
+              prefer: str | None = None, rpc: RpcPool | None = None) -> Landing:
+    """Send `raw` to several endpoints and rebroadcast until it lands or expires (blocking)."""
+    rpc = rpc or pool()
+    t0 = time.perf_counter()
+    out = send_first(raw, prefer, rpc)
+    if out.status == "rejected":
+        return out
+    out.status = "timeout"
+    while time.perf_counter() - t0 < TIMEOUT_S:
+        time.sleep(REBROADCAST_MS / 1000.0)
+        try:
+            st = _status(rpc, out.sig)
+        except Exception:
+            st = None
+        if st is not None and st.confirmation_status is not None and \
+                str(st.confirmation_status).lower().split(".")[-1] in (COMMITMENT, "finalized"):
+            out.landed_ms = round(1000.0 * (time.perf_counter() - t0), 1)
+            out.slot = st.slot
+            out.status, out.err = ("failed", repr(st.err)) if st.err else ("confirmed", None)
+            return out
+        if st is None and last_valid_block_height is not None:   # not seen at all yet
+            try:
+                if rpc.call(lambda c: c.get_block_height().value) > last_valid_block_height:
+                    out.status = "expired"
+                    return out
+            except Exception:
+                pass
+        out.sends += len(_fan_out(rpc, raw, prefer))
+    return out
+
+def broadcast_async(raw: bytes, is_final: Callable[[str], bool], prefer: str | None = None,
+                    rpc: RpcPool | None = None) -> Landing:
+    """First fan-out now; then rebroadcast from a background thread until `is_final(sig)`
+    (src.confirm_tracker decides landed/failed/expired) or TIMEOUT_S."""
+    rpc = rpc or pool()
+    t0 = time.perf_counter()
+    out = send_first(raw, prefer, rpc)
+    if out.status == "rejected":
+        return out
+    def loop():
+        while time.perf_counter() - t0 < TIMEOUT_S:
+            time.sleep(REBROADCAST_MS / 1000.0)
+            if is_final(out.sig):
+                return
+            try:
+                out.sends += len(_fan_out(rpc, raw, prefer))
+            except Exception:
+                pass
+    threading.Thread(target=loop, name=f"rebroadcast-{out.sig[:8]}", daemon=True).start()
+    return out
@@ -1,5 +1,5 @@
 from __future__ import annotations
-import os, sys, json, subprocess, time
+import os, sys, json, time
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
@@ -11,6 +11,7 @@ from solana.rpc.api import Client
 from solana.rpc.types import TokenAccountOpts
 
 from src.jupiter_client import USDC_MINT, SOL_MINT
+from src.rpc_pool import pinned
 
 ROOT = Path(__file__).resolve().parents[1]
 
@@ -60,7 +61,7 @@ def get_usdc_per_sol() -> float | None:
 
 @dataclass
 class Cfg:
-    rpc: str
+    rpc: str | None                  # pinned endpoint; None follows the pool's ranking
     keypair_path: Path
     buy_usdc: float
     min_usdc_reserve: float
@@ -68,7 +69,7 @@ class Cfg:
 
 def load_cfg() -> Cfg:
     return Cfg(
-        rpc=os.environ.get("RPC_URL", "https://api.mainnet-beta.solana.com"),
+        rpc=pinned(),
         keypair_path=Path(os.environ["KEYPAIR_PATH"]),
         buy_usdc=float(os.environ.get("BUY_USDC", "1.00")),
         min_usdc_reserve=float(os.environ.get("MIN_USDC_RESERVE", "50.0")),
@@ -80,35 +81,10 @@ def load_owner_pubkey(p: Path) -> Pubkey:
     return Keypair.from_bytes(bytes(arr)).pubkey()
 
 def main():
-    cfg = load_cfg()
-    print(f"[buy_guard] cfg: BUY_USDC={cfg.buy_usdc:.2f}, RESERVE_USDC={cfg.min_usdc_reserve:.2f}, DRY_RUN={cfg.dry_run}")
-
-    client = Client(cfg.rpc)
-    owner  = load_owner_pubkey(cfg.keypair_path)
-    bal    = usdc_balance(client, owner)
-    print(f"[buy_guard] USDC balance={bal:.2f}")
-
-    if bal - cfg.min_usdc_reserve < cfg.buy_usdc:
-        need = cfg.buy_usdc + cfg.min_usdc_reserve
-        print(f"[buy_guard] SKIP: need >= {need:.2f} USDC (buy+reserve); have {bal:.2f}.")
-        return 2
-
-    px = get_usdc_per_sol()
-    if px:
-        est_sol = cfg.buy_usdc / px
-        print(f"[buy_guard] mark ~{px:.4f} USDC/SOL; est receive ~{est_sol:.8f} SOL for {cfg.buy_usdc:.2f} USDC")
-
-    # Call buy_live_once with TEST_SWAP_USDC set so it uses our amount
-    env = os.environ.copy()
-    env["TEST_SWAP_USDC"] = f"{cfg.buy_usdc:.2f}"
-    try:
-        print("[buy_guard] running buy_live_once…")
-        rc = subprocess.call([sys.executable, "-m", "src.buy_live_once"], cwd=str(ROOT), env=env)
-        print(f"[buy_guard] buy_live_once exit {rc}")
-        return rc
-    except Exception as e:
-        print(f"[buy_guard] crashed: {e}")
-        return 1
+    # in-process: guard + buy_live_once share one keypair/RPC client (src.execution)
+    from src.execution import pipeline
+    p = pipeline()
+    return p.settle(p.buy()).rc
 
 if __name__ == "__main__":
     sys.exit(main())
@@ -1,9 +1,10 @@
 import os
 from .wallet import load_env, load_keypair, client_for, sol_balance_lamports, usdc_balance_ui
+from .rpc_pool import endpoints
 
 def main():
     rpc, key_path = load_env()
-    print("RPC:", rpc)
+    print("RPC:", rpc or "best of " + ", ".join(endpoints()))
     print("KEYPAIR_PATH:", key_path)
     if not key_path or not os.path.isfile(key_path):
         print("ERROR: keypair file not found at:", key_path or "<unset>")
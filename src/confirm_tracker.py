@@ -0,0 +1,259 @@
+from __future__ import annotations
+import os, sys, time, sqlite3, threading, argparse
+from dataclasses import dataclass
+from pathlib import Path
+
+from src.rpc_pool import pool
+
+ROOT = Path(__file__).resolve().parents[1]
+DB_PATH = Path(os.environ.get("DB_PATH", str(ROOT / "data" / "trades.sqlite")))
+SOL_MINT  = os.environ.get("SOL_MINT",  "So11111111111111111111111111111111111111112")
+USDC_MINT = os.environ.get("USDC_MINT", "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v")
+
+# Trades are written at send time with status='pending' and watched once the row
+# exists (a status with no row to update stays pending). One background thread
+# batches getSignatureStatuses for every pending signature (up to 256 per call)
+# every CONFIRM_POLL_MS. When a status reaches CONFIRM_COMMITMENT it fetches the
+# transaction and finalizes the row: status confirmed/failed, slot, landing time, fee,
+# and the wallet's actual SOL/USDC deltas as in_amount/out_amount/price. Signatures
+# never seen once the block height passes their lastValidBlockHeight (or, without
+# one, after CONFIRM_MAX_AGE_S), and not found in the transaction history either,
+# become 'expired'. Pending rows left by an earlier process are picked up on start.
+# Readers count only landed trades (LANDED_SQL) and treat legacy rows with no
+# status as landed.
+POLL_MS     = int(os.getenv("CONFIRM_POLL_MS", "1000"))
+COMMITMENT  = os.getenv("CONFIRM_COMMITMENT", "confirmed")
+MAX_AGE_S   = float(os.getenv("CONFIRM_MAX_AGE_S", "180"))
+BATCH = 256
+
+LANDED_SQL = "COALESCE(status, 'confirmed') = 'confirmed'"
+NOT_FAILED_SQL = "COALESCE(status, '') NOT IN ('failed', 'expired')"
+
+COLUMNS = {
+    "status": "TEXT",              # pending | confirmed | failed | expired (NULL: before tracking)
+    "sent_ms": "INTEGER",
+    "last_valid_bh": "INTEGER",
+    "confirmed_slot": "INTEGER",
+    "confirmed_ms": "INTEGER",
+    "land_ms": "REAL",             # confirmed_ms - sent_ms
+    "fee_lamports": "INTEGER",
+    "cu_consumed": "INTEGER",
+    "prio_fee_lamports": "INTEGER",  # what src.fee_estimator paid, and at which percentile
+    "prio_pct": "REAL",
+    "err": "TEXT",
+}
+
+def ensure_columns(con: sqlite3.Connection) -> None:
+    """ALTER TABLE trades for any tracking column it lacks (idempotent)."""
+    have = {r[1] for r in con.execute("PRAGMA table_info(trades)")}
+    if not have:
+        return
+    for col, typ in COLUMNS.items():
+        if col not in have:
+            con.execute(f"ALTER TABLE trades ADD COLUMN {col} {typ}")
+    con.execute("CREATE INDEX IF NOT EXISTS trades_status_idx ON trades(status)")
+    con.commit()
+
+def now_ms() -> int:
+    return time.time_ns() // 1_000_000
+
+@dataclass
+class Pending:
+    sig: str
+    side: str
+    sent_ms: int
+    last_valid_bh: int | None
+
+def _token_amount(balances: list, owner: str, mint: str) -> int:
+    return sum(int(b["uiTokenAmount"]["amount"]) for b in balances or []
+               if b.get("owner") == owner and b.get("mint") == mint)
+
+def parse_fills(tx: dict) -> dict:
+    """Fee, compute units and the fee payer's SOL (lamports, fee excluded) and USDC (6dp units) deltas."""
+    meta, msg = tx["meta"], tx["transaction"]["message"]
+    keys = [k["pubkey"] if isinstance(k, dict) else k for k in msg["accountKeys"]]
+    owner, fee = keys[0], int(meta.get("fee") or 0)
+    sol = int(meta["postBalances"][0]) - int(meta["preBalances"][0]) + fee
+    # wrapped SOL that stays wrapped still counts as SOL
+    sol += (_token_amount(meta.get("postTokenBalances"), owner, SOL_MINT)
+            - _token_amount(meta.get("preTokenBalances"), owner, SOL_MINT))
+    usdc = (_token_amount(meta.get("postTokenBalances"), owner, USDC_MINT)
+            - _token_amount(meta.get("preTokenBalances"), owner, USDC_MINT))
+    return {"fee": fee, "sol": sol, "usdc": usdc, "slot": tx.get("slot"), "err": meta.get("err"),
+            "cu": meta.get("computeUnitsConsumed")}
+
+class Tracker:
+    def __init__(self, db: Path = DB_PATH):
+        self.db = db
+        self.pending: dict[str, Pending] = {}
+        self.final: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._resumed = False
+
+    # ---- producer side ----
+    def watch(self, sig: str, side: str, last_valid_bh: int | None, sent_ms: int | None = None) -> None:
+        with self._lock:
+            self.pending[sig] = Pending(sig, side, sent_ms or now_ms(), last_valid_bh)
+        self.start()
+
+    def is_final(self, sig: str) -> bool:
+        return sig in self.final
+
+    def wait(self, sig: str, timeout_s: float = MAX_AGE_S) -> str | None:
+        """Block until the tracker thread finalizes `sig`; its status, or None on timeout.
+        For short-lived CLI runs, whose daemon threads would die with the process."""
+        self.start()
+        t0 = time.monotonic()
+        while sig not in self.final and time.monotonic() - t0 < timeout_s:
+            time.sleep(POLL_MS / 1000.0)
+        return self.final.get(sig)
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, name="confirm-tracker", daemon=True)
+            self._thread.start()
+
+    # ---- tracking ----
+    def resume(self) -> None:
+        """Load rows still 'pending' (e.g. written by a process that exited before confirming)."""
+        if not self.db.exists():
+            return
+        con = sqlite3.connect(self.db)
+        try:
+            ensure_columns(con)
+            rows = con.execute("SELECT tx_sig, side, sent_ms, last_valid_bh FROM trades "
+                               "WHERE status='pending' AND tx_sig IS NOT NULL").fetchall()
+        finally:
+            con.close()
+        with self._lock:
+            for sig, side, sent, lvbh in rows:
+                self.pending.setdefault(sig, Pending(sig, side, int(sent or now_ms()), lvbh))
+
+    def poll_once(self) -> int:
+        """One batched status pass over everything pending; returns how many were finalized."""
+        with self._lock:
+            todo = list(self.pending.values())
+        if not todo:
+            return 0
+        rpc, done = pool(), 0
+        height = None
+        gone: list[Pending] = []
+        for p, st in self._statuses(todo, history=False):
+            if st and st.get("confirmationStatus") in (COMMITMENT, "finalized"):
+                done += self._finalize(p, st, now_ms())
+            elif st is None:
+                if p.last_valid_bh is not None:
+                    height = height if height is not None else rpc.request("getBlockHeight", [])
+                    expired = height > p.last_valid_bh
+                else:
+                    expired = now_ms() - p.sent_ms > MAX_AGE_S * 1000
+                if expired:
+                    gone.append(p)
+        # the recent status cache forgets a signature ~2 minutes after it lands (e.g. a
+        # row resumed after a restart), so look it up in the ledger before calling it expired
+        for p, st in self._statuses(gone, history=True):
+            if st is None:
+                done += self._close(p, {"status": "expired"})
+            elif st.get("confirmationStatus") in (COMMITMENT, "finalized"):
+                done += self._finalize(p, st, None)
+        return done
+
+    def _statuses(self, todo: list[Pending], history: bool):
+        """(pending, status or None) pairs from getSignatureStatuses, BATCH signatures per call."""
+        for i in range(0, len(todo), BATCH):
+            chunk = todo[i:i + BATCH]
+            res = pool().request("getSignatureStatuses", [[p.sig for p in chunk], {"searchTransactionHistory": history}])
+            yield from zip(chunk, (res or {}).get("value") or [None] * len(chunk))
+
+    def _finalize(self, p: Pending, st: dict, seen_ms: int | None) -> bool:
+        """seen_ms None: found only in the ledger history, so take the landing time from blockTime."""
+        row = {"status": "failed" if st.get("err") else "confirmed", "confirmed_slot": st.get("slot"),
+               "err": repr(st["err"]) if st.get("err") else None}
+        try:
+            tx = pool().request("getTransaction", [p.sig, {"encoding": "jsonParsed", "commitment": "confirmed",
+                                                          "maxSupportedTransactionVersion": 0}])
+        except Exception:
+            tx = None
+        if seen_ms is None and tx and tx.get("blockTime"):
+            seen_ms = int(tx["blockTime"]) * 1000
+        if seen_ms is not None:
+            row.update(confirmed_ms=seen_ms, land_ms=max(0, seen_ms - p.sent_ms))
+        if tx and row["status"] == "confirmed":
+            f = parse_fills(tx)
+            sol, usdc = abs(f["sol"]) / 1e9, abs(f["usdc"]) / 1e6
+            row["fee_lamports"], row["cu_consumed"] = f["fee"], f["cu"]
+            if sol > 0 and usdc > 0:
+                # BUY: USDC in -> SOL out; SELL: SOL in -> USDC out (same as the send-time row)
+                row.update({"in_amount": usdc, "out_amount": sol} if p.side.upper().startswith("BUY")
+                           else {"in_amount": sol, "out_amount": usdc})
+                row["price"] = usdc / sol
+        elif tx:
+            row["fee_lamports"] = int((tx.get("meta") or {}).get("fee") or 0)
+        return self._close(p, row)
+
+    def _close(self, p: Pending, row: dict) -> bool:
+        """Write the final status; False (still pending) if the trade row is not there yet."""
+        con = sqlite3.connect(self.db)
+        try:
+            ensure_columns(con)
+            cols = ", ".join(f"{k}=?" for k in row)
+            n = con.execute(f"UPDATE trades SET {cols} WHERE tx_sig=?", (*row.values(), p.sig)).rowcount
+            con.commit()
+        finally:
+            con.close()
+        if n == 0:
+            # no row to finalize yet: keep polling it, unless it is long past any insert
+            if now_ms() - p.sent_ms > MAX_AGE_S * 1000:
+                with self._lock:
+                    self.pending.pop(p.sig, None)
+                print(f"[confirm] {p.side} {p.sig[:12]}… has no trade row; dropped")
+            return False
+        with self._lock:
+            self.pending.pop(p.sig, None)
+            self.final[p.sig] = row["status"]
+        print(f"[confirm] {p.side} {p.sig[:12]}… {row['status']}"
+              + (f" in {row['land_ms']} ms" if row.get("land_ms") is not None else ""))
+        return True
+
+    def _loop(self) -> None:
+        if not self._resumed:
+            self._resumed = True
+            self.resume()
+        while True:
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f"[confirm] poll failed: {e!r}")
+            time.sleep(POLL_MS / 1000.0)
+
+    def drain(self, timeout_s: float = MAX_AGE_S) -> int:
+        """Poll in the foreground until nothing is pending (CLI); returns what is left."""
+        self.resume()
+        self._resumed = True
+        t0 = time.time()
+        while self.pending and time.time() - t0 < timeout_s:
+            self.poll_once()
+            if self.pending:
+                time.sleep(POLL_MS / 1000.0)
+        return len(self.pending)
+
+_TRACKER: Tracker | None = None
+
+def tracker() -> Tracker:
+    global _TRACKER
+    if _TRACKER is None:
+        _TRACKER = Tracker()
+    return _TRACKER
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(prog="python -m src.confirm_tracker",
+                                 description="Finalize pending trades in trades.sqlite from on-chain status")
+    ap.add_argument("--timeout", type=float, default=MAX_AGE_S, help="give up after this many seconds")
+    args = ap.parse_args(argv)
+    left = tracker().drain(args.timeout)
+    print(f"[confirm] {left} still pending")
+    return 1 if left else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
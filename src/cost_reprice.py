@@ -0,0 +1,141 @@
+from __future__ import annotations
+import os, sys, json, argparse
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from src import backtest_hybrid as bh
+
+ROOT = Path(__file__).resolve().parents[1]
+OUT_DIR = ROOT / "data" / "backtests"
+
+# For engines whose trades don't depend on cost, one zero-cost run gives gross
+# entry/exit prices, and every fee/slippage level is then a closed-form re-pricing:
+#   ret = exit*(1-c) / (entry*(1+c)) - 1     (c = cost per side)
+# The whole (cost level x trade) grid is computed at once with numpy.
+
+def _no_cost():
+    bh.COST_BPS_PER_SIDE = 0.0
+    os.environ["COST_PER_SIDE"] = "0"
+
+def _run_backtest(df):
+    bh.fetch_klines = lambda *a, **k: df
+    return bh.run_backtest()
+
+# name -> (runner(df) -> result with "trade_list", open trade marked into equity?)
+ENGINES = {
+    "run_backtest":       (_run_backtest, False),
+    "run_backtest_touch": (lambda df: bh.run_backtest_touch(df), False),
+    "run_bb_tv":          (lambda df: bh.run_bb_tv(df), True),
+}
+
+# Engines whose trade list itself moves with cost; re-pricing them would be wrong.
+PATH_DEPENDENT = {
+    "run_kc_atr": "ATR stop/TP are measured from the cost-loaded entry price, so exits move with cost",
+}
+
+def reprice(entry_px, exit_px, cost_per_side, open_trade: dict | None = None) -> pd.DataFrame:
+    """
+    Metrics for every cost level (fractions per side) in one pass over a
+    (levels x trades) matrix. `open_trade` (entry_px/exit_px) is marked into
+    equity and drawdown but not counted as a trade, as run_bb_tv does.
+    """
+    e = np.asarray(entry_px, dtype=float); x = np.asarray(exit_px, dtype=float)
+    c = np.atleast_1d(np.asarray(cost_per_side, dtype=float))[:, None]
+    R = (x * (1.0 - c)) / (e * (1.0 + c)) - 1.0           # (levels, trades)
+    n = R.shape[1]
+    curve = R
+    if open_trade is not None:
+        ro = (open_trade["exit_px"] * (1.0 - c)) / (open_trade["entry_px"] * (1.0 + c)) - 1.0
+        curve = np.concatenate([R, ro], axis=1)
+    eq = np.cumprod(1.0 + curve, axis=1)
+    eq = np.concatenate([np.ones((len(c), 1)), eq], axis=1)
+    peak = np.maximum.accumulate(eq, axis=1)
+    mdd = np.max(np.where(peak > 0, (peak - eq) / peak, 0.0), axis=1)
+    wins = (R > 0).sum(axis=1)
+    return pd.DataFrame({
+        "cost_bps_per_side": c[:, 0] * 10_000.0,
+        "equity_multiple": np.round(eq[:, -1], 6),
+        "max_drawdown_pct": np.round(100.0 * mdd, 2),
+        "trades": n,
+        "wins": wins, "losses": n - wins,
+        "win_rate_pct": np.round(100.0 * wins / max(1, n), 2),
+        "avg_trade_ret_pct": np.round(100.0 * R.mean(axis=1), 4) if n else 0.0,
+    })
+
+def reprice_result(res: dict, cost_per_side, mark_open: bool = False) -> pd.DataFrame:
+    tl = res.get("trade_list") or []
+    return reprice([t["entry_px"] for t in tl], [t["exit_px"] for t in tl], cost_per_side,
+                   res.get("open_trade") if mark_open else None)
+
+def check_path_dependence(engine: str, df: pd.DataFrame, cost_per_side: float) -> str | None:
+    """
+    Re-run `engine` at `cost_per_side` and compare its trades with the zero-cost run.
+    Returns None if the trade list is unchanged (re-pricing is exact), else a reason.
+    """
+    run, _mark = ENGINES[engine]
+    keep = bh.COST_BPS_PER_SIDE, os.environ.get("COST_PER_SIDE")
+    try:
+        _no_cost(); a = run(df)
+        bh.COST_BPS_PER_SIDE = cost_per_side; os.environ["COST_PER_SIDE"] = str(cost_per_side)
+        b = run(df)
+    finally:
+        bh.COST_BPS_PER_SIDE = keep[0]
+        if keep[1] is None: os.environ.pop("COST_PER_SIDE", None)
+        else: os.environ["COST_PER_SIDE"] = keep[1]
+    key = lambda r: [(t.get("entry_i", t.get("i")), t.get("exit_i"), t["entry_px"], t["exit_px"])
+                     for t in r.get("trade_list") or []]
+    if key(a) != key(b):
+        return f"trade list changes with cost ({len(a['trade_list'])} vs {len(b['trade_list'])} trades)"
+    return None
+
+def _load(args) -> pd.DataFrame:
+    if args.data:
+        return bh._to_dataframe(json.loads(Path(args.data).read_text(encoding="utf-8", errors="ignore")))
+    return bh.fetch_klines(bh.SYMBOL, bh.INTERVAL, bh.LIMIT)
+
+def _grid(s: str) -> list[float]:
+    return [float(v) for v in s.split(",") if v.strip()]
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(prog="python -m src.cost_reprice",
+                                 description="Cost sensitivity from one zero-cost backtest run")
+    ap.add_argument("engine", choices=sorted(ENGINES) + sorted(PATH_DEPENDENT))
+    ap.add_argument("--fees", default="0,2.5,5,7.5,10,12.5", help="fee bps per side")
+    ap.add_argument("--slips", default="0,5,12.5", help="slippage bps per side")
+    ap.add_argument("--data", default=os.getenv("DATA_FILE"), help="kline JSON (default: fetch)")
+    ap.add_argument("--verify", action="store_true", help="re-run at the top cost to confirm trades don't move")
+    ap.add_argument("--out", help="CSV path (default data/backtests/cost_sensitivity_<engine>_<SYM>_<INT>.csv)")
+    args = ap.parse_args(argv)
+
+    if args.engine in PATH_DEPENDENT:
+        print(f"[cost_reprice] {args.engine} can't be re-priced: {PATH_DEPENDENT[args.engine]}; "
+              "re-run it per cost level instead.")
+        return 2
+
+    fees, slips = _grid(args.fees), _grid(args.slips)
+    levels = [(f, s) for f in fees for s in slips]
+    cps = np.array([(f + s) / 10_000.0 for f, s in levels])
+
+    df = _load(args)
+    if args.verify:
+        why = check_path_dependence(args.engine, df, float(cps.max()))
+        if why:
+            print(f"[cost_reprice] {args.engine} is path-dependent on cost: {why}")
+            return 2
+    run, mark_open = ENGINES[args.engine]
+    _no_cost()
+    res = run(df)
+    table = reprice_result(res, cps, mark_open)
+    table.insert(0, "fee_bps", [f for f, _ in levels])
+    table.insert(1, "slip_bps", [s for _, s in levels])
+
+    out = Path(args.out) if args.out else OUT_DIR / f"cost_sensitivity_{args.engine}_{bh.SYMBOL}_{bh.INTERVAL}.csv"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    table.to_csv(out, index=False)
+    print(table.to_string(index=False))
+    print(f"WROTE: {out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
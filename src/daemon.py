@@ -0,0 +1,272 @@
+from __future__ import annotations
+import os, sys, json, time, sqlite3, signal, asyncio, argparse, threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable
+
+# src.main loads config/.env on import, so every module below sees the same config.
+from src import main as bot
+from src import strategy_runner as sr
+from src import bar_clock, rpc_pool
+from src.confirm_tracker import tracker
+from src.fee_estimator import estimator
+
+# One long-lived asyncio service replacing the two polling loops (main.main every
+# BOT_INTERVAL_SEC, strategy_runner.main every POLL_SECS). Each job runs its blocking
+# work (Binance/Jupiter/RPC calls, SQLite) in a worker thread under its own timeout:
+#   signal     SIGNAL_SCHEDULE=bar (default): at each bar close (src.bar_clock) fetch the
+#              closed bars, evaluate + log the signal once, execute on action change
+#   market     SIGNAL_SCHEDULE=poll: fetch the signal/bias klines into memory every
+#              DAEMON_MARKET_SEC; `signal` then re-evaluates them every POLL_SECS
+#   trade      main.trade_once (guards, cooldowns, daily caps) via the in-process pipeline
+#   standby    keep a warm quote (+ prebuilt unsigned tx with STANDBY_PREBUILD=1) for
+#              STANDBY_SIDES at the configured sizes (execution.Pipeline.warm), but only
+#              for sides that can trade soon: live signal executions, or trade-job sides
+#              with AUTO_ENABLE_<side> on and their cooldown (nearly) over
+#   notify     drain the queue of completed trades
+#   confirm    src.confirm_tracker's thread: finalize pending trades (resumed on start)
+#   heartbeat  data/heartbeat.txt + data/daemon_status.json, never behind another job
+# A timed-out job is logged and its thread left to finish; the job skips its ticks
+# until then, so a hung call can't run twice or stall the heartbeat (and the watchdog
+# only restarts a process whose event loop is actually stuck). Executions from the
+# signal and trade jobs share one lock, one Pipeline (keypair/RPC client/session)
+# and one open signals DB connection.
+HEARTBEAT_SEC = float(os.getenv("DAEMON_HEARTBEAT_SEC", "15"))
+MARKET_SEC    = float(os.getenv("DAEMON_MARKET_SEC", str(sr.POLL_SECS)))
+TIMEOUT_MARKET_S = float(os.getenv("DAEMON_TIMEOUT_MARKET_S", "30"))
+TIMEOUT_SIGNAL_S = float(os.getenv("DAEMON_TIMEOUT_SIGNAL_S", "60"))
+TIMEOUT_TRADE_S  = float(os.getenv("DAEMON_TIMEOUT_TRADE_S", "120"))
+TIMEOUT_NOTIFY_S = float(os.getenv("DAEMON_TIMEOUT_NOTIFY_S", "20"))
+WORKERS = int(os.getenv("DAEMON_WORKERS", "4"))
+# keep STANDBY_MS below QUOTE_MAX_AGE_MS so the warm quote is always reusable
+STANDBY_SIDES = [s.strip().upper() for s in os.getenv("STANDBY_SIDES", "buy,sell").split(",") if s.strip()]
+STANDBY_MS    = int(os.getenv("STANDBY_MS", "2500"))
+TIMEOUT_STANDBY_S = float(os.getenv("DAEMON_TIMEOUT_STANDBY_S", "20"))
+STATUS = bot.DATA / "daemon_status.json"
+
+@dataclass
+class Job:
+    name: str
+    every: float
+    timeout: float
+    fn: Callable[[], object]
+    inflight: asyncio.Future | None = None
+    runs: int = 0
+    timeouts: int = 0
+    errors: int = 0
+    skipped: int = 0
+    last_ms: float = 0.0
+    last_ok: str | None = None
+    aligned: bool = False          # `every` is a bar interval: run at each close, not every N s
+
+    def status(self) -> dict:
+        return {"every_s": self.every, "aligned": self.aligned, "timeout_s": self.timeout, "runs": self.runs,
+                "timeouts": self.timeouts, "errors": self.errors, "skipped": self.skipped,
+                "last_ms": self.last_ms, "last_ok": self.last_ok,
+                "busy": bool(self.inflight and not self.inflight.done())}
+
+class Daemon:
+    def __init__(self, signals: bool = True, trades: bool = True):
+        self.pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="daemon")
+        self.exec_lock = threading.Lock()
+        self.frames = None
+        self.frames_at = 0.0
+        self.con: sqlite3.Connection | None = None
+        self.gate = bar_clock.BarGate()
+        self.boundary = 0
+        self.standby_err: dict[str, str] = {}
+        self.signals, self.trades = signals, trades
+        self.started = datetime.now()
+        self.jobs: list[Job] = []
+        if signals and sr.SCHEDULE == "bar":
+            step = bar_clock.step_ms(os.getenv("BB_INTERVAL", "15m"))
+            self.jobs.append(Job("signal", step / 1000.0, TIMEOUT_SIGNAL_S, self.evaluate_bar, aligned=True))
+        elif signals:
+            if sr.STRATEGY_MODE != "regime":
+                self.jobs.append(Job("market", MARKET_SEC, TIMEOUT_MARKET_S, self.refresh_market))
+            self.jobs.append(Job("signal", sr.POLL_SECS, TIMEOUT_SIGNAL_S, self.evaluate_signal))
+        if trades:
+            self.jobs.append(Job("trade", bot.INTERVAL_SEC, TIMEOUT_TRADE_S, self.trade))
+        if STANDBY_SIDES and (signals or trades):
+            self.jobs.append(Job("standby", STANDBY_MS / 1000.0, TIMEOUT_STANDBY_S, self.standby))
+
+    # ---- blocking job bodies (worker threads) ----
+    def refresh_market(self):
+        from src.signal_mtf import fetch_frames
+        self.frames = fetch_frames()
+        self.frames_at = time.time()
+
+    def evaluate_signal(self):
+        fresh = self.frames is not None and time.time() - self.frames_at <= 2 * MARKET_SEC
+        sig = sr.get_signal(self.frames if fresh else None)
+        sr.loop_once(sig, self.con, self.execute_action)
+
+    def evaluate_bar(self) -> bool:
+        """False while the bar that closed at self.boundary is not served yet (retry)."""
+        sig = sr.get_signal(closed_only=True)
+        close = sr.bar_close_ms(sig)
+        if close is None or close < self.boundary - 1:
+            return False
+        if self.gate.fresh(close):
+            sr.loop_once(sig, self.con, self.execute_action)
+        return True
+
+    def execute_action(self, action: str) -> None:
+        """strategy_runner.maybe_execute, in-process: unguarded buy/sell on an action change."""
+        if sr.DRY_RUN:
+            print(f"DRY_RUN=on → would {'BUY' if action == 'BUY_SOL' else 'SELL'}")
+            return
+        from src.execution import pipeline
+        from src.jupiter_client import load_env
+        with self.exec_lock:
+            if action == "BUY_SOL":
+                _, _, amount, _, dry_run = load_env()
+                res = pipeline().execute_buy(amount, dry_run)
+            else:
+                res = pipeline().execute_sell_plan()
+        bot.log(f"signal {action}: rc {res.rc} sig={res.sig} " + " ".join(f"{k}={v:.0f}ms" for k, v in res.ms.items()))
+        if res.sig:
+            self.queue_notify()
+
+    def standby(self):
+        from src.execution import pipeline
+        for side in self.standby_sides():
+            try:
+                pipeline().warm(side)
+                self.standby_err.pop(side, None)
+            except Exception as e:
+                if self.standby_err.get(side) != repr(e):   # log once per distinct failure
+                    bot.log(f"standby {side}: {e!r}")
+                self.standby_err[side] = repr(e)
+
+    def standby_sides(self) -> list[str]:
+        """STANDBY_SIDES that may execute within the next couple of standby ticks."""
+        live_signals = self.signals and not sr.DRY_RUN      # signal executions are unguarded
+        lead_s = 2 * STANDBY_MS / 1000.0
+        return [s for s in STANDBY_SIDES if live_signals or (self.trades and bot.side_ready(s, lead_s))]
+
+    def trade(self):
+        with self.exec_lock:
+            bot.trade_once(on_trade=self.queue_notify)
+
+    def queue_notify(self) -> None:
+        self.loop.call_soon_threadsafe(self.notes.put_nowait, time.time())
+
+    # ---- scheduling ----
+    async def _run(self, job: Job):
+        """job.fn() under its timeout; its result, or None on skip/timeout/error."""
+        if job.inflight is not None and not job.inflight.done():
+            job.skipped += 1
+            bot.log(f"{job.name}: previous run still in flight; skipping tick")
+            return None
+        out = None
+        t0 = time.perf_counter()
+        job.inflight = self.loop.run_in_executor(self.pool, job.fn)
+        job.runs += 1
+        try:
+            out = await asyncio.wait_for(asyncio.shield(job.inflight), job.timeout)
+            job.last_ok = datetime.now().isoformat(timespec="seconds")
+        except asyncio.TimeoutError:
+            job.timeouts += 1
+            bot.log(f"{job.name}: timed out after {job.timeout:.0f}s (left running in background)")
+        except Exception as e:
+            job.errors += 1
+            bot.log(f"{job.name}: failed: {e!r}")
+        job.last_ms = round(1000.0 * (time.perf_counter() - t0), 1)
+        return out
+
+    async def _every(self, job: Job) -> None:
+        while not self.stop.is_set():
+            t0 = self.loop.time()
+            await self._run(job)
+            try:
+                await asyncio.wait_for(self.stop.wait(), max(0.0, job.every - (self.loop.time() - t0)))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _aligned(self, job: Job) -> None:
+        step = int(job.every * 1000)
+        while not self.stop.is_set():
+            try:
+                await asyncio.wait_for(self.stop.wait(), bar_clock.wait_ms(step) / 1000.0)
+                break
+            except asyncio.TimeoutError:
+                pass
+            self.boundary = bar_clock.last_boundary_ms(bar_clock.now_ms() - bar_clock.LAG_MS, step)
+            for _ in range(bar_clock.RETRIES + 1):
+                if await self._run(job) is not False or self.stop.is_set():
+                    break
+                await asyncio.sleep(bar_clock.RETRY_MS / 1000.0)
+            else:
+                bot.log(f"{job.name}: bar closing {self.boundary} not served after {bar_clock.RETRIES} retries")
+
+    async def _notifier(self) -> None:
+        while not self.stop.is_set():
+            getter = asyncio.ensure_future(self.notes.get())
+            stopper = asyncio.ensure_future(self.stop.wait())
+            done, _ = await asyncio.wait({getter, stopper}, return_when=asyncio.FIRST_COMPLETED)
+            if getter not in done:
+                getter.cancel()
+                break
+            stopper.cancel()
+            from src.execution import pipeline
+            try:
+                await asyncio.wait_for(self.loop.run_in_executor(self.pool, pipeline().notify), TIMEOUT_NOTIFY_S)
+            except asyncio.TimeoutError:
+                bot.log(f"notify: timed out after {TIMEOUT_NOTIFY_S:.0f}s")
+            except Exception as e:
+                bot.log(f"notify failed: {e!r}")
+
+    async def _heartbeat(self) -> None:
+        while not self.stop.is_set():
+            now = datetime.now()
+            try:
+                bot._write_dt(bot.HEARTBEAT, now)
+                STATUS.write_text(json.dumps({"ts": now.isoformat(timespec="seconds"),
+                                              "started": self.started.isoformat(timespec="seconds"),
+                                              "pending_notify": self.notes.qsize(),
+                                              "pending_confirm": len(tracker().pending),
+                                              "jobs": {j.name: j.status() for j in self.jobs},
+                                              "rpc": rpc_pool._POOL.status() if rpc_pool._POOL else [],
+                                              "prio_fee": estimator().status()}, indent=2))
+            except Exception as e:
+                bot.log(f"heartbeat write failed: {e!r}")
+            try:
+                await asyncio.wait_for(self.stop.wait(), HEARTBEAT_SEC)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.stop = asyncio.Event()
+        self.notes: asyncio.Queue = asyncio.Queue()
+        for s in (signal.SIGINT, signal.SIGTERM):
+            self.loop.add_signal_handler(s, self._shutdown, s)
+        sr.db_init()
+        self.con = sqlite3.connect(sr.DB_PATH, check_same_thread=False)
+        tracker().start()
+        bot.log("=== bot daemon started === " + ", ".join(f"{j.name}/{j.every:g}s (timeout {j.timeout:g}s)"
+                                                       for j in self.jobs))
+        try:
+            await asyncio.gather(self._heartbeat(), self._notifier(), *((self._aligned if j.aligned else self._every)(j) for j in self.jobs))
+        finally:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.con.close()
+            bot.log("=== bot daemon stopped ===")
+
+    def _shutdown(self, signum) -> None:
+        bot.log(f"signal {signum} received, stopping daemon")
+        self.stop.set()
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(prog="python -m src.daemon",
+                                 description="Run market data, signals, guarded trades, notifications and the heartbeat in one process")
+    ap.add_argument("--no-signals", action="store_true", help="skip the strategy_runner jobs (market + signal)")
+    ap.add_argument("--no-trades", action="store_true", help="skip the main.py guarded trade job")
+    args = ap.parse_args(argv)
+    asyncio.run(Daemon(signals=not args.no_signals, trades=not args.no_trades).run())
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,389 @@
+from __future__ import annotations
+import os, json, time, base64
+from dataclasses import dataclass, field
+from decimal import Decimal, ROUND_DOWN
+from pathlib import Path
+import requests
+
+from src import pretrade
+from src.guards import sell_balance_guard, sell_price_guard, buy_guard
+from src.quotes import QuoteBook, Quote, want_key, now_ms
+from src.fee_estimator import Fee, estimator
+
+ROOT = Path(__file__).resolve().parents[1]
+JUP_URL = "https://quote-api.jup.ag/v6"
+SOL_MINT  = os.environ.get("SOL_MINT",  "So11111111111111111111111111111111111111112")
+USDC_MINT = os.environ.get("USDC_MINT", "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v")
+# standby (Pipeline.warm, driven by the daemon): with STANDBY_PREBUILD=1 also prebuild the
+# unsigned /swap tx for the warm quote (one more Jupiter call per tick, so opt-in); it
+# embeds a recent blockhash, so it is dropped after TX_MAX_AGE_MS
+PREBUILD = os.environ.get("STANDBY_PREBUILD", "0") == "1"
+TX_MAX_AGE_MS = int(os.environ.get("STANDBY_TX_MAX_AGE_MS", "30000"))
+
+# In-process execution: guard -> quote -> build -> sign -> send -> record -> notify.
+# send fans the signed tx out to several RPC endpoints and returns; the trade is
+# recorded as 'pending' and src.confirm_tracker finalizes it (confirmed/failed/expired,
+# actual fills, landing time) in the background while src.broadcast keeps
+# rebroadcasting until then. Only a tx every endpoint rejected is not recorded.
+# Both run on daemon threads, so one-shot CLI runs settle() before exiting.
+# Replaces the main -> sell_guarded -> sell_execute -> notify_trade subprocess chain
+# (and buy_guarded -> buy_live_once): the keypair, RPC client and HTTP session are
+# loaded once per process and reused by every trade. The CLI modules keep working
+# as thin wrappers over the same Pipeline. solana/solders are imported on first use.
+# With standby on, a signal skips the /quote round trip (and, with STANDBY_PREBUILD,
+# /swap too) for the configured sizes.
+
+@dataclass
+class Result:
+    rc: int                          # same codes as the CLI modules: 0 done, 2 guard skip, 1 error
+    side: str
+    msg: str = ""
+    sig: str | None = None
+    in_amount: float | None = None
+    out_amount: float | None = None
+    price: float | None = None
+    quote_src: str = ""                      # fetched | plan | refresh | standby (src.quotes)
+    prebuilt: bool = False                   # tx came from the standby, no /swap on the hot path
+    landing: str = ""                        # pending | rejected (final status: src.confirm_tracker)
+    quote_age_ms: int | None = None
+    tracking: dict = field(default_factory=dict)   # confirm_tracker columns for the trade row
+    ms: dict = field(default_factory=dict)   # per-stage wall time
+
+class Pipeline:
+    def __init__(self, rpc_url: str | None = None, keypair_path: str | None = None):
+        self.rpc_url = rpc_url        # preferred endpoint; reads fail over through src.rpc_pool
+        self.keypair_path = keypair_path or os.environ.get("KEYPAIR_PATH")
+        self.session = requests.Session()
+        self.session.headers.update({"accept": "application/json", "user-agent": "solana-bot/1.0 (+bot)"})
+        self._kp = None
+        self.quotes = QuoteBook()
+        self.prebuilt: dict[tuple, tuple[int, int, tuple]] = {}   # key -> (quote ms, built ms, build())
+
+    # ---- cached resources ----
+    @property
+    def keypair(self):
+        if self._kp is None:
+            from solders.keypair import Keypair
+            if not self.keypair_path:
+                raise RuntimeError("KEYPAIR_PATH not set")
+            raw = json.loads(Path(self.keypair_path).read_text())
+            if not isinstance(raw, list):
+                raise ValueError("Unsupported keypair format; expected Solana CLI JSON array")
+            self._kp = Keypair.from_bytes(bytes(raw))
+        return self._kp
+
+    @property
+    def pubkey(self):
+        return self.keypair.pubkey()
+
+    @property
+    def rpc(self):
+        from src.rpc_pool import pool
+        return pool()
+
+    @property
+    def client(self):
+        """Persistent client of the best healthy endpoint right now."""
+        return self.rpc.client(self.rpc_url)
+
+    def rpc_call(self, fn):
+        return self.rpc.call(fn, prefer=self.rpc_url)
+
+    # ---- stages ----
+    def quote(self, in_mint: str, out_mint: str, amount_int: int, slippage_bps: int, **extra) -> dict:
+        params = {"inputMint": in_mint, "outputMint": out_mint, "amount": str(int(amount_int)),
+                  "slippageBps": str(slippage_bps), "onlyDirectRoutes": "false",
+                  "restrictIntermediateTokens": "true", "asLegacyTransaction": "false", **extra}
+        r = self.session.get(f"{JUP_URL}/quote", params=params, timeout=20)
+        r.raise_for_status()
+        q = r.json()
+        if "outAmount" not in q:
+            raise RuntimeError(f"Unexpected quote response: {q}")
+        return q
+
+    def _fetcher(self, in_mint: str, out_mint: str, amount_int: int, slippage_bps: int,
+                 fee_bps: int = 0, **extra):
+        """(QuoteBook key, zero-arg fetch) for one quote request."""
+        key = want_key(in_mint, out_mint, amount_int, slippage_bps, fee_bps, extra.get("swapMode", "ExactIn"))
+        if fee_bps:
+            extra["platformFeeBps"] = str(fee_bps)
+        return key, lambda: self.quote(in_mint, out_mint, amount_int, slippage_bps, **extra)
+
+    def fresh_quote(self, res: Result, args: tuple, extra: dict) -> Quote:
+        """Quote stage through the QuoteBook: reuse a quote within budget, else fetch."""
+        key, fetch = self._fetcher(*args, **extra)
+        q = self._timed(res, "quote", self.quotes.get, key, fetch)
+        res.quote_src, res.quote_age_ms = q.source, q.age_ms()
+        return q
+
+    def built(self, res: Result, q: Quote) -> tuple[bytes, int | None, Fee]:
+        """Build stage: the standby's prebuilt tx if it was built for exactly `q`, else /swap."""
+        hit = self.prebuilt.pop(q.key, None)
+        if hit and hit[0] == q.fetched_ms and now_ms() - hit[1] <= TX_MAX_AGE_MS:
+            res.prebuilt, res.ms["build"] = True, 0.0
+            return hit[2]
+        return self._timed(res, "build", self.build, q.raw)
+
+    def _sell_args(self, lamports: int) -> tuple[tuple, dict]:
+        return ((SOL_MINT, USDC_MINT, lamports, int(os.environ.get("SLIPPAGE_BPS", "50")),
+                 int(os.environ.get("PLATFORM_FEE_BPS", "0"))),
+                {"swapMode": "ExactIn", "dominantQuote": "true"})
+
+    def _buy_args(self, amount_usdc: Decimal) -> tuple[tuple, dict]:
+        amt = int((Decimal(str(amount_usdc)) * Decimal(10**6)).to_integral_value(rounding=ROUND_DOWN))
+        return (USDC_MINT, SOL_MINT, amt, int(os.getenv("SLIPPAGE_BPS", "25"))), {"maxAccounts": "64"}
+
+    def _plan_lamports(self) -> int | None:
+        from src import sell_execute as se
+        try:
+            plan = json.loads(Path(se.PLAN_PATH).read_text())
+        except (OSError, ValueError):
+            return None
+        qty = Decimal(str(plan.get("sell_qty_sol") or plan.get("sell_qty") or 0))
+        if (plan.get("decision") or "").upper() != "SELL" or qty <= 0:
+            return None
+        return int(qty * Decimal(1_000_000_000))
+
+    def warm(self, side: str) -> Quote | None:
+        """Standby: re-quote the configured size of `side` (BUY_USDC / plan sell_qty_sol)
+        and, with STANDBY_PREBUILD, build its unsigned tx; None when there is nothing to sell."""
+        if side == "BUY":
+            from src import buy_guarded as bg
+            args, extra = self._buy_args(Decimal(f"{bg.load_cfg().buy_usdc:.2f}"))
+        else:
+            lamports = self._plan_lamports()
+            if lamports is None:
+                return None
+            args, extra = self._sell_args(lamports)
+        key, fetch = self._fetcher(*args, **extra)
+        q = self.quotes.put(fetch(), source="standby")
+        if PREBUILD:
+            tx = self.build(q.raw)
+            self.prebuilt[q.key] = (q.fetched_ms, now_ms(), tx)
+        return q
+
+    def build(self, quote: dict) -> tuple[bytes, int | None, Fee]:
+        """(unsigned v0 transaction bytes, lastValidBlockHeight, priority fee paid) for `quote`
+        from Jupiter /swap; the fee comes from src.fee_estimator."""
+        fee = estimator().fee_for(quote)
+        body = {"quoteResponse": quote, "userPublicKey": str(self.pubkey), "wrapAndUnwrapSol": True,
+                "dynamicComputeUnitLimit": True, "prioritizationFeeLamports": fee.lamports}
+        r = self.session.post(f"{JUP_URL}/swap", json=body, timeout=30)
+        r.raise_for_status()
+        data = r.json()
+        if "swapTransaction" not in data:
+            raise RuntimeError(f"Unexpected swap response: {data}")
+        return base64.b64decode(data["swapTransaction"]), data.get("lastValidBlockHeight"), fee
+
+    def sign(self, tx_bytes: bytes) -> bytes:
+        from solders.transaction import VersionedTransaction
+        vt = VersionedTransaction.from_bytes(tx_bytes)
+        return bytes(VersionedTransaction(vt.message, [self.keypair]))
+
+    def send(self, res: Result, raw: bytes, last_valid_block_height: int | None, fee: Fee | None = None) -> bool:
+        """First fan-out and the pending tracking columns for the row; False if rejected.
+        record() hands the signature to the confirmation tracker once the row exists."""
+        from src.broadcast import broadcast_async
+        from src.confirm_tracker import tracker
+        sent_ms = now_ms()
+        out = self._timed(res, "send", broadcast_async, raw, tracker().is_final, self.rpc_url, self.rpc)
+        res.sig, res.landing = out.sig, out.status
+        if out.status == "rejected":
+            res.rc, res.msg = 1, f"tx rejected by {out.sends} endpoints: {out.err or ''}".rstrip(": ")
+            return False
+        res.tracking = {"status": "pending", "sent_ms": sent_ms, "last_valid_bh": last_valid_block_height}
+        if fee is not None and fee.lamports != "auto":
+            res.tracking.update(prio_fee_lamports=fee.lamports, prio_pct=fee.pct)
+        return True
+
+    def settle(self, res: Result) -> Result:
+        """CLI runs: wait for the tracker's final status of a sent trade before the process exits."""
+        if res.sig and res.landing == "pending":
+            from src.confirm_tracker import tracker
+            res.landing = tracker().wait(res.sig) or "pending"
+            if res.landing in ("failed", "expired"):
+                res.rc, res.msg = 1, f"tx {res.landing}"
+        return res
+
+    def record(self, **row) -> None:
+        from src.sell_execute import insert_trade
+        insert_trade(**row)
+        if row.get("status") == "pending":
+            # only now: finalizing before the INSERT would update no row
+            from src.confirm_tracker import tracker
+            tracker().watch(row["tx_sig"], row["side"], row.get("last_valid_bh"), row.get("sent_ms"))
+
+    def notify(self) -> int:
+        from src import notify_trade
+        return notify_trade.main()
+
+    # ---- flows ----
+    def _timed(self, res: Result, name: str, fn, *a, **k):
+        t0 = time.perf_counter()
+        try:
+            return fn(*a, **k)
+        finally:
+            res.ms[name] = round(1000.0 * (time.perf_counter() - t0), 1)
+
+    def sell(self) -> Result:
+        """sell_guarded: SOL reserve + profit target, then execute the sell plan."""
+        from src import sell_guarded as sg
+        res = Result(2, "SELL")
+        cfg = sg.load_cfg()
+        print(f"[sell_guard] cfg: PROFIT_BPS={cfg.sell_min_profit_bps}, MIN_SELL_SOL={cfg.min_sell_sol}, RESERVE={cfg.min_sol_reserve}")
+        # balance, last BUY and every price source at once; the plan-size quote doubles as
+        # the best price and lands in the QuoteBook for the execution below
+        until = pretrade.deadline()
+        pk = self.pubkey
+        f_bal = pretrade.submit(self.rpc_call, lambda c: sg.get_sol_balance(c, pk), timings=res.ms, name="balance")
+        f_buy = pretrade.submit(sg.last_buy_price_usdc, timings=res.ms, name="last_buy")
+        extra, lamports = [], self._plan_lamports()
+        if lamports:
+            args, kw = self._sell_args(lamports)
+            key, fetch = self._fetcher(*args, **kw)
+            extra = [("plan quote", lambda: int(self.quotes.get(key, fetch).raw["outAmount"]) / 1e6 / (lamports / 1e9))]
+        f_px = pretrade.race(extra + sg.price_sources())
+        try:
+            bal = pretrade.result(f_bal, until, "SOL balance")
+            ok, why = sell_balance_guard(bal, cfg.min_sol_reserve, cfg.min_sell_sol)
+            if not ok:
+                print(f"[sell_guard] SKIP: {why}")
+                res.msg = why
+                return res
+            last_buy = pretrade.result(f_buy, until, "last BUY price")
+        except pretrade.NotReady as e:
+            print(f"[sell_guard] SKIP: {e}")
+            res.msg = str(e)
+            return res
+        now_px = self._timed(res, "price", sg.get_usdc_per_sol, until, futs=f_px)
+        ok, why = sell_price_guard(last_buy, now_px, cfg.sell_min_profit_bps)
+        if not ok:
+            print(f"[sell_guard] {'WARN' if last_buy is None and now_px is not None else 'SKIP'}: {why}")
+            res.msg = why
+            return res
+        print(f"[sell_guard] OK: {why}; executing sell plan…")
+        try:
+            out = self.execute_sell_plan()
+        except Exception as e:
+            from src.sell_execute import log_line
+            log_line(f"ERROR: {e!r}")
+            res.rc, res.msg = 1, repr(e)
+            return res
+        out.ms = {**res.ms, **out.ms}
+        print(f"[sell_guard] sell_execute rc {out.rc}")
+        return out
+
+    def execute_sell_plan(self, dry_run: bool | None = None) -> Result:
+        """sell_execute: sell `sell_qty_sol` from the plan, record the trade (also in dry-run)."""
+        from src import sell_execute as se
+        res = Result(0, "SELL")
+        if dry_run is None:
+            dry_run = os.environ.get("DRY_RUN", "true" if se.TEST_MODE else "false").lower() == "true"
+        plan = json.loads(Path(se.PLAN_PATH).read_text())
+        decision = (plan.get("decision") or "").upper()
+        qty_sol = Decimal(str(plan.get("sell_qty_sol") or plan.get("sell_qty") or 0))
+        if decision != "SELL" or qty_sol <= 0:
+            se.log_line(f"Skipping: decision={decision!r}, qty_sol={qty_sol}.")
+            res.msg = "no SELL plan"
+            return res
+        lamports = int(qty_sol * Decimal(1_000_000_000))
+        if plan.get("quote_raw"):
+            # sell_check's quote for this size; reused if still within the freshness budget
+            self.quotes.put(plan["quote_raw"], plan.get("quoted_at_ms") or int(plan.get("generated_at") or 0) * 1000,
+                            source="plan")
+        q = self.fresh_quote(res, *self._sell_args(lamports))
+        se.log_line(f"quote: {res.quote_src}, age {res.quote_age_ms} ms")
+        out_usdc = Decimal(q.raw.get("outAmount", 0)) / Decimal(1_000_000)
+        px = out_usdc / qty_sol
+        if not dry_run:
+            tx, lvbh, fee = self.built(res, q)
+            raw = self._timed(res, "sign", self.sign, tx)
+            if not self.send(res, raw, lvbh, fee):
+                se.log_line(f"❌ {res.msg} | sig={res.sig}")
+                return res
+            se.log_line(f"✅ Sent ({res.landing}). Signature: {res.sig}")
+            se.log_line(f"Solscan: https://solscan.io/tx/{res.sig}")
+        self._timed(res, "record", self.record,
+                    ts=int(time.time()), side="SELL", symbol="SOL_USDC", size_usdc=float(out_usdc),
+                    size_real=float(qty_sol), price=float(px), tx_sig=res.sig,
+                    mode="PROD" if not se.TEST_MODE else "TEST", dry_run=bool(dry_run),
+                    base_mint=SOL_MINT, quote_mint=USDC_MINT, in_amount=float(qty_sol), out_amount=float(out_usdc),
+                    **res.tracking)
+        se.log_line(f"Recorded SELL: {qty_sol} SOL -> {out_usdc:.4f} USDC @ {px:.4f} USDC/SOL")
+        res.in_amount, res.out_amount, res.price = float(qty_sol), float(out_usdc), float(px)
+        return res
+
+    def buy(self) -> Result:
+        """buy_guarded: USDC above the reserve, then buy BUY_USDC worth of SOL."""
+        from src import buy_guarded as bg
+        res = Result(2, "BUY")
+        cfg = bg.load_cfg()
+        print(f"[buy_guard] cfg: BUY_USDC={cfg.buy_usdc:.2f}, RESERVE_USDC={cfg.min_usdc_reserve:.2f}, DRY_RUN={cfg.dry_run}")
+        # the USDC token-account scan and the buy quote run together; execute_buy then
+        # reuses the quote from the QuoteBook
+        until = pretrade.deadline()
+        pk = self.pubkey
+        f_bal = pretrade.submit(self.rpc_call, lambda c: bg.usdc_balance(c, pk), timings=res.ms, name="balance")
+        args, kw = self._buy_args(Decimal(f"{cfg.buy_usdc:.2f}"))
+        key, fetch = self._fetcher(*args, **kw)
+        pretrade.submit(self.quotes.get, key, fetch, timings=res.ms, name="prequote")
+        try:
+            bal = pretrade.result(f_bal, until, "USDC balance")
+        except pretrade.NotReady as e:
+            print(f"[buy_guard] SKIP: {e}")
+            res.msg = str(e)
+            return res
+        print(f"[buy_guard] USDC balance={bal:.2f}")
+        ok, why = buy_guard(bal, cfg.min_usdc_reserve, cfg.buy_usdc)
+        if not ok:
+            print(f"[buy_guard] SKIP: {why}")
+            res.msg = why
+            return res
+        try:
+            out = self.execute_buy(Decimal(f"{cfg.buy_usdc:.2f}"))
+        except Exception as e:
+            print(f"[buy_guard] crashed: {e}")
+            res.rc, res.msg = 1, repr(e)
+            return res
+        out.ms = {**res.ms, **out.ms}
+        print(f"[buy_guard] buy_live_once rc {out.rc}")
+        return out
+
+    def execute_buy(self, amount_usdc: Decimal, dry_run: bool | None = None) -> Result:
+        """buy_live_once: quote USDC -> SOL, then build/sign/send and record unless DRY_RUN."""
+        from src.buy_live_once import log_line
+        from src import sell_execute as se
+        res = Result(0, "BUY")
+        if dry_run is None:
+            dry_run = os.getenv("DRY_RUN", "true").lower() == "true"
+        q = self.fresh_quote(res, *self._buy_args(amount_usdc))
+        out_sol = float(Decimal(q.raw["outAmount"]) / Decimal(10**9))
+        px = round(float(amount_usdc) / out_sol, 9) if out_sol else 0.0
+        res.in_amount, res.out_amount, res.price = float(amount_usdc), out_sol, px
+        print(f"[buy_live_once] DRY_RUN={dry_run} | amount={float(amount_usdc)} USDC → ~{out_sol:.9f} SOL @ ~${px}")
+        if dry_run:
+            print("[buy_live_once] DRY_RUN=true → would build/send tx; stopping here.")
+            return res
+        tx, lvbh, fee = self.built(res, q)
+        raw = self._timed(res, "sign", self.sign, tx)
+        if not self.send(res, raw, lvbh, fee):
+            log_line(f"BUY {res.msg} | sig={res.sig}")
+            return res
+        # quoted amounts until the tracker replaces them with the confirmed fills
+        self._timed(res, "record", self.record,
+                    ts=int(time.time()), side="BUY", symbol="SOL_USDC", size_usdc=float(amount_usdc),
+                    size_real=out_sol, price=px, tx_sig=res.sig, mode="PROD" if not se.TEST_MODE else "TEST", dry_run=False,
+                    base_mint=SOL_MINT, quote_mint=USDC_MINT, in_amount=float(amount_usdc), out_amount=out_sol,
+                    **res.tracking)
+        log_line(f"landing={res.landing} | BOUGHT ~{out_sol:.9f} SOL for {float(amount_usdc)} USDC "
+                 f"| sig={res.sig} | https://solscan.io/tx/{res.sig}")
+        return res
+
+_PIPELINE: Pipeline | None = None
+
+def pipeline() -> Pipeline:
+    """Process-wide Pipeline (keypair/RPC client/session loaded once)."""
+    global _PIPELINE
+    if _PIPELINE is None:
+        _PIPELINE = Pipeline()
+    return _PIPELINE
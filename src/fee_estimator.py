@@ -0,0 +1,147 @@
+from __future__ import annotations
+import os, time, sqlite3, threading
+from dataclasses import dataclass
+from pathlib import Path
+
+from src.rpc_pool import pool
+from src.confirm_tracker import DB_PATH, ensure_columns, SOL_MINT
+
+# Priority fee per trade instead of Jupiter's "auto". The market rate comes from
+# getRecentPrioritizationFees for the accounts the route writes (each leg's ammKey,
+# plus the two mints), merged by slot into a rolling window of the last
+# PRIO_FEE_WINDOW_SLOTS slots and resampled at most every PRIO_FEE_SAMPLE_MS. Which
+# percentile of that window to pay is learned from our own trades: over the last
+# PRIO_FEE_LEARN_N finalized ones (src.confirm_tracker), if fewer than
+# PRIO_FEE_SLO_HIT of them landed within PRIO_FEE_SLO_MS the percentile steps up;
+# if all of them landed well inside it (median under half the SLO), it steps down.
+# The compute-unit price (micro-lamports/CU) times the CU estimate, the p90 of the
+# units our confirmed swaps on that side consumed (+PRIO_CU_MARGIN), gives the
+# integer prioritizationFeeLamports for /swap, clamped to [PRIO_FEE_MIN, PRIO_FEE_MAX].
+# PRIO_FEE_LAMPORTS=<int> pins the fee, PRIO_FEE_LAMPORTS=auto restores Jupiter's;
+# if sampling fails with nothing cached, "auto" is used for that trade.
+MODE        = os.getenv("PRIO_FEE_LAMPORTS", "adaptive").strip().lower()
+SAMPLE_MS   = int(os.getenv("PRIO_FEE_SAMPLE_MS", "5000"))
+WINDOW_SLOTS = int(os.getenv("PRIO_FEE_WINDOW_SLOTS", "150"))
+SLO_MS      = float(os.getenv("PRIO_FEE_SLO_MS", "8000"))
+SLO_HIT     = float(os.getenv("PRIO_FEE_SLO_HIT", "0.9"))
+LEARN_N     = int(os.getenv("PRIO_FEE_LEARN_N", "20"))
+PCT_START   = float(os.getenv("PRIO_FEE_PCT", "50"))
+PCT_MIN, PCT_MAX = float(os.getenv("PRIO_FEE_PCT_MIN", "25")), float(os.getenv("PRIO_FEE_PCT_MAX", "95"))
+PCT_STEP    = float(os.getenv("PRIO_FEE_PCT_STEP", "10"))
+FEE_MIN     = int(os.getenv("PRIO_FEE_MIN", "1000"))
+FEE_MAX     = int(os.getenv("PRIO_FEE_MAX", "2000000"))       # 0.002 SOL
+CU_DEFAULT  = int(os.getenv("PRIO_CU_DEFAULT", "300000"))
+CU_MARGIN   = float(os.getenv("PRIO_CU_MARGIN", "0.1"))
+LEARN_TTL_S = 30.0
+
+@dataclass
+class Fee:
+    lamports: int | str           # /swap prioritizationFeeLamports: int, or "auto" (fallback)
+    pct: float | None = None      # percentile of the fee window paid
+    cu_price: int | None = None   # micro-lamports per CU at that percentile
+    cu: int | None = None         # compute units the fee was spread over
+
+def percentile(xs: list[int], pct: float) -> int:
+    if not xs:
+        return 0
+    s = sorted(xs)
+    return s[min(len(s) - 1, int(round(pct / 100.0 * (len(s) - 1))))]
+
+def accounts_of(quote: dict) -> list[str]:
+    """Writable accounts the route contends on: each leg's AMM, plus both mints."""
+    keys = [(leg.get("swapInfo") or {}).get("ammKey") for leg in quote.get("routePlan") or []]
+    keys += [quote.get("inputMint"), quote.get("outputMint")]
+    return sorted({k for k in keys if k})[:128]
+
+class FeeEstimator:
+    def __init__(self, db: Path = DB_PATH):
+        self.db = db
+        self.windows: dict[tuple, dict[int, int]] = {}   # accounts -> {slot: fee}
+        self.sampled: dict[tuple, float] = {}
+        self.learned: dict[str, tuple[float, float, int]] = {}   # side -> (at, pct, cu)
+        self.last: Fee | None = None
+        self._lock = threading.Lock()
+
+    # ---- market ----
+    def window(self, accounts: list[str]) -> list[int]:
+        """Recent per-slot fees for `accounts`, resampled when older than SAMPLE_MS."""
+        key = tuple(accounts)
+        if time.monotonic() - self.sampled.get(key, 0.0) > SAMPLE_MS / 1000.0:
+            try:
+                got = pool().request("getRecentPrioritizationFees", [list(accounts)]) or []
+            except Exception:
+                got = []
+            with self._lock:
+                w = self.windows.setdefault(key, {})
+                for r in got:
+                    w[int(r["slot"])] = int(r["prioritizationFee"])
+                if w:
+                    top = max(w)
+                    for s in [s for s in w if s <= top - WINDOW_SLOTS]:
+                        del w[s]
+                if got:
+                    self.sampled[key] = time.monotonic()
+        with self._lock:
+            return list(self.windows.get(key, {}).values())
+
+    # ---- our own history ----
+    def learn(self, side: str) -> tuple[float, int]:
+        """(percentile to pay, CU estimate) for `side` from recently finalized trades."""
+        hit = self.learned.get(side)
+        if hit and time.monotonic() - hit[0] < LEARN_TTL_S:
+            return hit[1], hit[2]
+        pct, cu = PCT_START, CU_DEFAULT
+        if self.db.exists():
+            con = sqlite3.connect(self.db)
+            try:
+                ensure_columns(con)
+                rows = con.execute(
+                    "SELECT status, land_ms, prio_pct FROM trades WHERE prio_pct IS NOT NULL "
+                    "AND status IN ('confirmed', 'expired') ORDER BY sent_ms DESC LIMIT ?", (LEARN_N,)).fetchall()
+                used = [r[0] for r in con.execute(
+                    "SELECT cu_consumed FROM trades WHERE side LIKE ? AND status='confirmed' AND cu_consumed IS NOT NULL "
+                    "ORDER BY ts DESC LIMIT ?", (f"{side}%", LEARN_N))]
+            finally:
+                con.close()
+            if rows:
+                pct = float(rows[0][2])
+                lands = sorted(r[1] for r in rows if r[0] == "confirmed" and r[1] is not None)
+                hits = sum(1 for x in lands if x <= SLO_MS)
+                if hits < SLO_HIT * len(rows):
+                    pct += PCT_STEP
+                elif hits == len(rows) and lands[len(lands) // 2] < SLO_MS / 2:
+                    pct -= PCT_STEP
+                pct = min(PCT_MAX, max(PCT_MIN, pct))
+            if used:
+                cu = int(percentile(used, 90) * (1 + CU_MARGIN))
+        self.learned[side] = (time.monotonic(), pct, cu)
+        return pct, cu
+
+    # ---- per trade ----
+    def fee_for(self, quote: dict) -> Fee:
+        if MODE == "auto":
+            return Fee("auto")
+        if MODE.isdigit():
+            return Fee(int(MODE))
+        side = "SELL" if quote.get("inputMint") == SOL_MINT else "BUY"
+        fees = self.window(accounts_of(quote))
+        if not fees:
+            return Fee("auto")
+        pct, cu = self.learn(side)
+        price = percentile(fees, pct)
+        fee = Fee(min(FEE_MAX, max(FEE_MIN, price * cu // 1_000_000)), pct, price, cu)
+        self.last = fee
+        return fee
+
+    def status(self) -> dict:
+        f = self.last
+        return {"mode": MODE, "pct": f.pct if f else None, "cu_price": f.cu_price if f else None,
+                "cu": f.cu if f else None, "lamports": f.lamports if f else None}
+
+_ESTIMATOR: FeeEstimator | None = None
+
+def estimator() -> FeeEstimator:
+    global _ESTIMATOR
+    if _ESTIMATOR is None:
+        _ESTIMATOR = FeeEstimator()
+    return _ESTIMATOR
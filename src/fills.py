@@ -0,0 +1,97 @@
+from __future__ import annotations
+import numpy as np
+
+# exit reason codes returned by first_touch
+NONE, STOP, TP, SIGNAL = 0, 1, 2, 3
+REASONS = {NONE: "OPEN", STOP: "STOP_ATR", TP: "TAKE_PROFIT_ATR", SIGNAL: "SIGNAL"}
+
+MAX_CELLS = 4_000_000  # trades x horizon cells per vectorized block
+
+def first_touch(high, low, entry_idx, stop, tp, exit_mask=None, horizon: int = 256):
+    """
+    For each trade entered at the close of bar entry_idx[k], find the first later bar whose
+    low <= stop[k] or high >= tp[k] (or where exit_mask is True, a close-based exit).
+    Returns (exit_idx, reason, ambiguous):
+      exit_idx  -1 if nothing triggered before the data ends
+      reason    STOP/TP/SIGNAL/NONE; a touch beats a close signal on the same bar
+      ambiguous bar breached both levels, so the order inside it is unknown (reported as STOP)
+    The search runs on 2-D blocks of bars; trades still open after `horizon` bars are
+    retried with a doubled horizon, so there is no per-bar Python loop.
+    """
+    high = np.asarray(high, dtype=float); low = np.asarray(low, dtype=float)
+    e = np.asarray(entry_idx, dtype=np.int64)
+    stop = np.broadcast_to(np.asarray(stop, dtype=float), e.shape)
+    tp = np.broadcast_to(np.asarray(tp, dtype=float), e.shape)
+    mask = None if exit_mask is None else np.asarray(exit_mask, dtype=bool)
+    n, m = len(high), len(e)
+
+    exit_idx = np.full(m, -1, dtype=np.int64)
+    reason = np.zeros(m, dtype=np.int8)
+    ambiguous = np.zeros(m, dtype=bool)
+    todo = np.arange(m)
+    off = np.zeros(m, dtype=np.int64)  # bars already scanned per trade
+    H = max(1, int(horizon))
+    while len(todo):
+        step = max(1, MAX_CELLS // H)
+        still = []
+        for a in range(0, len(todo), step):
+            k = todo[a:a + step]
+            idx = e[k, None] + 1 + off[k, None] + np.arange(H)
+            valid = idx < n
+            ci = np.minimum(idx, n - 1)
+            hs = (low[ci] <= stop[k, None]) & valid
+            ht = (high[ci] >= tp[k, None]) & valid
+            hit = hs | ht
+            if mask is not None:
+                hit |= mask[ci] & valid
+            found = hit.any(axis=1)
+            j = hit.argmax(axis=1)
+            rows = np.arange(len(k))
+            s_j, t_j = hs[rows, j], ht[rows, j]
+            kk = k[found]
+            exit_idx[kk] = idx[rows, j][found]
+            reason[kk] = np.where(s_j, STOP, np.where(t_j, TP, SIGNAL))[found]
+            ambiguous[kk] = (s_j & t_j)[found]
+            # not found and more bars left -> widen the window next round
+            more = ~found & (idx[:, -1] < n - 1)
+            off[k[more]] += H
+            still.append(k[more])
+        todo = np.concatenate(still) if still else np.array([], dtype=np.int64)
+        H *= 2
+    return exit_idx, reason, ambiguous
+
+def fill_prices(open_, close, exit_idx, reason, stop, tp):
+    """
+    Exit fill per trade: the touched level, or the bar open if it gapped through it;
+    close for SIGNAL exits; NaN when still open.
+    """
+    open_ = np.asarray(open_, dtype=float); close = np.asarray(close, dtype=float)
+    i = np.maximum(exit_idx, 0)
+    stop = np.broadcast_to(np.asarray(stop, dtype=float), i.shape)
+    tp = np.broadcast_to(np.asarray(tp, dtype=float), i.shape)
+    o = open_[i]
+    px = np.where(reason == STOP, np.minimum(o, stop),
+         np.where(reason == TP, np.maximum(o, tp), close[i]))
+    return np.where(exit_idx < 0, np.nan, px)
+
+def refine_with_1m(bar_time_ms, bar_ms: int, exit_idx, reason, ambiguous, stop, tp, m1: dict):
+    """
+    Resolve ambiguous bars (both levels inside one bar) by replaying that bar's 1m path.
+    `m1` is ohlcv_store.columns(symbol, "1m"). Updates reason/ambiguous in place for the
+    bars that the 1m data can settle; bars without 1m coverage keep the STOP default.
+    """
+    t = m1["time"]
+    stop = np.broadcast_to(np.asarray(stop, dtype=float), reason.shape)
+    tp = np.broadcast_to(np.asarray(tp, dtype=float), reason.shape)
+    for k in np.flatnonzero(ambiguous):
+        t0 = int(bar_time_ms[exit_idx[k]])
+        a = int(np.searchsorted(t, t0, side="left"))
+        b = int(np.searchsorted(t, t0 + bar_ms, side="left"))
+        if b <= a:
+            continue
+        # entry index -1 => scan starts at the first 1m bar of the slice
+        ex, rs, amb = first_touch(m1["high"][a:b], m1["low"][a:b], [-1], stop[k], tp[k], horizon=b - a)
+        if ex[0] >= 0 and not amb[0]:
+            reason[k] = rs[0]
+            ambiguous[k] = False
+    return reason, ambiguous
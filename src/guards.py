@@ -0,0 +1,65 @@
+from __future__ import annotations
+import os
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+# Pure trade-gating rules shared by the live path (main.py, sell_guarded, buy_guarded)
+# and the paper-trading replay (src.paper_trade). No I/O, no RPC: callers pass in
+# balances, prices, clocks and trade counts, so the same rules run at replay speed.
+
+@dataclass
+class LoopCfg:
+    """main.py scheduling: loop period, cooldowns, daily caps, which sides run."""
+    interval_sec: int
+    buy_cooldown_min: int
+    sell_cooldown_min: int
+    auto_enable_buy: bool
+    auto_enable_sell: bool
+    max_daily_buys: int
+    max_daily_sells: int
+
+def load_loop_cfg() -> LoopCfg:
+    return LoopCfg(
+        interval_sec=int(os.getenv("BOT_INTERVAL_SEC", "60")),
+        buy_cooldown_min=int(os.getenv("BUY_COOLDOWN_MIN", "60")),
+        sell_cooldown_min=int(os.getenv("SELL_COOLDOWN_MIN", "180")),
+        auto_enable_buy=os.getenv("AUTO_ENABLE_BUY", "false").lower() == "true",
+        auto_enable_sell=os.getenv("AUTO_ENABLE_SELL", "true").lower() == "true",
+        max_daily_buys=int(os.getenv("MAX_DAILY_BUYS", "9999")),
+        max_daily_sells=int(os.getenv("MAX_DAILY_SELLS", "9999")),
+    )
+
+def utc_midnight_ts(now: datetime) -> int:
+    """Start of `now`'s UTC day (epoch s); daily caps count trades since then."""
+    return int(now.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0).timestamp())
+
+def daily_cap_reached(done_today: int, cap: int) -> bool:
+    return done_today >= cap
+
+def sell_balance_guard(balance_sol: float, min_sol_reserve: float, min_sell_sol: float) -> tuple[bool, str]:
+    """sell_guarded, first check (before any price lookup): enough SOL above the reserve."""
+    if balance_sol - min_sol_reserve < min_sell_sol:
+        return False, (f"balance {balance_sol:.6f} SOL too small after reserve {min_sol_reserve} "
+                       f"(need >= {min_sell_sol}).")
+    return True, f"balance {balance_sol:.6f} SOL"
+
+def sell_price_guard(last_buy_px: float | None, now_px: float | None, min_profit_bps: int) -> tuple[bool, str]:
+    """sell_guarded, second check: a price, a prior BUY, and price >= last BUY + min_profit_bps."""
+    if now_px is None:
+        return False, "price unavailable (all sources failed); will retry next loop."
+    if last_buy_px is None:
+        return False, f"no prior BUY price found; skipping SELL for safety. (now {now_px:.4f} USDC/SOL)"
+    need = sell_target(last_buy_px, min_profit_bps)
+    if now_px < need:
+        return False, f"now {now_px:.4f} < target {need:.4f} (last_buy {last_buy_px:.4f} + {min_profit_bps}bps)."
+    return True, f"now {now_px:.4f} >= target {need:.4f}"
+
+def sell_target(last_buy_px: float, min_profit_bps: int) -> float:
+    return last_buy_px * (1 + min_profit_bps / 10_000.0)
+
+def buy_guard(balance_usdc: float, min_usdc_reserve: float, buy_usdc: float) -> tuple[bool, str]:
+    """buy_guarded rule: spend only what sits above the USDC reserve."""
+    if balance_usdc - min_usdc_reserve < buy_usdc:
+        need = buy_usdc + min_usdc_reserve
+        return False, f"need >= {need:.2f} USDC (buy+reserve); have {balance_usdc:.2f}."
+    return True, f"USDC balance={balance_usdc:.2f}"
@@ -1,7 +1,13 @@
 from __future__ import annotations
-from typing import Sequence, Tuple, List
+from typing import Sequence, Tuple, List, Optional
+from collections import deque
 import math
+try:
+    from src.profiling import timed
+except ModuleNotFoundError:   # imported from a script run out of src/
+    from profiling import timed
 
+@timed("ind.sma")
 def sma(values: Sequence[float], period: int) -> List[float]:
     out: List[float] = []
     if period <= 0: raise ValueError("period must be > 0")
@@ -12,6 +18,7 @@ def sma(values: Sequence[float], period: int) -> List[float]:
         if i >= period - 1: out.append(s / period)
     return out
 
+@timed("ind.rolling_std")
 def rolling_std(values: Sequence[float], period: int) -> List[float]:
     out: List[float] = []
     if period <= 0: raise ValueError("period must be > 0")
@@ -39,6 +46,7 @@ def rolling_std(values: Sequence[float], period: int) -> List[float]:
             out.append(math.sqrt(var))
     return out
 
+@timed("ind.bollinger_bands")
 def bollinger_bands(
     closes: Sequence[float], period: int = 20, k: float = 2.0
 ) -> Tuple[List[float], List[float], List[float]]:
@@ -53,3 +61,93 @@ def bollinger_bands(
     upper = [m + k*s for m, s in zip(mid, std)]
     lower = [m - k*s for m, s in zip(mid, std)]
     return upper, mid, lower
+
+# ---- incremental (streaming) indicators ----
+# One bar at a time, matching the pandas versions used by the backtests:
+# ewm(adjust=False) EMAs, rolling(period) mean/std(ddof=0), RSI with fillna(50).
+
+class EMA:
+    def __init__(self, n: int):
+        if n <= 0: raise ValueError("n must be > 0")
+        self.alpha = 2.0 / (n + 1.0)
+        self.value: Optional[float] = None
+
+    def update(self, x: float) -> float:
+        self.value = x if self.value is None else self.value + self.alpha * (x - self.value)
+        return self.value
+
+class RollingBands:
+    """Rolling mean and population std over the last `period` values (None until full)."""
+    def __init__(self, period: int, k: float = 2.0):
+        if period <= 0: raise ValueError("period must be > 0")
+        self.period, self.k = period, k
+        self.q: deque = deque(maxlen=period)
+        self.mid: Optional[float] = None
+        self.std: Optional[float] = None
+
+    def update(self, x: float) -> Optional[Tuple[float, float, float]]:
+        self.q.append(x)
+        if len(self.q) < self.period:
+            return None
+        m = sum(self.q) / self.period
+        self.mid = m
+        self.std = math.sqrt(sum((v - m) * (v - m) for v in self.q) / self.period)
+        return self.upper, self.mid, self.lower
+
+    @property
+    def upper(self) -> Optional[float]:
+        return None if self.mid is None else self.mid + self.k * self.std
+
+    @property
+    def lower(self) -> Optional[float]:
+        return None if self.mid is None else self.mid - self.k * self.std
+
+class RollingMean:
+    """Mean of the last `period` values (None until full)."""
+    def __init__(self, period: int):
+        if period <= 0: raise ValueError("period must be > 0")
+        self.period = period
+        self.q: deque = deque(maxlen=period)
+        self.value: Optional[float] = None
+
+    def update(self, x: float) -> Optional[float]:
+        self.q.append(x)
+        if len(self.q) == self.period:
+            self.value = sum(self.q) / self.period
+        return self.value
+
+class RSI:
+    """Wilder RSI via ewm(alpha=1/n, adjust=False); 50 while undefined."""
+    def __init__(self, n: int = 14):
+        self.alpha = 1.0 / n
+        self.prev: Optional[float] = None
+        self.gain: Optional[float] = None
+        self.loss: Optional[float] = None
+        self.value = 50.0
+
+    def update(self, x: float) -> float:
+        d = 0.0 if self.prev is None else x - self.prev
+        up, dn = (d if d > 0 else 0.0), (-d if d < 0 else 0.0)
+        if self.gain is None:
+            self.gain, self.loss = up, dn
+        else:
+            self.gain += self.alpha * (up - self.gain)
+            self.loss += self.alpha * (dn - self.loss)
+        self.prev = x
+        self.value = 50.0 if self.loss == 0 else 100.0 - 100.0 / (1.0 + self.gain / self.loss)
+        return self.value
+
+class ATR:
+    """True range smoothed with ewm(span=n, adjust=False)."""
+    def __init__(self, n: int = 14):
+        self.ema = EMA(n)
+        self.prev_close: Optional[float] = None
+        self.value: Optional[float] = None
+
+    def update(self, high: float, low: float, close: float) -> float:
+        tr = high - low
+        if self.prev_close is not None:
+            tr = max(tr, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+        self.value = self.ema.update(tr)
+        return self.value
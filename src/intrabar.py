@@ -0,0 +1,186 @@
+from __future__ import annotations
+import os, sys, json
+import numpy as np
+import pandas as pd
+
+from src import ohlcv_store
+
+# Signals are evaluated on the strategy timeframe (15m/4h), but every fill, stop,
+# target and trailing exit is simulated on the 1m path, read chunk by chunk from the
+# OHLCV store so memory stays bounded regardless of history length.
+SYMBOL     = os.getenv("BB_SYMBOL", "SOLUSDT").upper()
+INTERVAL   = os.getenv("BB_INTERVAL", "15m")
+CHUNK_1M   = int(os.getenv("INTRABAR_CHUNK", "200000"))
+FEE_BPS    = float(os.getenv("FEE_BPS", "5.0"))    # run_bb_tv's costs (bb_tv default)
+SLIP_BPS   = float(os.getenv("SLIP_BPS", "5.0"))
+TRAIL_PCT     = float(os.getenv("INTRABAR_TRAIL_PCT", "0"))  # 0 = no trailing stop
+
+def _env_num(name: str, cast=float):
+    v = os.getenv(name, "").strip()
+    return cast(float(v)) if v else None
+
+# Exit rules and costs default per strategy (RULES) so results stay comparable with
+# the bar backtest they refine; set INTRABAR_STOP_ATR / INTRABAR_TP_ATR /
+# INTRABAR_COOLDOWN_BARS to override (0 = no ATR stop / target / cooldown), and
+# INTRABAR_COST_BPS for the fee + slippage per side.
+ATR_STOP_MULT = _env_num("INTRABAR_STOP_ATR")
+ATR_TP_MULT   = _env_num("INTRABAR_TP_ATR")
+COOLDOWN_BARS = _env_num("INTRABAR_COOLDOWN_BARS", int)
+COST_BPS      = _env_num("INTRABAR_COST_BPS")
+
+def bb_tv_signals(df: pd.DataFrame) -> pd.DataFrame:
+    """run_bb_tv rules: enter on close crossing under the lower band, exit crossing above the mid."""
+    period = int(os.getenv("BB_PERIOD", "20")); k = float(os.getenv("BB_K", "2.0"))
+    close = df["close"].astype(float)
+    mid = close.rolling(period).mean(); std = close.rolling(period).std(ddof=0)
+    lower = mid - k * std
+    c_prev = close.shift(1)
+    return pd.DataFrame({
+        "entry": (c_prev >= lower.shift(1)) & (close < lower),
+        "exit": (c_prev <= mid.shift(1)) & (close > mid),
+    })
+
+def bb_atr_signals(df: pd.DataFrame) -> pd.DataFrame:
+    """run_backtest rules; its ATR comes along so stops/targets use the same series."""
+    from src import backtest_hybrid as bh
+    entry, exit_, _r, a = bh.bb_atr_signals(df)
+    return pd.DataFrame({"entry": entry, "exit": exit_, "atr": a})
+
+def _bb_atr_rules() -> dict:
+    from src import backtest_hybrid as bh
+    return {"stop_atr": bh.ATR_STOP_MULT, "tp_atr": bh.ATR_TP_MULT, "cooldown_bars": bh.COOLDOWN_BARS,
+            "cost_per_side": bh.COST_BPS_PER_SIDE}
+
+SIGNALS = {"bb_tv": bb_tv_signals, "bb_atr": bb_atr_signals}
+# default exit rules and costs of the bar backtest each strategy mirrors (run_bb_tv has no stops)
+RULES = {"bb_tv": lambda: {"cost_per_side": (FEE_BPS + SLIP_BPS) / 10_000.0}, "bb_atr": _bb_atr_rules}
+
+def rules(strategy: str) -> dict:
+    """Strategy defaults with the INTRABAR_* overrides applied."""
+    out = {"stop_atr": 0.0, "tp_atr": 0.0, "cooldown_bars": None, **RULES[strategy]()}
+    for key, env in (("stop_atr", ATR_STOP_MULT), ("tp_atr", ATR_TP_MULT), ("cooldown_bars", COOLDOWN_BARS),
+                     ("cost_per_side", COST_BPS / 10_000.0 if COST_BPS is not None else None)):
+        if env is not None:
+            out[key] = env
+    return out
+
+def _atr(df: pd.DataFrame, n: int = 14) -> np.ndarray:
+    c = df["close"].astype(float); pc = c.shift(1)
+    tr = pd.concat([df["high"] - df["low"], (df["high"] - pc).abs(), (df["low"] - pc).abs()], axis=1).max(axis=1)
+    return tr.ewm(span=n, adjust=False).mean().to_numpy()
+
+def _exit_in(o, h, l, pos, trail_pct):
+    """
+    First 1m bar in the window hitting stop, target or trailing level.
+    Trailing uses the peak *before* each bar; stop/trail win over target on the same bar.
+    Returns (index or -1, fill price, reason).
+    """
+    stop = pos["stop"]; tp = pos["tp"]
+    peak_before = np.maximum.accumulate(np.concatenate(([pos["peak"]], h[:-1])))
+    trail = peak_before * (1.0 - trail_pct) if trail_pct > 0 else np.full(len(h), -np.inf)
+    floor = np.maximum(stop, trail)
+    hit_dn = l <= floor
+    hit_up = h >= tp
+    hit = hit_dn | hit_up
+    if not hit.any():
+        pos["peak"] = max(pos["peak"], float(h.max())) if len(h) else pos["peak"]
+        return -1, None, None
+    j = int(hit.argmax())
+    if hit_dn[j]:
+        lvl = floor[j]
+        return j, min(float(o[j]), float(lvl)), "TRAIL" if trail[j] >= stop else "STOP"
+    return j, max(float(o[j]), float(tp)), "TP"
+
+def simulate(sig_time_ms: np.ndarray, entry: np.ndarray, exit_: np.ndarray, atr: np.ndarray,
+             bar_ms: int, symbol: str = SYMBOL, chunk: int = CHUNK_1M,
+             stop_atr: float = 0.0, tp_atr: float = 0.0, trail_pct: float = TRAIL_PCT,
+             cost_per_side: float | None = None, cooldown_bars: int | None = None) -> dict:
+    """
+    Replay strategy-timeframe signals against the 1m path.
+    A signal on bar t fills at the open of the first 1m bar at/after t + bar_ms (the bar close).
+    With `cooldown_bars` (run_backtest's COOLDOWN_BARS), no entry signal is taken on the
+    exit bar or the cooldown_bars bars after it.
+    """
+    cps = (FEE_BPS + SLIP_BPS) / 10_000.0 if cost_per_side is None else cost_per_side
+    e_ft = sig_time_ms[entry] + bar_ms; e_atr = atr[entry]
+    x_ft = sig_time_ms[exit_] + bar_ms
+    ei = xi = 0
+    pos = None
+    next_e_ft = -np.inf   # earliest entry fill allowed by the cooldown
+    trades = []
+    for ck in ohlcv_store.iter_chunks(symbol, "1m", chunk, start_ms=int(e_ft[0]) if len(e_ft) else None):
+        if pos is None and ei >= len(e_ft):
+            break
+        t = ck["time"].to_numpy(); o = ck["open"].to_numpy()
+        h = ck["high"].to_numpy(); l = ck["low"].to_numpy()
+        i = 0
+        while i < len(t):
+            if pos is None:
+                while ei < len(e_ft) and (e_ft[ei] < t[i] or e_ft[ei] < next_e_ft):
+                    ei += 1  # signals that fired while we were in a trade (or cooling down)
+                if ei >= len(e_ft):
+                    break
+                j = int(np.searchsorted(t, e_ft[ei], side="left"))
+                if j >= len(t):
+                    break  # entry falls in a later chunk
+                px = float(o[j]); a = float(e_atr[ei]) if np.isfinite(e_atr[ei]) else 0.0
+                pos = {"entry_t": int(t[j]), "entry_px": px, "peak": px,
+                       "stop": px - stop_atr * a if stop_atr > 0 else -np.inf,
+                       "tp": px + tp_atr * a if tp_atr > 0 else np.inf}
+                ei += 1
+                while xi < len(x_ft) and x_ft[xi] <= pos["entry_t"]:
+                    xi += 1
+                i = j
+                continue
+            jx = int(np.searchsorted(t, x_ft[xi], side="left")) if xi < len(x_ft) else len(t)
+            k, px, why = _exit_in(o[i:jx], h[i:jx], l[i:jx], pos, trail_pct)
+            if k >= 0:
+                k += i
+            elif jx < len(t):
+                k, px, why = jx, float(o[jx]), "SIGNAL"
+                xi += 1
+            else:
+                break  # still open at chunk end; state carries into the next chunk
+            gross = px / pos["entry_px"] - 1.0
+            net = (px * (1.0 - cps)) / (pos["entry_px"] * (1.0 + cps)) - 1.0
+            trades.append({"entry_t": pos["entry_t"], "exit_t": int(t[k]),
+                           "entry_px": pos["entry_px"], "exit_px": px,
+                           "gross_ret": gross, "ret": net, "reason": why})
+            pos = None
+            if cooldown_bars is not None:
+                # the bar the exit belongs to: a SIGNAL exit fills at the open after its bar
+                xb = int(t[k]) - (bar_ms if why == "SIGNAL" else 0)
+                next_e_ft = xb - xb % bar_ms + (cooldown_bars + 2) * bar_ms
+            i = k + 1 if why != "SIGNAL" else k
+
+    rets = np.array([tr["ret"] for tr in trades], dtype=float)
+    eq = np.concatenate(([1.0], np.cumprod(1.0 + rets)))
+    mdd = float(np.max(1.0 - eq / np.maximum.accumulate(eq))) if len(eq) else 0.0
+    wins = int((rets > 0).sum())
+    return {
+        "trades": int(len(trades)), "wins": wins, "losses": int(len(trades) - wins),
+        "win_rate_pct": round(100.0 * wins / max(1, len(trades)), 2),
+        "avg_trade_ret_pct": round(100.0 * float(rets.mean()) if len(rets) else 0.0, 4),
+        "equity_multiple": round(float(eq[-1]), 6),
+        "max_drawdown_pct": round(100.0 * mdd, 2),
+        "open_position": pos is not None,
+        "fill_model": "1m_open_after_close",
+        "trade_list": trades,
+    }
+
+def run(strategy: str = "bb_tv", symbol: str = SYMBOL, interval: str = INTERVAL,
+        start_ms=None, end_ms=None) -> dict:
+    df = ohlcv_store.load(symbol, interval, start_ms, end_ms)
+    sig = SIGNALS[strategy](df)
+    atr = sig["atr"].to_numpy(float) if "atr" in sig else _atr(df)
+    rl = rules(strategy)
+    out = simulate(df["time"].to_numpy(), sig["entry"].to_numpy(bool), sig["exit"].to_numpy(bool),
+                   atr, ohlcv_store.INTERVAL_MS[interval], symbol=symbol, **rl)
+    out.update({"symbol": symbol, "interval": interval, "strategy": strategy, "bars": int(len(df)), "rules": rl})
+    return out
+
+if __name__ == "__main__":
+    strat = sys.argv[1] if len(sys.argv) > 1 else "bb_tv"
+    res = run(strat)
+    res.pop("trade_list", None)
+    print(json.dumps(res, indent=2))
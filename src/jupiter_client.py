@@ -5,12 +5,14 @@ from decimal import Decimal, ROUND_DOWN
 import requests
 from dotenv import load_dotenv
 
-from solana.rpc.api import Client
-from solana.rpc.types import TxOpts
 
 from solders.keypair import Keypair
 from solders.transaction import VersionedTransaction  # deserialize/build v0 tx
 
+from src.rpc_pool import pinned
+from src.broadcast import broadcast
+from src.fee_estimator import estimator
+
 USDC_MINT = "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v"
 SOL_MINT  = "So11111111111111111111111111111111111111112"
 
@@ -24,7 +26,7 @@ def load_env():
     if not keypair_path:
         raise RuntimeError("KEYPAIR_PATH not set in .env")
     test_amount_usdc = Decimal(os.getenv("TEST_SWAP_USDC", "1.50"))
-    rpc_url = os.getenv("RPC_PRIMARY", "https://api.mainnet-beta.solana.com")
+    rpc_url = pinned()   # None: best endpoint of the pool's latency ranking
     dry_run = os.getenv("DRY_RUN", "true").lower() == "true"
     return slippage_bps, keypair_path, test_amount_usdc, rpc_url, dry_run
 
@@ -59,6 +61,7 @@ def jup_swap(quote: dict, user_pubkey: str, slippage_bps: int):
         "wrapAndUnwrapSol": True,
         "asLegacyTransaction": False,
         "slippageBps": slippage_bps,
+        "prioritizationFeeLamports": estimator().fee_for(quote).lamports,
     }
     r = requests.post("https://quote-api.jup.ag/v6/swap", json=payload, timeout=30)
     r.raise_for_status()
@@ -78,7 +81,8 @@ def _fmt_route(q: dict) -> str:
         parts.append(f"{label}: {ia} -> {oa}")
     return " | ".join(parts) if parts else "(single hop)"
 
-def send_tx(tx_bytes: bytes, keypair_path: str, rpc_url: str, dry_run: bool):
+def send_tx(tx_bytes: bytes, keypair_path: str, rpc_url: str | None, dry_run: bool,
+            last_valid_block_height: int | None = None):
     if dry_run:
         print("[send_tx] DRY_RUN is true — skipping send.")
         return None
@@ -92,11 +96,13 @@ def send_tx(tx_bytes: bytes, keypair_path: str, rpc_url: str, dry_run: bool):
     signed_vtx = VersionedTransaction(unsigned_vtx.message, [kp])  # <- pass signers, not signatures
     raw = bytes(signed_vtx)
 
-    # Send via RPC
-    client = Client(rpc_url)
-    resp = client.send_raw_transaction(raw, opts=TxOpts(skip_preflight=False, preflight_commitment="processed"))
-    print(f"[send_tx] Sent! Signature: {resp}")
-    return str(resp)
+    # Fan out over the RPC pool (a pinned rpc_url first) and rebroadcast until landed/expired
+    out = broadcast(raw, last_valid_block_height, prefer=rpc_url)
+    print(f"[send_tx] {out.status} after {out.sends} sends"
+          f"{f' in {out.landed_ms:.0f} ms' if out.landed_ms is not None else ''} | Signature: {out.sig}")
+    if out.status in ("failed", "expired", "rejected"):
+        raise RuntimeError(f"tx {out.sig} {out.status}: {out.err}")
+    return out.sig
 
 def main():
     slippage_bps, keypair_path, test_amount_usdc, rpc_url, dry_run = load_env()
@@ -113,7 +119,7 @@ def main():
     tx_bytes, swap_resp = jup_swap(quote, user_pubkey, slippage_bps)
     print(f"[swap build] got base64 v0 tx (bytes={len(tx_bytes)}) in {int((time.time()-t1)*1000)} ms | lastValidBlockHeight: {swap_resp.get('lastValidBlockHeight','n/a')}")
 
-    sig = send_tx(tx_bytes, keypair_path, rpc_url, dry_run)
+    sig = send_tx(tx_bytes, keypair_path, rpc_url, dry_run, swap_resp.get("lastValidBlockHeight"))
     if sig:
         print(f"[success] tx sig: {sig}")
 
@@ -17,17 +17,26 @@ if ENV.exists():
         k, v = line.split("=", 1)
         os.environ.setdefault(k.strip(), v.strip())
 
-# ---- config ----
-INTERVAL_SEC       = int(os.getenv("BOT_INTERVAL_SEC", "60"))
-BUY_COOLDOWN_MIN   = int(os.getenv("BUY_COOLDOWN_MIN", "60"))
-SELL_COOLDOWN_MIN  = int(os.getenv("SELL_COOLDOWN_MIN", "180"))
-AUTO_ENABLE_BUY    = os.getenv("AUTO_ENABLE_BUY", "false").lower() == "true"
-AUTO_ENABLE_SELL   = os.getenv("AUTO_ENABLE_SELL", "true").lower() == "true"
-MAX_DAILY_BUYS     = int(os.getenv("MAX_DAILY_BUYS",  "9999"))
-MAX_DAILY_SELLS    = int(os.getenv("MAX_DAILY_SELLS", "9999"))
+# ---- config (rules shared with src.paper_trade via src.guards) ----
+from src.guards import load_loop_cfg, utc_midnight_ts, daily_cap_reached  # noqa: E402
+from src import bar_clock  # noqa: E402
+from src.confirm_tracker import ensure_columns, NOT_FAILED_SQL  # noqa: E402
+CFG = load_loop_cfg()
+INTERVAL_SEC       = CFG.interval_sec
+BUY_COOLDOWN_MIN   = CFG.buy_cooldown_min
+SELL_COOLDOWN_MIN  = CFG.sell_cooldown_min
+AUTO_ENABLE_BUY    = CFG.auto_enable_buy
+AUTO_ENABLE_SELL   = CFG.auto_enable_sell
+MAX_DAILY_BUYS     = CFG.max_daily_buys
+MAX_DAILY_SELLS    = CFG.max_daily_sells
 
 BUY_MOD  = "src.buy_guarded"
 SELL_MOD = "src.sell_guarded"
+# 1 = old behaviour: guard/execute/notify as child processes (cold keypair/RPC each trade)
+EXEC_SUBPROCESS = os.getenv("BOT_EXEC_SUBPROCESS", "0") == "1"
+# 1 = wake on wall-clock multiples of INTERVAL_SEC (src.bar_clock) instead of sleeping
+# INTERVAL_SEC minus the loop's run time, so passes don't drift against bar closes
+ALIGN = os.getenv("BOT_ALIGN", "1") == "1"
 DB_PATH  = ROOT / "data" / "trades.sqlite"
 COOLDOWN_BUY  = DATA / "next_buy_at.txt"
 COOLDOWN_SELL = DATA / "next_sell_at.txt"
@@ -52,6 +61,11 @@ def _read_dt(p: Path) -> datetime:
     except Exception:
         return datetime.min
 
+def side_ready(side: str, lead_s: float = 0.0) -> bool:
+    """AUTO_ENABLE_<side> on and its cooldown over (or ending within `lead_s`)."""
+    enabled, cooldown = (AUTO_ENABLE_SELL, COOLDOWN_SELL) if side == "SELL" else (AUTO_ENABLE_BUY, COOLDOWN_BUY)
+    return enabled and datetime.now() + timedelta(seconds=lead_s) >= _read_dt(cooldown)
+
 def _write_dt(p: Path, dt: datetime) -> None:
     p.write_text(dt.isoformat())
 
@@ -71,17 +85,43 @@ def run_py(module: str, name: str) -> int:
         log(f"{name}: crashed: {e}")
         return 1
 
+def run_side(side: str) -> int:
+    """Guarded SELL/BUY via the in-process pipeline (src.execution); same rc as the CLI modules."""
+    if EXEC_SUBPROCESS:
+        return run_py(SELL_MOD if side == "SELL" else BUY_MOD, side)
+    try:
+        from src.execution import pipeline
+        log(f"{side}: starting…")
+        p = pipeline()
+        res = p.sell() if side == "SELL" else p.buy()
+        stages = " ".join(f"{k}={v:.0f}ms" for k, v in res.ms.items())
+        log(f"{side}: rc {res.rc} {res.msg} {stages}".rstrip())
+        return res.rc
+    except Exception as e:
+        log(f"{side}: crashed: {e!r}")
+        return 1
+
+def notify() -> None:
+    if EXEC_SUBPROCESS:
+        subprocess.call([sys.executable, "-m", "src.notify_trade"], cwd=str(ROOT))
+        return
+    try:
+        from src.execution import pipeline
+        pipeline().notify()
+    except Exception as e:
+        log(f"notify failed: {e!r}")
+
 def _count_trades_today(side_prefix: str) -> int:
-    """Count trades since UTC midnight with non-null tx_sig."""
+    """Count trades since UTC midnight with non-null tx_sig that did not fail or expire."""
     if not DB_PATH.exists():
         return 0
     try:
-        midnight_utc = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-        since = int(midnight_utc.timestamp())
+        since = utc_midnight_ts(datetime.now(timezone.utc))
         conn = sqlite3.connect(DB_PATH)
+        ensure_columns(conn)
         cur = conn.cursor()
         cur.execute(
-            "SELECT COUNT(*) FROM trades WHERE side LIKE ? AND tx_sig IS NOT NULL AND ts >= ?",
+            f"SELECT COUNT(*) FROM trades WHERE side LIKE ? AND tx_sig IS NOT NULL AND {NOT_FAILED_SQL} AND ts >= ?",
             (f"{side_prefix}%", since),
         )
         (cnt,) = cur.fetchone() or (0,)
@@ -98,6 +138,43 @@ def _graceful_exit(signum, frame):
 signal.signal(signal.SIGINT, _graceful_exit)
 signal.signal(signal.SIGTERM, _graceful_exit)
 
+def trade_once(on_trade=None) -> None:
+    """One pass of the guarded SELL then BUY paths (cooldowns, daily caps).
+    `on_trade` runs after a successful trade; default: notify in-process."""
+    on_trade = on_trade or notify
+    # -- SELL path --
+    if AUTO_ENABLE_SELL:
+        if datetime.now() >= _read_dt(COOLDOWN_SELL):
+            sells_today = _count_trades_today("SELL")
+            if daily_cap_reached(sells_today, MAX_DAILY_SELLS):
+                log(f"SELL: daily cap reached ({sells_today}/{MAX_DAILY_SELLS}); skipping")
+            else:
+                rc = run_side("SELL")
+                if rc == 0:
+                    _write_dt(COOLDOWN_SELL, datetime.now() + timedelta(minutes=SELL_COOLDOWN_MIN))
+                    on_trade()
+                else:
+                    log(f"SELL: cooldown not set (rc={rc})")
+        else:
+            until = _read_dt(COOLDOWN_SELL).strftime("%H:%M")
+            log(f"SELL: cooldown active until {until} (AUTO_ENABLE_SELL=true)")
+    else:
+        log("SELL: skipped (AUTO_ENABLE_SELL=false)")
+
+    # -- BUY path --
+    if AUTO_ENABLE_BUY:
+        if datetime.now() >= _read_dt(COOLDOWN_BUY):
+            buys_today = _count_trades_today("BUY")
+            if daily_cap_reached(buys_today, MAX_DAILY_BUYS):
+                log(f"BUY: daily cap reached ({buys_today}/{MAX_DAILY_BUYS}); skipping")
+            else:
+                rc = run_side("BUY")
+                # we keep cooldown even if guard skipped, to avoid tight loops
+                _write_dt(COOLDOWN_BUY, datetime.now() + timedelta(minutes=BUY_COOLDOWN_MIN))
+                if rc == 0:
+                    on_trade()
+        # else: silent until cooldown expires
+
 # ---- main loop ----
 def main():
     log("=== bot main loop started ===")
@@ -112,44 +189,15 @@ def main():
 
     while True:
         loop_started = datetime.now()
-
-        # -- SELL path --
-        if AUTO_ENABLE_SELL:
-            if datetime.now() >= _read_dt(COOLDOWN_SELL):
-                sells_today = _count_trades_today("SELL")
-                if sells_today >= MAX_DAILY_SELLS:
-                    log(f"SELL: daily cap reached ({sells_today}/{MAX_DAILY_SELLS}); skipping")
-                else:
-                    rc = run_py(SELL_MOD, "SELL")
-                    if rc == 0:
-                        _write_dt(COOLDOWN_SELL, datetime.now() + timedelta(minutes=SELL_COOLDOWN_MIN))
-                        subprocess.call([sys.executable, "-m", "src.notify_trade"], cwd=str(ROOT))
-                    else:
-                        log(f"SELL: cooldown not set (rc={rc})")
-            else:
-                until = _read_dt(COOLDOWN_SELL).strftime("%H:%M")
-                log(f"SELL: cooldown active until {until} (AUTO_ENABLE_SELL=true)")
-        else:
-            log("SELL: skipped (AUTO_ENABLE_SELL=false)")
-
-        # -- BUY path --
-        if AUTO_ENABLE_BUY:
-            if datetime.now() >= _read_dt(COOLDOWN_BUY):
-                buys_today = _count_trades_today("BUY")
-                if buys_today >= MAX_DAILY_BUYS:
-                    log(f"BUY: daily cap reached ({buys_today}/{MAX_DAILY_BUYS}); skipping")
-                else:
-                    rc = run_py(BUY_MOD, "BUY")
-                    # we keep cooldown even if guard skipped, to avoid tight loops
-                    _write_dt(COOLDOWN_BUY, datetime.now() + timedelta(minutes=BUY_COOLDOWN_MIN))
-                    if rc == 0:
-                        subprocess.call([sys.executable, "-m", "src.notify_trade"], cwd=str(ROOT))
-            # else: silent until cooldown expires
+        trade_once()
 
         _write_dt(HEARTBEAT, datetime.now())
-        elapsed = (datetime.now() - loop_started).total_seconds()
-        sleep_s = max(1, INTERVAL_SEC - int(elapsed))
-        log(f"sleeping {sleep_s}s")
+        if ALIGN:
+            sleep_s = bar_clock.wait_ms(INTERVAL_SEC * 1000, lag_ms=0) / 1000.0
+        else:
+            elapsed = (datetime.now() - loop_started).total_seconds()
+            sleep_s = max(1, INTERVAL_SEC - int(elapsed))
+        log(f"sleeping {sleep_s:.0f}s")
         time.sleep(sleep_s)
 
 if __name__ == "__main__":
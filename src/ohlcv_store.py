@@ -0,0 +1,124 @@
+from __future__ import annotations
+import sys, json
+from pathlib import Path
+from typing import Iterator
+import numpy as np
+import pandas as pd
+
+from src.profiling import timed, count
+
+ROOT = Path(__file__).resolve().parents[1]
+STORE_DIR = ROOT / "data" / "ohlcv"
+
+# One .npy file per column under data/ohlcv/<SYMBOL>_<INTERVAL>/.
+# time = bar open time in epoch ms (int64); prices/volume float64.
+# Files are opened with mmap_mode="r", so readers page in only what they touch
+# and worker processes share the OS page cache instead of copying the frame.
+COLS = ("time", "open", "high", "low", "close", "volume")
+
+INTERVAL_MS = {
+    "1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000,
+    "1h": 3_600_000, "2h": 7_200_000, "4h": 14_400_000, "1d": 86_400_000,
+}
+
+def series_dir(symbol: str, interval: str) -> Path:
+    return STORE_DIR / f"{symbol.upper()}_{interval}"
+
+def exists(symbol: str, interval: str) -> bool:
+    return (series_dir(symbol, interval) / "time.npy").exists()
+
+def columns(symbol: str, interval: str, cols=COLS) -> dict:
+    """Memory-mapped column arrays (read-only)."""
+    d = series_dir(symbol, interval)
+    if not (d / "time.npy").exists():
+        raise FileNotFoundError(
+            f"no OHLCV store at {d}; import one with: python -m src.ohlcv_store import {symbol} {interval} <csv|json>")
+    return {c: np.load(d / f"{c}.npy", mmap_mode="r") for c in cols}
+
+def _bounds(t: np.ndarray, start_ms=None, end_ms=None) -> tuple[int, int]:
+    i0 = 0 if start_ms is None else int(np.searchsorted(t, int(start_ms), side="left"))
+    i1 = len(t) if end_ms is None else int(np.searchsorted(t, int(end_ms), side="left"))
+    return i0, i1
+
+@timed("load.store_frame")
+def to_frame(cols: dict, i0: int = 0, i1: int | None = None) -> pd.DataFrame:
+    """DataFrame in the shape backtest_hybrid.fetch_klines returns (open_time/close_time datetimes)."""
+    i1 = len(cols["time"]) if i1 is None else i1
+    count("store_bars", i1 - i0)
+    df = pd.DataFrame({c: np.asarray(cols[c][i0:i1]) for c in cols if c != "time"})
+    t = np.asarray(cols["time"][i0:i1])
+    df.insert(0, "open_time", pd.to_datetime(t, unit="ms"))
+    df["time"] = t
+    return df
+
+def load(symbol: str, interval: str, start_ms=None, end_ms=None) -> pd.DataFrame:
+    """Bars with start_ms <= open time < end_ms (both optional)."""
+    cols = columns(symbol, interval)
+    i0, i1 = _bounds(cols["time"], start_ms, end_ms)
+    df = to_frame(cols, i0, i1)
+    step = INTERVAL_MS.get(interval)
+    if step:
+        df["close_time"] = df["open_time"] + pd.Timedelta(milliseconds=step - 1)
+    return df
+
+def iter_chunks(symbol: str, interval: str, chunk: int = 100_000,
+                start_ms=None, end_ms=None) -> Iterator[pd.DataFrame]:
+    """Fixed-size chunks in time order; only one chunk is materialized at a time."""
+    cols = columns(symbol, interval)
+    i0, i1 = _bounds(cols["time"], start_ms, end_ms)
+    for a in range(i0, i1, chunk):
+        yield to_frame(cols, a, min(a + chunk, i1))
+
+def read_source(path: Path) -> pd.DataFrame:
+    """Normalize the repo's kline dumps (binance_*.csv in seconds, *.json lists or dicts) to COLS."""
+    path = Path(path)
+    if path.suffix == ".csv":
+        df = pd.read_csv(path)
+    else:
+        raw = json.loads(path.read_text(encoding="utf-8", errors="ignore"))
+        if raw and isinstance(raw[0], dict):
+            df = pd.DataFrame(raw).rename(columns={"open_time": "time"})
+        else:
+            df = pd.DataFrame([r[:6] for r in raw], columns=list(COLS))
+    t = pd.to_numeric(df["time"], errors="coerce")
+    if pd.api.types.is_datetime64_any_dtype(df["time"]):
+        t = df["time"].to_numpy().astype("datetime64[ms]").astype("int64")
+    elif t.max() < 1e12:  # seconds
+        t = t * 1000
+    out = pd.DataFrame({"time": np.asarray(t, dtype="int64")})
+    for c in COLS[1:]:
+        out[c] = pd.to_numeric(df[c], errors="coerce").astype("float64")
+    return out.dropna(subset=["close"])
+
+def ingest(symbol: str, interval: str, df: pd.DataFrame) -> int:
+    """Merge bars into the store (dedup on open time, newest wins). Returns total bars."""
+    d = series_dir(symbol, interval)
+    d.mkdir(parents=True, exist_ok=True)
+    new = df[list(COLS)]
+    if exists(symbol, interval):
+        cur = pd.DataFrame({c: np.asarray(a) for c, a in columns(symbol, interval).items()})
+        new = pd.concat([cur, new], ignore_index=True)
+    new = new.drop_duplicates("time", keep="last").sort_values("time").reset_index(drop=True)
+    for c in COLS:
+        tmp = d / f"{c}.tmp.npy"
+        np.save(tmp, new[c].to_numpy(dtype="int64" if c == "time" else "float64"))
+        tmp.replace(d / f"{c}.npy")
+    return int(len(new))
+
+def main(argv: list[str]) -> int:
+    if len(argv) >= 4 and argv[0] == "import":
+        sym, itv, src = argv[1].upper(), argv[2], Path(argv[3])
+        n = ingest(sym, itv, read_source(src))
+        print(f"[ohlcv_store] {sym} {itv}: {n} bars in {series_dir(sym, itv)}")
+        return 0
+    if len(argv) >= 1 and argv[0] == "info":
+        for d in sorted(STORE_DIR.glob("*_*")):
+            t = np.load(d / "time.npy", mmap_mode="r")
+            span = f"{pd.to_datetime(int(t[0]), unit='ms')} → {pd.to_datetime(int(t[-1]), unit='ms')}" if len(t) else "-"
+            print(f"{d.name:<16} bars={len(t):<9} {span}")
+        return 0
+    print("Usage: python -m src.ohlcv_store import SYMBOL INTERVAL FILE | info")
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,295 @@
+from __future__ import annotations
+import os, sys, json, time, sqlite3, argparse
+from dataclasses import dataclass, asdict
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from src import ohlcv_store
+from src.guards import (LoopCfg, load_loop_cfg, daily_cap_reached,
+                        sell_balance_guard, sell_price_guard, buy_guard)
+
+ROOT = Path(__file__).resolve().parents[1]
+ENV = ROOT / "config" / ".env"
+DB_PATH = ROOT / "data" / "paper.sqlite"
+
+# Replays historical bars through main.py's loop (cooldowns, daily caps, which sides
+# run) and the sell_guarded / buy_guarded / sell_check rules, all via src.guards.
+# Each loop tick (BOT_INTERVAL_SEC) sees the close of the last finished bar as mid;
+# fills come from a quote curve: a simple Jupiter-like model (half spread + linear
+# impact + platform fee) or, where fresh, recorded quotes. Balances, cooldowns and
+# the last BUY live in memory, and fills go to their own DB (data/paper.sqlite),
+# never to trades.sqlite.
+SPREAD_BPS      = float(os.getenv("PAPER_SPREAD_BPS", "2"))          # full spread; half is paid per fill
+IMPACT_BPS_1K   = float(os.getenv("PAPER_IMPACT_BPS_PER_1K", "1.5")) # extra bps per 1,000 USDC notional
+FEE_BPS         = float(os.getenv("PLATFORM_FEE_BPS", "0"))
+TX_FEE_SOL      = float(os.getenv("PAPER_TX_FEE_SOL", "0.000005"))
+QUOTE_MAX_AGE_S = int(os.getenv("PAPER_QUOTE_MAX_AGE_S", "120"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS paper_runs (
+  run_id INTEGER PRIMARY KEY,
+  created_ts INTEGER NOT NULL,  -- epoch ms
+  source TEXT,                  -- SYMBOL_INTERVAL or file
+  start_ts INTEGER, end_ts INTEGER,
+  cfg TEXT NOT NULL,            -- loop/guard/curve settings (JSON)
+  summary TEXT                  -- end-of-run stats (JSON)
+);
+CREATE TABLE IF NOT EXISTS paper_trades (
+  id INTEGER PRIMARY KEY,
+  run_id INTEGER NOT NULL REFERENCES paper_runs(run_id) ON DELETE CASCADE,
+  ts INTEGER NOT NULL,          -- epoch s (simulated)
+  side TEXT NOT NULL,
+  symbol TEXT NOT NULL,
+  size_usdc REAL NOT NULL,
+  size_real REAL NOT NULL,      -- SOL
+  price REAL NOT NULL,          -- USDC/SOL filled
+  mid REAL NOT NULL,
+  impact_bps REAL NOT NULL,
+  in_amount REAL NOT NULL,
+  out_amount REAL NOT NULL,
+  quote_src TEXT NOT NULL,      -- model | recorded
+  reason TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_paper_trades_run ON paper_trades(run_id, ts);
+"""
+
+def _load_env_file(path: Path = ENV) -> None:
+    """Same .env as the live loop (main.py), without overriding the shell."""
+    if not path.exists():
+        return
+    for line in path.read_text().splitlines():
+        if not line.strip() or line.strip().startswith("#") or "=" not in line:
+            continue
+        k, v = line.split("=", 1)
+        os.environ.setdefault(k.strip(), v.strip())
+
+@dataclass
+class GuardCfg:
+    """sell_guarded / buy_guarded / sell_check settings (same env names)."""
+    sell_min_profit_bps: int
+    min_sell_sol: float
+    min_sol_reserve: float
+    buy_usdc: float
+    min_usdc_reserve: float
+    tp_sell_pct: float
+
+def load_guard_cfg() -> GuardCfg:
+    return GuardCfg(
+        sell_min_profit_bps=int(os.environ.get("SELL_MIN_PROFIT_BPS", "50")),
+        min_sell_sol=float(os.environ.get("MIN_SELL_SOL", "0.010")),
+        min_sol_reserve=float(os.environ.get("MIN_SOL_RESERVE", "0.020")),
+        buy_usdc=float(os.environ.get("BUY_USDC", "1.00")),
+        min_usdc_reserve=float(os.environ.get("MIN_USDC_RESERVE", "50.0")),
+        tp_sell_pct=float(os.getenv("TP_SELL_PCT", "1.0")),
+    )
+
+# ---- quote curves ----
+class ModelCurve:
+    """Fill = mid -/+ (half spread + impact_bps_per_1k * notional/1000 + platform fee)."""
+    name = "model"
+    def __init__(self, spread_bps: float = SPREAD_BPS, impact_bps_per_1k: float = IMPACT_BPS_1K,
+                 fee_bps: float = FEE_BPS):
+        self.spread_bps, self.impact, self.fee_bps = spread_bps, impact_bps_per_1k, fee_bps
+
+    def cost_bps(self, notional_usdc: float) -> float:
+        return self.spread_bps / 2.0 + self.impact * notional_usdc / 1000.0 + self.fee_bps
+
+    def price(self, side: str, t: int, mid: float, amount: float) -> tuple[float, float, str]:
+        """(USDC/SOL fill price, bps vs mid, source) for `amount` (SOL for SELL, USDC for BUY)."""
+        notional = amount * mid if side == "SELL" else amount
+        bps = self.cost_bps(notional)
+        px = mid * (1.0 - bps / 1e4) if side == "SELL" else mid * (1.0 + bps / 1e4)
+        return px, bps, "model"
+
+class RecordedCurve(ModelCurve):
+    """
+    Recorded quotes (CSV: ts [s or ms], side BUY/SELL, price USDC/SOL) where one is at
+    most QUOTE_MAX_AGE_S old at the tick; the model otherwise.
+    """
+    name = "recorded"
+    def __init__(self, path: Path, max_age_s: int = QUOTE_MAX_AGE_S, **kw):
+        super().__init__(**kw)
+        q = pd.read_csv(path)
+        ts = pd.to_numeric(q["ts"], errors="coerce")
+        q["ts"] = np.where(ts > 1e12, ts // 1000, ts)
+        self.max_age = max_age_s
+        self.sides = {s: (g["ts"].to_numpy(dtype="int64"), g["price"].to_numpy(dtype=float))
+                      for s, g in q.dropna(subset=["ts", "price"]).sort_values("ts").groupby(q["side"].str.upper())}
+
+    def price(self, side, t, mid, amount):
+        ts, px = self.sides.get(side, (np.empty(0, "int64"), None))
+        i = int(np.searchsorted(ts, t, side="right")) - 1
+        if i >= 0 and t - ts[i] <= self.max_age:
+            p = float(px[i])
+            return p, abs(p / mid - 1.0) * 1e4, self.name
+        return super().price(side, t, mid, amount)
+
+# ---- replay ----
+def ticks(bars: pd.DataFrame, interval_sec: int, step_ms: int) -> tuple[np.ndarray, np.ndarray]:
+    """Loop times (epoch s) and the mid seen at each: close of the last bar finished by then."""
+    t_open = bars["time"].to_numpy(dtype="int64")
+    t_close = t_open + step_ms
+    t0, t1 = int(t_close[0] // 1000), int(t_close[-1] // 1000)
+    tk = np.arange(t0, t1 + 1, max(1, interval_sec), dtype="int64")
+    i = np.searchsorted(t_close, tk * 1000, side="right") - 1
+    return tk, bars["close"].to_numpy(dtype=float)[i]
+
+def replay(bars: pd.DataFrame, step_ms: int, loop: LoopCfg, g: GuardCfg, curve: ModelCurve,
+           usdc: float = 1000.0, sol: float = 0.0, symbol: str = "SOL_USDC") -> tuple[list[dict], dict]:
+    """Run main.py's loop over `bars`. Returns (fills, summary)."""
+    tk, mid = ticks(bars, loop.interval_sec, step_ms)
+    u_start, s_start = usdc, sol
+    start_eq = usdc + sol * mid[0]
+    sell_cd, buy_cd = loop.sell_cooldown_min * 60, loop.buy_cooldown_min * 60
+    next_sell = next_buy = 0
+    day, sells_today, buys_today = -1, 0, 0
+    last_buy_px = last_buy_sol = None
+    fills: list[dict] = []
+    skips = {"sell_cap": 0, "buy_cap": 0, "sell_guard": 0, "buy_guard": 0}
+    fill_k = []; bal = []  # tick index of each fill and balances after it, for the equity path
+
+    for k in range(len(tk)):
+        now, m = int(tk[k]), float(mid[k])
+        d = now - now % 86_400  # utc_midnight_ts(), without a datetime per tick
+        if d != day:
+            day, sells_today, buys_today = d, 0, 0
+
+        # -- SELL path (main.py order: sell first) --
+        if loop.auto_enable_sell and now >= next_sell:
+            if daily_cap_reached(sells_today, loop.max_daily_sells):
+                skips["sell_cap"] += 1
+            else:
+                ok, why = sell_balance_guard(sol, g.min_sol_reserve, g.min_sell_sol)
+                if ok:
+                    now_px = curve.price("SELL", now, m, 1.0)[0]  # sell_guarded quotes 1 SOL
+                    ok, why = sell_price_guard(last_buy_px, now_px, g.sell_min_profit_bps)
+                if ok:
+                    qty = min(last_buy_sol * g.tp_sell_pct, sol - TX_FEE_SOL)  # sell_check size
+                    px, bps, src = curve.price("SELL", now, m, qty)
+                    usdc += qty * px; sol -= qty + TX_FEE_SOL
+                    fills.append({"ts": now, "side": "SELL", "symbol": symbol, "size_usdc": qty * px,
+                                  "size_real": qty, "price": px, "mid": m, "impact_bps": bps,
+                                  "in_amount": qty, "out_amount": qty * px, "quote_src": src, "reason": why})
+                    fill_k.append(k); bal.append((usdc, sol))
+                    sells_today += 1
+                    next_sell = now + sell_cd
+                else:
+                    skips["sell_guard"] += 1
+
+        # -- BUY path --
+        if loop.auto_enable_buy and now >= next_buy:
+            if daily_cap_reached(buys_today, loop.max_daily_buys):
+                skips["buy_cap"] += 1
+            else:
+                ok, why = buy_guard(usdc, g.min_usdc_reserve, g.buy_usdc)
+                if ok:
+                    px, bps, src = curve.price("BUY", now, m, g.buy_usdc)
+                    got = g.buy_usdc / px
+                    usdc -= g.buy_usdc; sol += got - TX_FEE_SOL
+                    last_buy_px, last_buy_sol = px, got
+                    fills.append({"ts": now, "side": "BUY", "symbol": symbol, "size_usdc": g.buy_usdc,
+                                  "size_real": got, "price": px, "mid": m, "impact_bps": bps,
+                                  "in_amount": g.buy_usdc, "out_amount": got, "quote_src": src, "reason": why})
+                    fill_k.append(k); bal.append((usdc, sol))
+                    buys_today += 1
+                else:
+                    skips["buy_guard"] += 1
+                next_buy = now + buy_cd  # main.py keeps the BUY cooldown even when the guard skips
+
+    # equity at every tick: balances after the latest fill at or before it
+    seg = np.searchsorted(np.asarray(fill_k, dtype="int64"), np.arange(len(tk)), side="right")
+    ub = np.array([u_start] + [b[0] for b in bal])
+    sb = np.array([s_start] + [b[1] for b in bal])
+    eq = ub[seg] + sb[seg] * mid
+    peak = np.maximum.accumulate(eq)
+    sells = [f for f in fills if f["side"] == "SELL"]
+    summary = {
+        "ticks": int(len(tk)), "start": int(tk[0]), "end": int(tk[-1]),
+        "buys": len(fills) - len(sells), "sells": len(sells),
+        "start_equity_usdc": round(float(start_eq), 4), "end_equity_usdc": round(float(eq[-1]), 4),
+        "pnl_usdc": round(float(eq[-1] - start_eq), 4),
+        "max_drawdown_pct": round(100.0 * float(np.max((peak - eq) / peak)), 3),
+        "end_usdc": round(float(usdc), 4), "end_sol": round(float(sol), 9),
+        "avg_impact_bps": round(float(np.mean([f["impact_bps"] for f in fills])), 3) if fills else 0.0,
+        "recorded_fills": sum(1 for f in fills if f["quote_src"] == "recorded"),
+        "skips": skips,
+    }
+    return fills, summary
+
+# ---- storage ----
+def connect(path: Path | None = None) -> sqlite3.Connection:
+    path = path or DB_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(path)
+    con.execute("PRAGMA foreign_keys=ON")
+    con.executescript(SCHEMA)
+    return con
+
+def save(fills: list[dict], summary: dict, cfg: dict, source: str, con: sqlite3.Connection | None = None) -> int:
+    own = con is None
+    con = con or connect()
+    try:
+        cur = con.execute("INSERT INTO paper_runs(created_ts, source, start_ts, end_ts, cfg, summary) VALUES (?,?,?,?,?,?)",
+                          (int(time.time() * 1000), source, summary["start"], summary["end"],
+                           json.dumps(cfg, sort_keys=True), json.dumps(summary)))
+        rid = int(cur.lastrowid)
+        cols = ("ts", "side", "symbol", "size_usdc", "size_real", "price", "mid", "impact_bps",
+                "in_amount", "out_amount", "quote_src", "reason")
+        con.executemany(f"INSERT INTO paper_trades(run_id, {', '.join(cols)}) VALUES (?{', ?' * len(cols)})",
+                        [(rid, *(f[c] for c in cols)) for f in fills])
+        con.commit()
+        return rid
+    finally:
+        if own: con.close()
+
+def _ms(s: str | None):
+    return None if not s else int(pd.Timestamp(s, tz="UTC").timestamp() * 1000)
+
+def main(argv: list[str]) -> int:
+    _load_env_file()
+    ap = argparse.ArgumentParser(prog="python -m src.paper_trade",
+                                 description="Paper-trade the live loop over historical bars")
+    ap.add_argument("--store", nargs=2, metavar=("SYMBOL", "INTERVAL"), default=["SOLUSDT", "1m"])
+    ap.add_argument("--data", help="kline CSV/JSON instead of the store (see ohlcv_store.read_source)")
+    ap.add_argument("--interval", default=None, help="bar interval of --data (default: --store's)")
+    ap.add_argument("--start", help="UTC date/time, e.g. 2025-06-01")
+    ap.add_argument("--end")
+    ap.add_argument("--usdc", type=float, default=float(os.getenv("PAPER_USDC", "1000")))
+    ap.add_argument("--sol", type=float, default=float(os.getenv("PAPER_SOL", "0")))
+    ap.add_argument("--quotes", help="recorded quotes CSV (ts, side, price); model fills elsewhere")
+    ap.add_argument("--auto-buy", choices=("true", "false"), help="override AUTO_ENABLE_BUY")
+    ap.add_argument("--no-db", action="store_true")
+    args = ap.parse_args(argv)
+
+    sym, itv = args.store[0].upper(), args.interval or args.store[1]
+    if args.data:
+        bars = ohlcv_store.read_source(Path(args.data)).sort_values("time").reset_index(drop=True)
+        lo, hi = _ms(args.start), _ms(args.end)
+        bars = bars[(bars["time"] >= (lo or 0)) & (bars["time"] < (hi or 1 << 62))].reset_index(drop=True)
+        source = str(args.data)
+    else:
+        bars = ohlcv_store.load(sym, itv, _ms(args.start), _ms(args.end))
+        source = f"{sym}_{itv}"
+    if bars.empty:
+        print("[paper] no bars in range"); return 2
+
+    loop, g = load_loop_cfg(), load_guard_cfg()
+    if args.auto_buy:
+        loop.auto_enable_buy = args.auto_buy == "true"
+    curve = RecordedCurve(Path(args.quotes)) if args.quotes else ModelCurve()
+    t0 = time.perf_counter()
+    fills, summary = replay(bars, ohlcv_store.INTERVAL_MS[itv], loop, g, curve, args.usdc, args.sol)
+    dt = time.perf_counter() - t0
+    sim_min = (summary["end"] - summary["start"]) / 60.0
+    summary["sim_minutes_per_s"] = round(sim_min / dt) if dt else None
+    print(json.dumps(summary, indent=2))
+    if not args.no_db:
+        cfg = {"loop": asdict(loop), "guards": asdict(g), "curve": curve.name, "spread_bps": curve.spread_bps,
+               "impact_bps_per_1k": curve.impact, "fee_bps": curve.fee_bps, "usdc": args.usdc, "sol": args.sol}
+        rid = save(fills, summary, cfg, source)
+        print(f"[paper] run {rid}: {len(fills)} fills → {DB_PATH}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,130 @@
+from __future__ import annotations
+import os, sys, time, sqlite3, argparse
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from src import ohlcv_store
+from src.backtest_combo_mtf import add_indicators
+
+ROOT = Path(__file__).resolve().parents[1]
+SIGNALS_DB = Path(os.getenv("SIGNALS_DB", "data/signals.sqlite"))
+OUT_DIR = ROOT / "data" / "backtests"
+
+# Replays every row strategy_runner.db_log wrote and checks its indicator values
+# against add_indicators() (the batch/backtest path) over the OHLCV store.
+# Indicators are computed once over the whole series and the logged bars are
+# picked out with one searchsorted, so thousands of signals cost one pass.
+# The live path seeds EMAs/RSI on its fetch window (BB_LIMIT bars); after a few
+# hundred bars that seed has decayed below float noise, so rows closer than
+# WARMUP bars to the start of the store are reported separately, not as mismatches.
+# Binance serves the still-forming bar last: rows logged before that bar closed
+# (ts_utc < last_time) carry partial close/volume and are reported as "partial".
+RTOL   = float(os.getenv("PARITY_RTOL", "1e-6"))
+ATOL   = float(os.getenv("PARITY_ATOL", "1e-9"))
+WARMUP = int(os.getenv("PARITY_WARMUP_BARS", "500"))
+
+# logged column -> add_indicators column
+FIELDS = {"last_price": "close", "ema9": "ema9", "ema21": "ema21", "rsi": "rsi",
+          "macd_hist": "macd_hist", "vol": "volume", "vol_sma20": "vol_sma20", "sma200": "sma200"}
+
+def load_signals(db: Path = SIGNALS_DB, symbol: str | None = None, interval: str | None = None) -> pd.DataFrame:
+    con = sqlite3.connect(db)
+    try:
+        q, args = "SELECT * FROM signals", []
+        if symbol:
+            q += " WHERE symbol=?"; args.append(symbol)
+            if interval:
+                q += " AND interval=?"; args.append(interval)
+        return pd.read_sql_query(q + " ORDER BY id", con, params=args)
+    finally:
+        con.close()
+
+def _ms(s: pd.Series) -> pd.Series:
+    """ISO timestamps (naive = UTC) -> epoch ms; unparsable -> NaN."""
+    t = pd.to_datetime(s, utc=True, errors="coerce", format="mixed")
+    return (t - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(milliseconds=1)
+
+def replay(sig: pd.DataFrame, bars: pd.DataFrame, interval: str) -> pd.DataFrame:
+    """
+    One row per logged signal with status (ok / mismatch / partial / warmup / missing),
+    the recomputed values (`<field>_replay`) and the worst relative error.
+    """
+    step = ohlcv_store.INTERVAL_MS[interval]
+    ind = add_indicators(bars[["open", "high", "low", "close", "volume"]])
+    t = bars["time"].to_numpy(dtype="int64")
+
+    out = sig[["id", "ts_utc", "symbol", "interval", "last_time"] + list(FIELDS)].copy()
+    close_ms = _ms(out["last_time"])
+    open_ms = close_ms + 1 - step
+    pos = np.searchsorted(t, open_ms.fillna(-1).to_numpy(dtype="int64"))
+    pos = np.minimum(pos, len(t) - 1) if len(t) else pos
+    found = close_ms.notna().to_numpy() & (len(t) > 0)
+    if len(t):
+        found &= t[pos] == open_ms.fillna(-1).to_numpy(dtype="int64")
+    out["bar_index"] = np.where(found, pos, -1)
+
+    worst = np.zeros(len(out))
+    bad = np.zeros(len(out), dtype=bool)
+    for f, col in FIELDS.items():
+        got = pd.to_numeric(out[f], errors="coerce").to_numpy(dtype=float)
+        ref = np.where(found, ind[col].to_numpy(dtype=float)[pos] if len(t) else np.nan, np.nan)
+        out[f + "_replay"] = ref
+        with np.errstate(invalid="ignore", divide="ignore"):
+            err = np.abs(got - ref) / np.maximum(np.abs(ref), ATOL)
+            off = ~np.isclose(got, ref, rtol=RTOL, atol=ATOL, equal_nan=True)
+        worst = np.fmax(worst, np.where(found, err, 0.0))
+        bad |= found & off
+    out["max_rel_err"] = worst
+
+    partial = (_ms(out["ts_utc"]) < close_ms).to_numpy()
+    out["status"] = np.select(
+        [~found, found & (pos < WARMUP), partial, bad],
+        ["missing", "warmup", "partial", "mismatch"], "ok")
+    return out
+
+def summarize(rep: pd.DataFrame) -> pd.DataFrame:
+    """Per field: rows compared (status ok/mismatch), mismatches, worst abs/rel error."""
+    cmp = rep[rep["status"].isin(["ok", "mismatch"])]
+    rows = []
+    for f in FIELDS:
+        got = pd.to_numeric(cmp[f], errors="coerce").to_numpy(dtype=float)
+        ref = cmp[f + "_replay"].to_numpy(dtype=float)
+        off = ~np.isclose(got, ref, rtol=RTOL, atol=ATOL, equal_nan=True)
+        d = np.abs(got - ref)
+        rows.append({"field": f, "compared": int(len(cmp)), "mismatches": int(off.sum()),
+                     "max_abs_err": float(np.nanmax(d)) if len(d) else 0.0,
+                     "max_rel_err": float(np.nanmax(d / np.maximum(np.abs(ref), ATOL))) if len(d) else 0.0})
+    return pd.DataFrame(rows)
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(prog="python -m src.parity_replay",
+                                 description="Check logged live signals against the batch indicator path")
+    ap.add_argument("--db", default=str(SIGNALS_DB), help="signals DB (default: $SIGNALS_DB or data/signals.sqlite)")
+    ap.add_argument("--symbol", default=os.getenv("BB_SYMBOL", "SOLUSDT").upper())
+    ap.add_argument("--interval", default=os.getenv("BB_INTERVAL", "15m"))
+    ap.add_argument("--out", help="CSV of non-ok rows (default data/backtests/parity_<SYM>_<INT>_<ts>.csv)")
+    args = ap.parse_args(argv)
+
+    sig = load_signals(Path(args.db), args.symbol, args.interval)
+    if sig.empty:
+        print(f"[parity] no signals for {args.symbol} {args.interval} in {args.db}")
+        return 0
+    bars = ohlcv_store.load(args.symbol, args.interval)
+    t0 = time.time()
+    rep = replay(sig, bars, args.interval)
+    print(f"[parity] {len(rep)} signals vs {len(bars)} store bars in {time.time() - t0:.2f}s "
+          f"(rtol {RTOL:g}, warmup {WARMUP})")
+    print(rep["status"].value_counts().to_string())
+    print(summarize(rep).to_string(index=False))
+
+    odd = rep[rep["status"] != "ok"]
+    if len(odd):
+        out = Path(args.out) if args.out else OUT_DIR / f"parity_{args.symbol}_{args.interval}_{time.strftime('%Y%m%d_%H%M%S')}.csv"
+        out.parent.mkdir(parents=True, exist_ok=True)
+        odd.to_csv(out, index=False)
+        print(f"WROTE: {out}")
+    return 1 if (rep["status"] == "mismatch").any() else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -4,6 +4,8 @@ from pathlib import Path
 from collections import defaultdict
 from datetime import datetime, timezone
 
+from src.confirm_tracker import ensure_columns, LANDED_SQL
+
 ROOT = Path(__file__).resolve().parents[1]
 DB   = ROOT / "data" / "trades.sqlite"
 OUT  = ROOT / "data" / "pnl_daily.csv"
@@ -26,12 +28,14 @@ def get_mark_usdc_per_sol() -> float | None:
             return None
 
 def iter_trades():
+    # landed trades only: pending/failed/expired rows (src.confirm_tracker) move no funds
     conn = sqlite3.connect(DB)
+    ensure_columns(conn)
     cur = conn.cursor()
     cur.execute(
-        """SELECT ts, side, in_amount, out_amount, tx_sig
+        f"""SELECT ts, side, in_amount, out_amount, tx_sig
            FROM trades
-           WHERE tx_sig IS NOT NULL
+           WHERE tx_sig IS NOT NULL AND {LANDED_SQL}
            ORDER BY ts ASC"""
     )
     for ts, side, in_amt, out_amt, tx_sig in cur.fetchall():
@@ -0,0 +1,317 @@
+from __future__ import annotations
+import os, sys, json, time, argparse
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from src import backtest_hybrid as bh, ohlcv_store
+from src import profiling as prof
+
+ROOT = Path(__file__).resolve().parents[1]
+OUT_DIR = ROOT / "data" / "backtests"
+
+# Several long-only strategies ("sleeves") on one bar stream. Indicators come from a
+# shared cache (BB, EMA/KC and MTF all ask for RSI(14) / ATR(14) / EMAs; each is
+# computed once), then one loop over the bars steps every sleeve. A sleeve only
+# decides position (1 = long after this bar's close); equity is marked to market
+# per bar afterwards with numpy, paying cost per side on entry and exit, so a
+# closed trade compounds to exactly exit*(1-c) / (entry*(1+c)).
+# Sleeve rules mirror backtest_hybrid (run_backtest, run_backtest_ema, run_kc_atr)
+# and backtest_combo_mtf.signals_15m_with_filters, with one cost per side for all
+# (backtest_hybrid.COST_BPS_PER_SIDE).
+WEIGHTS = os.getenv("PORT_WEIGHTS", "")                       # "bb_atr=0.5,kc_atr=0.5"; default equal
+REBALANCE_BARS = int(os.getenv("PORT_REBALANCE_BARS", "0"))   # 0 = never (buy-and-hold sleeves)
+
+def _times(df: pd.DataFrame) -> pd.Series:
+    """Bar open times as datetimes (open_time may be datetimes or epoch ms; else `time` in ms)."""
+    t = df["open_time"] if "open_time" in df else df["time"]
+    return t if pd.api.types.is_datetime64_any_dtype(t) else pd.to_datetime(pd.to_numeric(t), unit="ms")
+
+class Features:
+    """Indicator cache over one frame: each (indicator, params) is computed once for all sleeves."""
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.close = df["close"].astype(float)
+        self.high = df["high"].astype(float)
+        self.low = df["low"].astype(float)
+        self.volume = df["volume"].astype(float)
+        self._cache: dict = {}
+        self.hits = 0
+
+    def _get(self, key, fn):
+        if key in self._cache:
+            self.hits += 1
+        else:
+            self._cache[key] = fn()
+        return self._cache[key]
+
+    def ema(self, n: int) -> np.ndarray:
+        return self._get(("ema", n), lambda: bh.ema(self.close, n).to_numpy())
+
+    def rsi(self, n: int) -> np.ndarray:
+        return self._get(("rsi", n), lambda: bh.rsi(self.close, n).to_numpy())
+
+    def atr(self, n: int) -> np.ndarray:
+        return self._get(("atr", n), lambda: bh.atr(self.high, self.low, self.close, n).to_numpy())
+
+    def bb(self, n: int, k: float):
+        return self._get(("bb", n, k), lambda: tuple(s.to_numpy() for s in bh.bollinger(self.close, n, k)))
+
+    def vol_ma(self, n: int) -> np.ndarray:
+        return self._get(("vol_ma", n), lambda: self.volume.rolling(n).mean().to_numpy())
+
+# ---- sleeves: prepare(F) once, then step(i, in_pos) -> new position after bar i ----
+class BBATR:
+    """run_backtest: BB lower-band reclaim + RSI/volume/trend gates; ATR stop/TP, RSI and upper-band exits."""
+    name = "bb_atr"
+    def prepare(self, F: Features):
+        self.c = F.close.to_numpy()
+        self.mid, self.up, self.lo = F.bb(bh.BB_PERIOD, bh.BB_K)
+        self.r = F.rsi(bh.RSI_PERIOD); self.a = F.atr(bh.ATR_PERIOD)
+        self.et = F.ema(bh.EMA_TREND_N); self.v = F.volume.to_numpy(); self.vm = F.vol_ma(bh.VOL_MA_N)
+        self.start = max(bh.BB_PERIOD, bh.RSI_PERIOD, bh.ATR_PERIOD, bh.EMA_TREND_N, bh.VOL_MA_N) + 2
+        self.cooldown = 0; self.stop = self.tp = None
+
+    def step(self, i: int, in_pos: bool) -> bool:
+        if i < self.start:
+            return False
+        c, cp = self.c[i], self.c[i - 1]
+        if not in_pos:
+            if self.cooldown > 0:
+                self.cooldown -= 1
+                return False
+            ok = (cp < self.lo[i - 1]) and (c > self.lo[i]) and (self.r[i] <= bh.RSI_BUY_MAX) \
+                and (not np.isnan(self.vm[i])) and (self.v[i] > self.vm[i] * bh.VOL_MULT)
+            if ok and bh.REQUIRE_TREND:
+                ok = (c > self.et[i]) and (self.et[i] > self.et[i - 1])
+            if ok:
+                self.stop = c - bh.ATR_STOP_MULT * self.a[i]
+                self.tp = c + bh.ATR_TP_MULT * self.a[i]
+            return bool(ok)
+        if (c <= self.stop or c >= self.tp or self.r[i] >= bh.RSI_SELL_MIN
+                or (cp > self.up[i - 1] and c < self.up[i])):
+            self.cooldown = bh.COOLDOWN_BARS
+            return False
+        return True
+
+class EMACross:
+    """run_backtest_ema: EMA fast/slow cross with RSI gate; acts on the next bar's close."""
+    name = "ema_cross"
+    def prepare(self, F: Features):
+        fast_n, slow_n = int(os.getenv("EMA_FAST_N", "9")), int(os.getenv("EMA_SLOW_N", "21"))
+        rsi_n = int(os.getenv("RSI_PERIOD", "14"))
+        self.buy_max = float(os.getenv("RSI_BUY_MAX", "60")); self.sell_min = float(os.getenv("RSI_SELL_MIN", "60"))
+        f, s = F.ema(fast_n), F.ema(slow_n)
+        self.r = F.rsi(rsi_n)
+        fp, sp = np.roll(f, 1), np.roll(s, 1)
+        self.up = (fp <= sp) & (f > s); self.dn = (fp >= sp) & (f < s)
+        self.start = max(fast_n, slow_n, rsi_n) + 2  # signal bar >= max(...) + 1, filled one bar later
+
+    def step(self, i: int, in_pos: bool) -> bool:
+        j = i - 1  # signal bar
+        if i < self.start:
+            return False
+        if not in_pos:
+            return bool(self.up[j] and self.r[j] <= self.buy_max)
+        return not (self.dn[j] or self.r[j] >= self.sell_min)
+
+class KCATR:
+    """run_kc_atr: Keltner upper-band breakout with EMA trend; ATR stop/TP off the cost-loaded entry, basis exit."""
+    name = "kc_atr"
+    def prepare(self, F: Features):
+        kc_n, kc_mult = int(os.getenv("KC_N", "20")), float(os.getenv("KC_MULT", "1.8"))
+        fast_n, slow_n = int(os.getenv("EMA_FAST_N", "9")), int(os.getenv("EMA_SLOW_N", "21"))
+        atr_n = int(os.getenv("ATR_PERIOD", "14"))
+        self.stop_m, self.tp_m = float(os.getenv("ATR_STOP_MULT", "1.5")), float(os.getenv("ATR_TP_MULT", "2.5"))
+        self.c = F.close.to_numpy()
+        self.basis = F.ema(kc_n); self.a = F.atr(atr_n)
+        self.up = self.basis + kc_mult * self.a
+        self.trend = F.ema(fast_n) > F.ema(slow_n)
+        self.start = max(kc_n, atr_n, slow_n) + 1
+        self.entry = None
+
+    def step(self, i: int, in_pos: bool) -> bool:
+        if i < self.start:
+            return False
+        c = self.c[i]
+        if not in_pos:
+            if self.c[i - 1] <= self.up[i] and c > self.up[i] and self.trend[i]:
+                self.entry = c * (1.0 + bh.COST_BPS_PER_SIDE)
+                return True
+            return False
+        a = self.a[i]
+        return not (c <= self.entry - self.stop_m * a or c >= self.entry + self.tp_m * a or c < self.basis[i])
+
+class MTF:
+    """signals_15m_with_filters: RSI/volume BUY/SELL, gated by 1h close > 1h SMA200 (completed 1h bars)."""
+    name = "mtf"
+    def prepare(self, F: Features):
+        bull_only = int(os.getenv("BULL_ONLY", "1")) == 1
+        rsi_buy, rsi_sell = float(os.getenv("RSI_BUY_LT", "55")), float(os.getenv("RSI_SELL_GT", "61"))
+        vb, vs = float(os.getenv("VOL_BUY_X", "0.85")), float(os.getenv("VOL_SELL_X", "1.25"))
+        r, v, vm = F.rsi(14), F.volume.to_numpy(), F.vol_ma(20)
+        bias = self._bias_1h(F) if bull_only else np.ones(len(r), dtype=bool)
+        with np.errstate(invalid="ignore"):
+            self.buy = bias & (r < rsi_buy) & (v > vb * vm)
+            self.sell = bias & ~self.buy & (r > rsi_sell) & (v > vs * vm)
+
+    @staticmethod
+    def _bias_1h(F: Features) -> np.ndarray:
+        t = _times(F.df)
+        h = F.close.groupby(t.dt.floor("1h").to_numpy()).last()
+        ok = (h > h.rolling(200).mean()).shift(1, fill_value=False)  # only 1h bars already closed
+        return ok.reindex(t.dt.floor("1h")).fillna(False).to_numpy(dtype=bool)
+
+    def step(self, i: int, in_pos: bool) -> bool:
+        return (not self.sell[i]) if in_pos else bool(self.buy[i])
+
+SLEEVES = {s.name: s for s in (BBATR, EMACross, KCATR, MTF)}
+
+# ---- simulation ----
+def positions(df: pd.DataFrame, names: list[str]) -> tuple[np.ndarray, Features]:
+    """(sleeves x bars) 0/1 positions from one shared pass over the bars."""
+    F = Features(df)
+    sleeves = [SLEEVES[n]() for n in names]
+    with prof.stage("portfolio.indicators"):
+        for s in sleeves:
+            s.prepare(F)
+    n = len(df)
+    pos = np.zeros((len(sleeves), n), dtype=np.int8)
+    state = [False] * len(sleeves)
+    steps = [s.step for s in sleeves]
+    with prof.stage("portfolio.simulate"):
+        for i in range(n):
+            for k, step in enumerate(steps):
+                state[k] = step(i, state[k])
+                pos[k, i] = state[k]
+    prof.count("bars", n)
+    return pos, F
+
+def sleeve_equity(close: np.ndarray, pos: np.ndarray, cost: float) -> np.ndarray:
+    """Mark-to-market equity per sleeve (starts at 1.0 before bar 0)."""
+    prev = np.concatenate([np.zeros((pos.shape[0], 1), dtype=pos.dtype), pos[:, :-1]], axis=1)
+    bar_ret = np.concatenate([[0.0], close[1:] / close[:-1] - 1.0])
+    g = 1.0 + prev * bar_ret
+    g = np.where((pos == 1) & (prev == 0), g / (1.0 + cost), g)
+    g = np.where((pos == 0) & (prev == 1), g * (1.0 - cost), g)
+    return np.cumprod(g, axis=1)
+
+def combine(eq: np.ndarray, w: np.ndarray, rebalance: int = REBALANCE_BARS) -> np.ndarray:
+    """Portfolio value from sleeve equity, weights `w`, reset to target every `rebalance` bars (0 = never)."""
+    n = eq.shape[1]
+    step = rebalance if rebalance > 0 else n
+    out = np.empty(n)
+    v, base = 1.0, np.ones(eq.shape[0])
+    for a in range(0, n, step):
+        b = min(a + step, n)
+        out[a:b] = v * (w @ (eq[:, a:b] / base[:, None]))
+        v, base = out[b - 1], eq[:, b - 1]
+    return out
+
+def _mdd(curve: np.ndarray) -> float:
+    c = np.concatenate([[1.0], curve])
+    peak = np.maximum.accumulate(c)
+    return float(np.max((peak - c) / peak))
+
+def _trades(close: np.ndarray, p: np.ndarray, cost: float) -> np.ndarray:
+    """Net returns of closed trades (entry/exit at the closes where the position changes)."""
+    d = np.diff(np.concatenate([[0], p.astype(np.int8)]))
+    ent, ext = np.flatnonzero(d == 1), np.flatnonzero(d == -1)
+    ent = ent[:len(ext)]
+    return close[ext] * (1.0 - cost) / (close[ent] * (1.0 + cost)) - 1.0
+
+def parse_weights(spec: str, names: list[str]) -> np.ndarray:
+    w = {n: 1.0 for n in names}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        k, _, v = part.partition("=")
+        if k not in w:
+            raise ValueError(f"weight for unknown sleeve {k!r} (running: {', '.join(names)})")
+        w[k] = float(v)
+    a = np.array([w[n] for n in names], dtype=float)
+    if a.sum() <= 0:
+        raise ValueError("weights must sum to > 0")
+    return a / a.sum()
+
+def run(df: pd.DataFrame, names: list[str] | None = None, weights: str = WEIGHTS,
+        rebalance: int = REBALANCE_BARS) -> dict:
+    """Per-sleeve stats, portfolio stats, daily-return correlation and the equity curves."""
+    names = names or list(SLEEVES)
+    df = df.reset_index(drop=True)
+    pos, F = positions(df, names)
+    close = F.close.to_numpy()
+    cost = bh.COST_BPS_PER_SIDE
+    eq = sleeve_equity(close, pos, cost)
+    w = parse_weights(weights, names)
+    port = combine(eq, w, rebalance)
+
+    sleeves = {}
+    for k, nm in enumerate(names):
+        r = _trades(close, pos[k], cost)
+        wins = int((r > 0).sum())
+        sleeves[nm] = {
+            "weight": round(float(w[k]), 4), "trades": int(len(r)), "wins": wins,
+            "win_rate_pct": round(100.0 * wins / max(1, len(r)), 2),
+            "equity_multiple": round(float(eq[k, -1]), 6),
+            "max_drawdown_pct": round(100.0 * _mdd(eq[k]), 2),
+            "exposure_pct": round(100.0 * float(pos[k].mean()), 2),
+            "open_position": bool(pos[k, -1]),
+        }
+    t = _times(df)
+    curves = pd.DataFrame(eq.T, columns=names, index=t)
+    curves["portfolio"] = port
+    daily = curves.resample("1D").last().pct_change().dropna(how="all")
+    corr = daily[names].corr()
+    return {
+        "bars": int(len(df)), "sleeves": sleeves,
+        "portfolio": {
+            "equity_multiple": round(float(port[-1]), 6),
+            "max_drawdown_pct": round(100.0 * _mdd(port), 2),
+            "rebalance_bars": int(rebalance),
+            "avg_pairwise_corr": round(float(corr.where(~np.eye(len(names), dtype=bool)).stack().mean()), 4)
+                                 if len(names) > 1 else None,
+        },
+        "indicator_cache": {"computed": len(F._cache), "reused": F.hits},
+        "corr": corr.round(4),
+        "curves": curves,
+    }
+
+def _load(args) -> tuple[pd.DataFrame, str]:
+    if args.store:
+        sym, itv = args.store[0].upper(), args.store[1]
+        return ohlcv_store.load(sym, itv), f"{sym}_{itv}"
+    if args.data:
+        data = json.loads(Path(args.data).read_text(encoding="utf-8", errors="ignore"))
+        return bh._to_dataframe(data), Path(args.data).stem
+    return bh.fetch_klines(bh.SYMBOL, bh.INTERVAL, bh.LIMIT), f"{bh.SYMBOL}_{bh.INTERVAL}"
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(prog="python -m src.portfolio_bt",
+                                 description="Multi-strategy portfolio backtest on one shared bar pass")
+    ap.add_argument("--sleeves", default=",".join(SLEEVES), help="comma list of " + "/".join(SLEEVES))
+    ap.add_argument("--weights", default=WEIGHTS, help="e.g. bb_atr=2,kc_atr=1 (normalized; default equal)")
+    ap.add_argument("--rebalance", type=int, default=REBALANCE_BARS, help="bars between rebalances (0 = never)")
+    ap.add_argument("--data", default=os.getenv("DATA_FILE"), help="kline JSON (default: fetch)")
+    ap.add_argument("--store", nargs=2, metavar=("SYMBOL", "INTERVAL"), help="read the OHLCV store instead")
+    args = ap.parse_args(argv)
+
+    names = [n for n in args.sleeves.split(",") if n]
+    unknown = [n for n in names if n not in SLEEVES]
+    if unknown:
+        ap.error(f"unknown sleeve(s): {', '.join(unknown)}")
+    df, dataset = _load(args)
+    t0 = time.time()
+    res = run(df, names, args.weights, args.rebalance)
+    curves, corr = res.pop("curves"), res.pop("corr")
+    res["secs"] = round(time.time() - t0, 3)
+    print(json.dumps(res, indent=2))
+    print("\nDaily return correlation:")
+    print(corr.to_string())
+
+    out = OUT_DIR / f"portfolio_{dataset}_{time.strftime('%Y%m%d_%H%M%S')}_equity.csv"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    curves.to_csv(out, index_label="time")
+    print(f"WROTE: {out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
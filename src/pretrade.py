@@ -0,0 +1,68 @@
+from __future__ import annotations
+import os, time
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED, TimeoutError as FutureTimeout
+from typing import Callable
+
+# Concurrent pre-trade inputs for the guards. The RPC balance, the trades.sqlite
+# lookup and the price/quote requests are independent, so they are issued together
+# and the guard decides once the inputs it needs are in, all under one latency
+# budget (PRETRADE_BUDGET_S) instead of the sum of every call's timeout. Price
+# sources race in priority order: the best source wins as soon as every better one
+# has answered or failed; at the deadline the best answer so far is used.
+BUDGET_S = float(os.getenv("PRETRADE_BUDGET_S", "6"))
+_POOL = ThreadPoolExecutor(max_workers=int(os.getenv("PRETRADE_WORKERS", "8")), thread_name_prefix="pretrade")
+
+class NotReady(TimeoutError):
+    """An input did not arrive within the pre-trade budget."""
+
+def deadline(budget_s: float = BUDGET_S) -> float:
+    return time.monotonic() + budget_s
+
+def submit(fn: Callable, *a, timings: dict | None = None, name: str | None = None, **k) -> Future:
+    """Run fn in the pre-trade pool; with `timings`, store its wall ms under `name`."""
+    def run():
+        t0 = time.perf_counter()
+        try:
+            return fn(*a, **k)
+        finally:
+            if timings is not None:
+                timings[name or fn.__name__] = round(1000.0 * (time.perf_counter() - t0), 1)
+    return _POOL.submit(run)
+
+def result(f: Future, until: float, what: str = "input"):
+    """f's value (its exception propagates), or NotReady past `until`."""
+    try:
+        return f.result(timeout=max(0.0, until - time.monotonic()))
+    except FutureTimeout as e:
+        if f.done():
+            raise
+        raise NotReady(f"{what} not ready within the pre-trade budget") from e
+
+def _ok(f: Future):
+    return None if f.exception() is not None else f.result()
+
+def race(sources: list[tuple[str, Callable[[], object]]]) -> list[tuple[str, Future]]:
+    """Start every source now; pick() the winner later."""
+    return [(name, _POOL.submit(fn)) for name, fn in sources]
+
+def first_ok(sources: list[tuple[str, Callable[[], object]]], until: float) -> tuple[str | None, object]:
+    return pick(race(sources), until)
+
+def pick(futs: list[tuple[str, Future]], until: float) -> tuple[str | None, object]:
+    """(name, value) of the highest-priority source that returns non-None; (None, None) if none do."""
+    while True:
+        for name, f in futs:
+            if not f.done():
+                break
+            v = _ok(f)
+            if v is not None:
+                return name, v
+        else:
+            return None, None
+        left = until - time.monotonic()
+        if left <= 0:
+            for name, f in futs:
+                if f.done() and _ok(f) is not None:
+                    return name, f.result()
+            return None, None
+        wait([f for _, f in futs if not f.done()], timeout=left, return_when=FIRST_COMPLETED)
@@ -0,0 +1,110 @@
+from __future__ import annotations
+import os, time
+from contextlib import nullcontext
+from functools import wraps
+
+# Opt-in stage timers and counters for backtests and sweeps (BT_PROFILE=1).
+# Disabled: stage() hands back one shared nullcontext, laps() a no-op and timed()
+# returns the function unchanged, so instrumented code pays ~nothing.
+# timed() decides at import time; set BT_PROFILE before importing instrumented modules.
+ENABLED = os.getenv("BT_PROFILE", "0") not in ("", "0")
+
+_stages: dict[str, list] = {}   # name -> [seconds, calls]
+_counters: dict[str, int] = {}
+_NULL = nullcontext()
+
+def _add(name: str, dt: float) -> None:
+    s = _stages.get(name)
+    if s is None:
+        _stages[name] = [dt, 1]
+    else:
+        s[0] += dt; s[1] += 1
+
+class _Stage:
+    __slots__ = ("name", "t0")
+    def __init__(self, name: str):
+        self.name = name
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+    def __exit__(self, *exc):
+        _add(self.name, time.perf_counter() - self.t0)
+        return False
+
+def stage(name: str):
+    """`with stage("indicators"): ...` adds the block's wall time under `name`."""
+    return _Stage(name) if ENABLED else _NULL
+
+def timed(name: str | None = None):
+    """Decorator form of stage(); a no-op (returns fn itself) when profiling is off."""
+    def deco(fn):
+        if not ENABLED:
+            return fn
+        label = name or fn.__name__
+        @wraps(fn)
+        def wrapper(*a, **k):
+            t0 = time.perf_counter()
+            try:
+                return fn(*a, **k)
+            finally:
+                _add(label, time.perf_counter() - t0)
+        return wrapper
+    return deco
+
+def _noop(name: str) -> None:
+    pass
+
+def laps(prefix: str = ""):
+    """
+    Sequential timer for long straight-line functions: each lap("x") books the time
+    since the previous lap (or since laps() was called) under prefix + "x".
+    """
+    if not ENABLED:
+        return _noop
+    last = [time.perf_counter()]
+    def lap(name: str) -> None:
+        now = time.perf_counter()
+        _add(prefix + name, now - last[0])
+        last[0] = now
+    return lap
+
+def count(name: str, n: int = 1) -> None:
+    if ENABLED:
+        _counters[name] = _counters.get(name, 0) + int(n)
+
+def snapshot(reset: bool = False) -> dict:
+    """{"stages": {name: {"s": seconds, "n": calls}}, "counters": {...}} for this process."""
+    out = {"stages": {k: {"s": round(v[0], 6), "n": v[1]} for k, v in _stages.items()},
+           "counters": dict(_counters)}
+    if reset:
+        _stages.clear(); _counters.clear()
+    return out
+
+def merge(profiles) -> dict:
+    """Sum per-run snapshots (e.g. every child of a sweep) into one breakdown."""
+    st: dict[str, dict] = {}
+    ct: dict[str, int] = {}
+    runs = 0
+    for p in profiles:
+        if not p:
+            continue
+        runs += 1
+        for k, v in p.get("stages", {}).items():
+            a = st.setdefault(k, {"s": 0.0, "n": 0})
+            a["s"] += v["s"]; a["n"] += v["n"]
+        for k, v in p.get("counters", {}).items():
+            ct[k] = ct.get(k, 0) + v
+    return {"stages": {k: {"s": round(v["s"], 6), "n": v["n"]} for k, v in st.items()},
+            "counters": ct, "runs": runs}
+
+def format_table(profile: dict) -> str:
+    """Stages by total time (nested stages are also counted in their parent)."""
+    st = profile.get("stages", {})
+    lines = [f"{'stage':<28}{'seconds':>10}{'calls':>9}{'ms/call':>10}"]
+    for k, v in sorted(st.items(), key=lambda kv: -kv[1]["s"]):
+        lines.append(f"{k:<28}{v['s']:>10.3f}{v['n']:>9}{1000.0 * v['s'] / max(1, v['n']):>10.2f}")
+    for k, v in sorted(profile.get("counters", {}).items()):
+        lines.append(f"{k:<28}{v:>10}")
+    if "runs" in profile:
+        lines.append(f"{'runs':<28}{profile['runs']:>10}")
+    return "\n".join(lines)
@@ -0,0 +1,185 @@
+from __future__ import annotations
+import os, sys, json, time, argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+from src import backtest_hybrid as bh, ohlcv_store
+from src.stream_backtest import BBATRState
+
+ROOT = Path(__file__).resolve().parents[1]
+OUT_DIR = ROOT / "data" / "backtests"
+
+# Purged / embargoed k-fold scoring of run_backtest parameter sets.
+# The history is cut into K contiguous folds. Each (params, fold) task runs on
+# [fold start - WARMUP, fold end), so indicators are warm at the fold start, and
+# only trades entered at/after fold start + EMBARGO and closed before the fold end
+# count (a trade still open at the end is purged, never carried into the next fold).
+# Workers read bars from the memory-mapped OHLCV store (shared page cache) or,
+# without a store, load the sweep's cached JSON once per process.
+FOLDS   = int(os.getenv("CV_FOLDS", "5"))
+WARMUP  = int(os.getenv("CV_WARMUP_BARS", "600"))
+EMBARGO = int(os.getenv("CV_EMBARGO_BARS", "24"))
+WORKERS = int(os.getenv("CV_WORKERS", str(os.cpu_count() or 2)))
+
+# sweep env var -> (backtest_hybrid global, cast); same names the child process reads
+ENV_GLOBALS = {
+    "BB_PERIOD": ("BB_PERIOD", int), "BB_K": ("BB_K", float),
+    "RSI_PERIOD": ("RSI_PERIOD", int), "RSI_BUY_MAX": ("RSI_BUY_MAX", float),
+    "RSI_SELL_MIN": ("RSI_SELL_MIN", float),
+    "ATR_PERIOD": ("ATR_PERIOD", int), "ATR_STOP_MULT": ("ATR_STOP_MULT", float),
+    "ATR_TP_MULT": ("ATR_TP_MULT", float),
+    "BB_COOLDOWN_BARS": ("COOLDOWN_BARS", int),
+    "BB_FEE_BPS": ("FEE_BPS", float), "BB_SLP_BPS": ("SLIP_BPS", float),
+    "VOL_MA_N": ("VOL_MA_N", int), "VOL_MULT": ("VOL_MULT", float),
+    "EMA_TREND_N": ("EMA_TREND_N", int), "REQUIRE_TREND": ("REQUIRE_TREND", int),
+}
+_DEFAULTS = {g: getattr(bh, g) for g, _ in ENV_GLOBALS.values()}
+
+def apply_env(params: dict) -> None:
+    """Set backtest_hybrid globals as if `params` had been exported before import."""
+    for g, v in _DEFAULTS.items():
+        setattr(bh, g, v)
+    for k, v in params.items():
+        if k in ENV_GLOBALS:
+            g, cast = ENV_GLOBALS[k]
+            setattr(bh, g, cast(float(v)))
+    bh.COST_BPS_PER_SIDE = (bh.FEE_BPS + bh.SLIP_BPS) / 10_000.0
+
+def fold_bounds(n: int, k: int = FOLDS) -> list[tuple[int, int]]:
+    """K contiguous [start, end) bar ranges; the first fold starts after WARMUP."""
+    edges = np.linspace(min(WARMUP, n), n, k + 1).astype(int)
+    return [(int(a), int(b)) for a, b in zip(edges[:-1], edges[1:])]
+
+# ---- worker side ----
+_SRC: dict = {}
+
+def _init(source: dict) -> None:
+    _SRC.clear()
+    if source["kind"] == "store":
+        _SRC["cols"] = ohlcv_store.columns(source["symbol"], source["interval"])
+    else:
+        data = json.loads(Path(source["path"]).read_text(encoding="utf-8", errors="ignore"))
+        _SRC["df"] = bh._to_dataframe(data)
+
+def _slice(i0: int, i1: int) -> pd.DataFrame:
+    if "cols" in _SRC:
+        return ohlcv_store.to_frame(_SRC["cols"], i0, i1)
+    return _SRC["df"].iloc[i0:i1].reset_index(drop=True)
+
+def fold_metrics(rets) -> dict:
+    r = np.asarray(rets, dtype=float)
+    eq = np.concatenate(([1.0], np.cumprod(1.0 + r)))
+    peak = np.maximum.accumulate(eq)
+    wins = int((r > 0).sum())
+    return {
+        "trades": int(len(r)), "wins": wins, "losses": int(len(r) - wins),
+        "win_rate_pct": round(100.0 * wins / max(1, len(r)), 2),
+        "avg_trade_ret_pct": round(100.0 * float(r.mean()), 4) if len(r) else 0.0,
+        "equity_multiple": round(float(eq[-1]), 6),
+        "max_drawdown_pct": round(100.0 * float(np.max((peak - eq) / peak)), 2),
+    }
+
+def _task(args) -> dict:
+    pi, params, fi, a, b = args
+    lo = max(0, a - WARMUP)
+    df = _slice(lo, b)
+    apply_env(params)
+    st = BBATRState()  # same rules as run_backtest, ~10x faster than its .iloc loop
+    st.feed(df)
+    first = a - lo + EMBARGO
+    rets = [r for r, e in zip(st.rets, st.entries) if e >= first]
+    return {"param_id": pi, "fold": fi, "start": a, "end": b, **fold_metrics(rets)}
+
+# ---- driver ----
+def run(grid: list[dict], source: dict, n_bars: int, folds: int = FOLDS,
+        workers: int = WORKERS) -> pd.DataFrame:
+    """Per-(param, fold) metrics for every candidate; folds x candidates run in a pool."""
+    tasks = [(pi, p, fi, a, b) for pi, p in enumerate(grid)
+             for fi, (a, b) in enumerate(fold_bounds(n_bars, folds))]
+    if workers <= 1:
+        _init(source)
+        out = [_task(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(workers, initializer=_init, initargs=(source,)) as ex:
+            out = list(ex.map(_task, tasks, chunksize=max(1, len(tasks) // (workers * 8))))
+    return pd.DataFrame(out)
+
+def rank(per_fold: pd.DataFrame, grid: list[dict]) -> pd.DataFrame:
+    """
+    Out-of-sample stability per candidate: median/min fold equity, share of profitable
+    folds, dispersion of fold log-returns. Sorted by median, then worst fold.
+    """
+    g = per_fold.assign(log_eq=np.log(per_fold["equity_multiple"].clip(lower=1e-9))).groupby("param_id")
+    out = pd.DataFrame({
+        "cv_med_eq": g["equity_multiple"].median(),
+        "cv_min_eq": g["equity_multiple"].min(),
+        "cv_pos_folds": g["equity_multiple"].apply(lambda s: float((s > 1.0).mean())),
+        "cv_log_std": g["log_eq"].std(ddof=0),
+        "equity_multiple": np.exp(g["log_eq"].sum()),
+        "trades": g["trades"].sum(),
+        "max_drawdown_pct": g["max_drawdown_pct"].max(),
+    })
+    out["win_rate_pct"] = (100.0 * g["wins"].sum() / g["trades"].sum().clip(lower=1)).round(2)
+    params = pd.DataFrame(grid)
+    out = out.join(params, how="left")
+    return out.sort_values(["cv_med_eq", "cv_min_eq", "cv_pos_folds"], ascending=False)
+
+def oos_selection(per_fold: pd.DataFrame) -> pd.DataFrame:
+    """For each fold: pick the best candidate on the other folds, report it on this one."""
+    eq = per_fold.pivot(index="param_id", columns="fold", values="equity_multiple")
+    le = np.log(eq.clip(lower=1e-9))
+    rows = []
+    for f in eq.columns:
+        train = le.drop(columns=f).mean(axis=1)
+        best = int(train.idxmax())
+        rows.append({"fold": f, "pick": best, "train_mean_eq": round(float(np.exp(train[best])), 6),
+                     "test_eq": float(eq.at[best, f])})
+    return pd.DataFrame(rows)
+
+def main(argv: list[str]) -> int:
+    from src.sweep_15m_fast import DATA, grid as sweep_grid
+    ap = argparse.ArgumentParser(prog="python -m src.purged_cv",
+                                 description="Purged k-fold scoring of the sweep_15m_fast grid")
+    ap.add_argument("--data", default=str(DATA), help="kline JSON (default: the sweep's cache)")
+    ap.add_argument("--store", nargs=2, metavar=("SYMBOL", "INTERVAL"), help="use the OHLCV store instead")
+    ap.add_argument("--folds", type=int, default=FOLDS)
+    ap.add_argument("--workers", type=int, default=WORKERS)
+    ap.add_argument("--limit", type=int, default=0, help="only the first N candidates (smoke runs)")
+    args = ap.parse_args(argv)
+
+    if args.store:
+        sym, itv = args.store[0].upper(), args.store[1]
+        source = {"kind": "store", "symbol": sym, "interval": itv}
+        n_bars, dataset = len(ohlcv_store.columns(sym, itv, ("time",))["time"]), f"{sym}_{itv}"
+    else:
+        if not Path(args.data).exists():
+            print(f"ERROR: {args.data} missing (see sweep_15m_fast.need_cache)"); return 2
+        source = {"kind": "json", "path": str(Path(args.data).resolve())}
+        n_bars, dataset = len(json.loads(Path(args.data).read_text(encoding="utf-8"))), Path(args.data).stem
+
+    grid = sweep_grid()
+    if args.limit:
+        grid = grid[:args.limit]
+    t0 = time.time()
+    per_fold = run(grid, source, n_bars, args.folds, args.workers)
+    ranked = rank(per_fold, grid)
+    oos = oos_selection(per_fold)
+    print(f"{len(grid)} candidates x {args.folds} folds on {n_bars} bars in {time.time() - t0:.1f}s "
+          f"(warmup {WARMUP}, embargo {EMBARGO})")
+    print(ranked.head(10).to_string())
+    print("\nOut-of-sample pick per fold:")
+    print(oos.to_string(index=False))
+
+    stamp = time.strftime("%Y%m%d_%H%M%S")
+    out = OUT_DIR / f"purged_cv_{dataset}_{stamp}.csv"
+    per_fold.join(pd.DataFrame(grid), on="param_id").to_csv(out, index=False)
+    print(f"WROTE: {out}")
+    from src import results_db
+    rows = ranked.reset_index().to_dict("records")
+    results_db.record(rows, "bb_atr_cv", dataset, name=out.stem, source=out)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,102 @@
+from __future__ import annotations
+import os, time, threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from dataclasses import dataclass
+from typing import Callable
+
+# Jupiter quote lifecycle. A quote is keyed by what it commits to (mints, amount,
+# slippage, platform fee, mode) and carries its fetch time and contextSlot, the slot
+# Jupiter priced it at. The executor reuses a quote while it is younger than
+# QUOTE_MAX_AGE_MS and no more than QUOTE_MAX_SLOT_LAG slots behind the newest slot
+# any quote has reported, so a timely sell_check plan or an earlier quote skips the
+# /quote round trip. A reused quote older than half the budget triggers a background
+# refresh for the next caller. A stale or missing quote is fetched inline.
+MAX_AGE_MS   = int(os.getenv("QUOTE_MAX_AGE_MS", "3000"))
+MAX_SLOT_LAG = int(os.getenv("QUOTE_MAX_SLOT_LAG", "8"))
+
+def now_ms() -> int:
+    return time.time_ns() // 1_000_000
+
+def key_of(raw: dict) -> tuple:
+    fee = raw.get("platformFee") or {}
+    return (raw.get("inputMint"), raw.get("outputMint"), int(raw.get("inAmount") or 0),
+            int(raw.get("slippageBps") or 0), int(fee.get("feeBps") or 0), raw.get("swapMode", "ExactIn"))
+
+def want_key(in_mint: str, out_mint: str, amount_int: int, slippage_bps: int,
+             fee_bps: int = 0, mode: str = "ExactIn") -> tuple:
+    return (in_mint, out_mint, int(amount_int), int(slippage_bps), int(fee_bps), mode)
+
+@dataclass
+class Quote:
+    raw: dict
+    fetched_ms: int
+    source: str = "fetched"       # fetched | plan | refresh
+
+    @property
+    def key(self) -> tuple:
+        return key_of(self.raw)
+
+    @property
+    def slot(self) -> int:
+        return int(self.raw.get("contextSlot") or 0)
+
+    def age_ms(self, now: int | None = None) -> int:
+        return (now_ms() if now is None else now) - self.fetched_ms
+
+class QuoteBook:
+    """Latest quote per key plus background refreshes; thread-safe."""
+    def __init__(self, max_age_ms: int = MAX_AGE_MS, max_slot_lag: int = MAX_SLOT_LAG):
+        self.max_age_ms = max_age_ms
+        self.max_slot_lag = max_slot_lag
+        self.book: dict[tuple, Quote] = {}
+        self.pending: dict[tuple, Future] = {}
+        self.top_slot = 0
+        self.stats = {"reused": 0, "fetched": 0, "refreshed": 0, "stale": 0}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="quotes")
+
+    def put(self, raw: dict, fetched_ms: int | None = None, source: str = "fetched") -> Quote:
+        q = Quote(raw, now_ms() if fetched_ms is None else int(fetched_ms), source)
+        with self._lock:
+            self.top_slot = max(self.top_slot, q.slot)
+            cur = self.book.get(q.key)
+            if cur is None or cur.fetched_ms <= q.fetched_ms:
+                self.book[q.key] = q
+        return q
+
+    def fresh(self, q: Quote, now: int | None = None) -> bool:
+        if q.age_ms(now) > self.max_age_ms:
+            return False
+        return not (q.slot and self.top_slot and self.top_slot - q.slot > self.max_slot_lag)
+
+    def get(self, key: tuple, fetch: Callable[[], dict]) -> Quote:
+        """A fresh quote for `key`: the cached one if within budget, else `fetch()` now."""
+        with self._lock:
+            q = self.book.get(key)
+        if q is not None and self.fresh(q):
+            self.stats["reused"] += 1
+            if q.age_ms() > self.max_age_ms // 2:
+                self.refresh(key, fetch)
+            return q
+        if q is not None:
+            self.stats["stale"] += 1
+        self.stats["fetched"] += 1
+        return self.put(fetch())
+
+    def refresh(self, key: tuple, fetch: Callable[[], dict]) -> Future:
+        """Re-quote `key` in the background (one in flight per key)."""
+        with self._lock:
+            f = self.pending.get(key)
+            if f is not None and not f.done():
+                return f
+            f = self._pool.submit(self._refresh, key, fetch)
+            self.pending[key] = f
+            return f
+
+    def _refresh(self, key: tuple, fetch: Callable[[], dict]) -> Quote | None:
+        try:
+            q = self.put(fetch(), source="refresh")
+            self.stats["refreshed"] += 1
+            return q
+        except Exception:
+            return None   # the next get() fetches inline
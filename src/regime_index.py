@@ -0,0 +1,182 @@
+from __future__ import annotations
+import sys, sqlite3, math
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+DB_PATH = ROOT / "data" / "regime.sqlite"
+
+# period key formats per frequency (month is what regime_pick uses)
+FREQS = {"month": "%Y-%m", "week": "%G-W%V", "day": "%Y-%m-%d"}
+
+# Raw sums are stored instead of vol/trend so new bars can be merged into an
+# existing (partial) period without re-reading its history.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS period_stats (
+  freq TEXT NOT NULL,          -- month/week/day
+  period TEXT NOT NULL,        -- e.g. 2025-08, 2025-W33, 2025-08-17
+  bars INTEGER NOT NULL,
+  n_ret INTEGER NOT NULL,      -- bars with a defined return
+  sum_ret REAL NOT NULL,
+  sum_ret2 REAL NOT NULL,
+  first_close REAL NOT NULL,
+  last_close REAL NOT NULL,
+  first_ts INTEGER NOT NULL,   -- epoch ms of first bar in period
+  last_ts INTEGER NOT NULL,    -- epoch ms of last bar in period
+  PRIMARY KEY (freq, period)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_period_stats_last ON period_stats(freq, last_ts);
+"""
+
+UPSERT = """
+INSERT INTO period_stats(freq, period, bars, n_ret, sum_ret, sum_ret2,
+                         first_close, last_close, first_ts, last_ts)
+VALUES (?,?,?,?,?,?,?,?,?,?)
+ON CONFLICT(freq, period) DO UPDATE SET
+  bars = bars + excluded.bars,
+  n_ret = n_ret + excluded.n_ret,
+  sum_ret = sum_ret + excluded.sum_ret,
+  sum_ret2 = sum_ret2 + excluded.sum_ret2,
+  last_close = excluded.last_close,
+  last_ts = excluded.last_ts
+"""
+
+def connect(path: Path | None = None) -> sqlite3.Connection:
+    path = path or DB_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(path)
+    con.executescript(SCHEMA)
+    return con
+
+def _ms(ts: pd.Series) -> np.ndarray:
+    return ts.to_numpy().astype("datetime64[ms]").astype("int64")
+
+def _last_bar(con: sqlite3.Connection):
+    """(last_ts, last_close) of the newest indexed bar, or (None, None)."""
+    row = con.execute(
+        "SELECT last_ts, last_close FROM period_stats WHERE freq='day' ORDER BY last_ts DESC LIMIT 1"
+    ).fetchone()
+    return (int(row[0]), float(row[1])) if row else (None, None)
+
+def last_ts(con: sqlite3.Connection | None = None) -> int | None:
+    """Epoch ms of the newest indexed bar (None for an empty index)."""
+    own = con is None
+    con = con or connect()
+    try:
+        return _last_bar(con)[0]
+    finally:
+        if own: con.close()
+
+def _aggregate(df: pd.DataFrame, fmt: str) -> pd.DataFrame:
+    """Vectorized per-period sums over a chunk of bars (must carry `ret`)."""
+    key = df["timestamp"].dt.strftime(fmt)
+    ts = _ms(df["timestamp"])
+    g = pd.DataFrame({
+        "period": key, "close": df["close"], "ts": ts,
+        "ret": df["ret"], "ret2": df["ret"] * df["ret"],
+    }).groupby("period", sort=True)
+    return pd.DataFrame({
+        "bars": g.size(),
+        "n_ret": g["ret"].count(),
+        "sum_ret": g["ret"].sum(),
+        "sum_ret2": g["ret2"].sum(),
+        "first_close": g["close"].first(),
+        "last_close": g["close"].last(),
+        "first_ts": g["ts"].first(),
+        "last_ts": g["ts"].last(),
+    }).reset_index()
+
+def update(df: pd.DataFrame, con: sqlite3.Connection | None = None) -> int:
+    """
+    Merge bars newer than the last indexed bar into the index.
+    `df` needs timestamp + close (e.g. regime_pick.load_data()); older rows are ignored,
+    so it is safe to pass the full history each time. Returns the number of new bars.
+    """
+    own = con is None
+    con = con or connect()
+    try:
+        last_ts, last_close = _last_bar(con)
+        new = df[["timestamp", "close"]]
+        if last_ts is not None:
+            new = new[_ms(new["timestamp"]) > last_ts]
+        if new.empty:
+            return 0
+        new = new.sort_values("timestamp").reset_index(drop=True)
+        prev = new["close"].shift(1)
+        if last_close is not None:
+            prev.iat[0] = last_close
+        new = new.assign(ret=new["close"] / prev - 1.0)
+        for freq, fmt in FREQS.items():
+            agg = _aggregate(new, fmt)
+            con.executemany(UPSERT, [
+                (freq, r.period, int(r.bars), int(r.n_ret), float(r.sum_ret), float(r.sum_ret2),
+                 float(r.first_close), float(r.last_close), int(r.first_ts), int(r.last_ts))
+                for r in agg.itertuples(index=False)
+            ])
+        con.commit()
+        return int(len(new))
+    finally:
+        if own: con.close()
+
+def rebuild(df: pd.DataFrame) -> int:
+    con = connect()
+    try:
+        con.execute("DELETE FROM period_stats")
+        return update(df, con)
+    finally:
+        con.close()
+
+def _to_stats(rows) -> pd.DataFrame:
+    out = []
+    for period, bars, n_ret, s1, s2, c0, c1 in rows:
+        mean = s1 / n_ret if n_ret else 0.0
+        var = max(0.0, s2 / n_ret - mean * mean) if n_ret else 0.0
+        out.append({"ym": period, "vol": math.sqrt(var) if bars > 1 else 0.0,
+                    "trend": c1 / c0 - 1.0 if c0 else 0.0, "bars": float(bars)})
+    return pd.DataFrame(out, columns=["ym", "vol", "trend", "bars"])
+
+def stats(freq: str = "month", upto: str | None = None, last: int | None = None,
+          con: sqlite3.Connection | None = None) -> pd.DataFrame:
+    """
+    Per-period vol/trend/bars in the same shape as regime_pick.month_stats
+    (period column is named `ym` for every freq). `upto` is inclusive.
+    """
+    own = con is None
+    con = con or connect()
+    try:
+        q = "SELECT period, bars, n_ret, sum_ret, sum_ret2, first_close, last_close FROM period_stats WHERE freq=?"
+        args: list = [freq]
+        if upto is not None:
+            q += " AND period<=?"; args.append(upto)
+        q += " ORDER BY period DESC"
+        if last is not None:
+            q += " LIMIT ?"; args.append(int(last))
+        rows = con.execute(q, args).fetchall()
+        return _to_stats(rows[::-1])
+    finally:
+        if own: con.close()
+
+def pick(ym: str, con: sqlite3.Connection | None = None):
+    """Regime pick for `ym` straight from the index (None if history is insufficient)."""
+    from src.regime_pick import pick_regime, W_TRAIN
+    # ym itself + prev month + W_TRAIN training months is all pick_regime looks at
+    ms = stats("month", upto=ym, last=W_TRAIN + 2, con=con)
+    return pick_regime(None, ms, ym)
+
+def is_empty(con: sqlite3.Connection | None = None) -> bool:
+    own = con is None
+    con = con or connect()
+    try:
+        return con.execute("SELECT 1 FROM period_stats LIMIT 1").fetchone() is None
+    finally:
+        if own: con.close()
+
+if __name__ == "__main__":
+    from src.regime_pick import load_data
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "update"
+    if cmd not in ("update", "rebuild"):
+        print("Usage: python -m src.regime_index [update|rebuild]")
+        sys.exit(1)
+    n = (rebuild if cmd == "rebuild" else update)(load_data())
+    print(f"[regime_index] {cmd}: merged {n} new bars into {DB_PATH}")
@@ -0,0 +1,221 @@
+from __future__ import annotations
+import os, json
+from datetime import datetime, timezone
+from typing import Optional
+import pandas as pd
+
+from src.indicators import EMA, RSI, RollingBands
+from src import regime_index, bar_clock
+
+# Defaults mirror the locked walk-forward config (walkforward_offline.py)
+SYMBOL     = os.getenv("BB_SYMBOL", "SOLUSDT").upper()
+INTERVAL   = os.getenv("BB_INTERVAL", "15m")
+WARMUP     = int(os.getenv("REGIME_WARMUP_BARS", "500"))
+BB_PERIOD  = int(os.getenv("REGIME_BB_PERIOD", "16"))
+BB_K       = float(os.getenv("REGIME_BB_K", "2.4"))
+EMA_FAST_N = int(os.getenv("REGIME_EMA_FAST_N", "10"))
+EMA_SLOW_N = int(os.getenv("REGIME_EMA_SLOW_N", "40"))
+RSI_N        = int(os.getenv("RSI_PERIOD", "14"))
+RSI_BUY_MAX  = float(os.getenv("REGIME_RSI_BUY_MAX", "60"))
+RSI_SELL_MIN = float(os.getenv("REGIME_RSI_SELL_MIN", "60"))
+# Live bars extend the shared regime index only when they continue it bar for bar:
+# a gap after the index's last bar is backfilled from Binance (up to
+# REGIME_BACKFILL_MAX bars), otherwise nothing is written and the index has to be
+# refreshed from the JSON (make index) first. The index is built from 15m bars, so
+# other intervals never write to it.
+INDEX_INTERVAL = "15m"
+BACKFILL_MAX = int(os.getenv("REGIME_BACKFILL_MAX", "20000"))
+
+# ---- incremental strategies (same rules as run_bb_tv / run_backtest_ema) ----
+class BBRevert:
+    """Long on close crossing under the lower band, flat on close crossing above the mid."""
+    name = "BB"
+    def __init__(self):
+        self.bands = RollingBands(BB_PERIOD, BB_K)
+        self.prev = None  # (close, lower, mid) of previous bar
+        self.in_pos = False
+
+    def update(self, c: float) -> None:
+        self.bands.update(c)
+        lo, mid = self.bands.lower, self.bands.mid
+        if self.prev is not None and lo is not None and self.prev[1] is not None:
+            c_prev, lo_prev, mid_prev = self.prev
+            if not self.in_pos and c_prev >= lo_prev and c < lo:
+                self.in_pos = True
+            elif self.in_pos and c_prev <= mid_prev and c > mid:
+                self.in_pos = False
+        self.prev = (c, lo, mid)
+
+    def reset(self) -> None:
+        self.in_pos = False
+
+class EMACross:
+    """Long on fast/slow EMA cross up with RSI gate, flat on cross down or RSI exit."""
+    name = "EMA"
+    def __init__(self):
+        self.fast, self.slow, self.rsi = EMA(EMA_FAST_N), EMA(EMA_SLOW_N), RSI(RSI_N)
+        self.prev = None  # (fast, slow)
+        self.bars = 0
+        self.in_pos = False
+
+    def update(self, c: float) -> None:
+        f, s, r = self.fast.update(c), self.slow.update(c), self.rsi.update(c)
+        self.bars += 1
+        if self.prev is not None and self.bars > max(EMA_FAST_N, EMA_SLOW_N, RSI_N):
+            f_prev, s_prev = self.prev
+            if not self.in_pos:
+                if f_prev <= s_prev and f > s and r <= RSI_BUY_MAX:
+                    self.in_pos = True
+            elif (f_prev >= s_prev and f < s) or r >= RSI_SELL_MIN:
+                self.in_pos = False
+        self.prev = (f, s)
+
+    def reset(self) -> None:
+        self.in_pos = False
+
+class BuyHold:
+    name = "BH"
+    def __init__(self):
+        self.in_pos = True
+    def update(self, c: float) -> None:
+        pass
+    def reset(self) -> None:
+        pass
+
+STRATEGIES = {"BB": BBRevert, "EMA": EMACross, "BH": BuyHold}
+
+class RegimeSwitcher:
+    """
+    Keeps every strategy warm on each closed bar and follows the one picked for the
+    current month. On month rollover the new pick is read from the regime index and
+    strategy positions are reset (the walk-forward evaluates months independently);
+    indicator state carries over, so no history is reloaded.
+    """
+    def __init__(self):
+        self.strats = {k: cls() for k, cls in STRATEGIES.items()}
+        self.ym: Optional[str] = None
+        self.pick: Optional[str] = None
+        self.last_time = None
+        self.last_price = None
+
+    def _rollover(self, ym: str) -> None:
+        self.ym = ym
+        self.pick = regime_index.pick(ym)
+        for s in self.strats.values():
+            s.reset()
+
+    def on_bar(self, open_time: pd.Timestamp, close: float, close_time=None) -> None:
+        """Feed one closed bar (the regime index must already contain it)."""
+        ym = open_time.strftime("%Y-%m")
+        if ym != self.ym:
+            self._rollover(ym)
+        for s in self.strats.values():
+            s.update(close)
+        self.last_time, self.last_price = (close_time or open_time), close
+
+    @property
+    def want_long(self) -> bool:
+        s = self.strats.get(self.pick) if self.pick else None
+        return bool(s and s.in_pos)
+
+    def action(self, holding: bool) -> str:
+        if self.want_long and not holding:
+            return "BUY_SOL"
+        if holding and not self.want_long:
+            return "SELL_SOL"
+        return "HOLD"
+
+_SW: Optional[RegimeSwitcher] = None
+
+def _ms(ts) -> int:
+    return int(pd.Timestamp(ts).value // 1_000_000)
+
+def _closed_bars(limit: int | None = None, start_ms: int | None = None,
+                 max_bars: int = BACKFILL_MAX) -> pd.DataFrame:
+    """The last `limit` closed bars, or every closed bar opened at/after `start_ms`
+    (paged 1000 at a time, at most `max_bars`)."""
+    from src.backtest_hybrid import fetch_klines
+    now = pd.Timestamp.now(tz="UTC").tz_localize(None)
+    if start_ms is None:
+        df = fetch_klines(SYMBOL, INTERVAL, limit)
+        return df[df["close_time"] < now]
+    pages, n = [], 0
+    while n < max_bars:
+        df = fetch_klines(SYMBOL, INTERVAL, 1000, start_ms=start_ms)
+        df = df[df["close_time"] < now]
+        if df.empty:
+            break
+        pages.append(df)
+        n += len(df)
+        start_ms = _ms(df["open_time"].iat[-1]) + bar_clock.step_ms(INTERVAL)
+    return pd.concat(pages, ignore_index=True) if pages else pd.DataFrame(
+        columns=["open_time", "open", "high", "low", "close", "volume", "close_time"])
+
+def _index(bars: pd.DataFrame) -> None:
+    """Append `bars` to the regime index, backfilling any gap after its last bar."""
+    if INTERVAL != INDEX_INTERVAL:
+        return
+    last = regime_index.last_ts()
+    if last is None:
+        return   # no history to extend; make index builds it from the JSON
+    step = bar_clock.step_ms(INTERVAL)
+    bars = bars[bars["open_time"].map(_ms) > last]
+    if bars.empty:
+        return
+    if _ms(bars["open_time"].iat[0]) > last + step:
+        gap = _closed_bars(start_ms=last + step, max_bars=BACKFILL_MAX + 1)
+        gap = gap[gap["open_time"] < bars["open_time"].iat[0]]
+        if len(gap) > BACKFILL_MAX or gap.empty or _ms(gap["open_time"].iat[0]) != last + step:
+            print(f"[regime] index ends {pd.Timestamp(last, unit='ms')}; not writing live bars "
+                  f"across the gap (run make index)")
+            return
+        bars = pd.concat([gap, bars], ignore_index=True)
+    if (bars["open_time"].map(_ms).diff().dropna() != step).any():
+        print("[regime] live bars are not contiguous; index not updated")
+        return
+    regime_index.update(pd.DataFrame({"timestamp": bars["open_time"], "close": bars["close"]}))
+
+def _feed(sw: RegimeSwitcher, bars: pd.DataFrame) -> None:
+    if sw.last_time is not None:
+        bars = bars[bars["close_time"] > sw.last_time]
+    if bars.empty:
+        return
+    # index first, so a brand-new month already has its row when we pick
+    _index(bars)
+    for r in bars.itertuples(index=False):
+        sw.on_bar(r.open_time, float(r.close), r.close_time)
+
+def _switcher() -> RegimeSwitcher:
+    """Seed once from recent history; later calls feed every bar closed since the last one."""
+    global _SW
+    if _SW is None:
+        _SW = RegimeSwitcher()
+    if _SW.last_time is None:
+        # first call, or the seed fetch came back with no closed bars: seed (again)
+        _feed(_SW, _closed_bars(WARMUP))
+    else:
+        _feed(_SW, _closed_bars(start_ms=_ms(_SW.last_time) + 1))
+    return _SW
+
+def latest_signal(last_action: str = "HOLD") -> dict:
+    """`last_action` is the runner's last fired action; it tells us whether we hold SOL."""
+    sw = _switcher()
+    action = sw.action(holding=last_action == "BUY_SOL")
+    sig = "BUY" if action == "BUY_SOL" else "SELL" if action == "SELL_SOL" else "HOLD"
+    return {
+        "symbol": SYMBOL,
+        "interval": INTERVAL,
+        "bias_interval": "month",
+        "now_utc": datetime.now(timezone.utc).isoformat(),
+        "last_time": pd.Timestamp(sw.last_time).isoformat() if sw.last_time is not None else None,
+        "last_price": float(sw.last_price or 0.0),
+        "bias_ok": sw.pick is not None,
+        "signal": sig,
+        "action": action,
+        "reason": f"regime {sw.ym} pick={sw.pick or 'NONE'} want_long={sw.want_long}",
+        "filters": {"mode": "regime", "pick": sw.pick, "ym": sw.ym,
+                    "bb": [BB_PERIOD, BB_K], "ema": [EMA_FAST_N, EMA_SLOW_N]},
+    }
+
+if __name__ == "__main__":
+    print(json.dumps(latest_signal(), indent=2))
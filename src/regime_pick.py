@@ -21,13 +21,16 @@ def load_data():
     df["ret"]=df["close"].pct_change()
     return df
 
-def month_stats(df):
-    def _stats(g):
-        g=g.sort_values("timestamp"); bars=len(g)
-        vol=g["ret"].dropna().std(ddof=0) if bars>1 else 0
-        trend=g["close"].iat[-1]/g["close"].iat[0]-1 if bars>0 else 0
-        return pd.Series({"vol":vol,"trend":trend,"bars":bars})
-    return df.groupby("ym",sort=True).apply(_stats).reset_index().sort_values("ym").reset_index(drop=True)
+def month_stats(df, key="ym"):
+    # vectorized per-period aggregates (ret/close are already time-sorted by load_data)
+    g=df.groupby(key,sort=True)
+    out=pd.DataFrame({
+        "vol":g["ret"].std(ddof=0).fillna(0.0),
+        "trend":g["close"].last()/g["close"].first()-1,
+        "bars":g.size().astype(float),
+    })
+    out.loc[out["bars"]<=1,"vol"]=0.0
+    return out.rename_axis("ym").reset_index()
 
 def pick_regime(df, mstats, ym):
     # need prev month stats + W_TRAIN
@@ -57,9 +60,14 @@ if __name__=="__main__":
         print("Usage: python regime_pick.py YYYY-MM")
         sys.exit(1)
     ym=sys.argv[1]
-    df=load_data()
-    mstats=month_stats(df)
-    pick=pick_regime(df,mstats,ym)
+    # answer from the persistent index; only parse the JSON when it is empty or stops
+    # before the requested month (or REGIME_REFRESH=1)
+    from src import regime_index
+    last=regime_index.last_ts()
+    stale=last is None or ym>pd.Timestamp(last,unit="ms").strftime("%Y-%m")
+    if stale or os.getenv("REGIME_REFRESH","0")=="1":
+        regime_index.update(load_data())
+    pick=regime_index.pick(ym)
     if pick is None:
         print(f"No pick available for {ym} (insufficient history).")
     else:
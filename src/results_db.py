@@ -0,0 +1,248 @@
+from __future__ import annotations
+import sys, json, re, time, sqlite3, glob
+from pathlib import Path
+from typing import Iterable
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+DB_PATH = ROOT / "data" / "backtests" / "results.sqlite"
+
+# One row per evaluated config. Headline metrics are real columns (indexed per
+# strategy/dataset, so top-N is an index scan); anything else the backtest
+# reported goes to `extra`, and the config itself to `params` (JSON, sorted keys).
+METRICS = ("equity_multiple", "win_rate_pct", "trades", "wins", "losses",
+           "max_drawdown_pct", "avg_trade_ret_pct")
+EXTRA_METRICS = {"profit_factor", "open_position_ret_pct", "bars", "ambiguous_exits", "sharpe",
+                 "equity", "ret_pct", "error",
+                 # src.robustness.for_winners
+                 "robust_eq_lo", "robust_eq_med", "robust_eq_hi", "robust_mdd_hi_pct",
+                 "robust_p_loss", "robust_p_ruin"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sweeps (
+  sweep_id INTEGER PRIMARY KEY,
+  name TEXT NOT NULL,          -- e.g. regime_switch_v2_sweep_20250821_231902
+  strategy TEXT NOT NULL,      -- e.g. bb_atr, regime_switch_v2_sweep
+  dataset TEXT NOT NULL,       -- e.g. SOLUSDT_15m_5000
+  source TEXT,                 -- script or imported CSV path
+  created_ts INTEGER NOT NULL, -- epoch ms
+  n_rows INTEGER NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_sweeps_source ON sweeps(source);
+CREATE INDEX IF NOT EXISTS idx_sweeps_strategy ON sweeps(strategy, dataset, created_ts);
+
+CREATE TABLE IF NOT EXISTS results (
+  sweep_id INTEGER NOT NULL REFERENCES sweeps(sweep_id) ON DELETE CASCADE,
+  strategy TEXT NOT NULL,
+  dataset TEXT NOT NULL,
+  equity_multiple REAL,
+  win_rate_pct REAL,
+  trades INTEGER,
+  wins INTEGER,
+  losses INTEGER,
+  max_drawdown_pct REAL,
+  avg_trade_ret_pct REAL,
+  params TEXT NOT NULL,
+  extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_results_eq ON results(strategy, dataset, equity_multiple DESC);
+CREATE INDEX IF NOT EXISTS idx_results_wr ON results(strategy, dataset, win_rate_pct DESC);
+CREATE INDEX IF NOT EXISTS idx_results_dd ON results(strategy, dataset, max_drawdown_pct);
+CREATE INDEX IF NOT EXISTS idx_results_sweep ON results(sweep_id);
+"""
+
+def connect(path: Path | None = None) -> sqlite3.Connection:
+    path = path or DB_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(path)
+    con.execute("PRAGMA foreign_keys=ON")
+    con.executescript(SCHEMA)
+    return con
+
+def _num(x):
+    try:
+        v = float(x)
+    except (TypeError, ValueError):
+        return None
+    return None if v != v else v  # NaN -> NULL
+
+def _split(row: dict):
+    """(metric column values, params dict, extra dict) for one result row."""
+    vals = [_num(row.get(m)) for m in METRICS]
+    extra = {k: row[k] for k in row if k in EXTRA_METRICS and row[k] is not None}
+    params = {k: v for k, v in row.items() if k not in METRICS and k not in EXTRA_METRICS}
+    return vals, params, extra
+
+def _clean(v):
+    if hasattr(v, "item"):  # numpy scalars
+        v = v.item()
+    if isinstance(v, float) and v != v:
+        return None
+    return v
+
+def record(rows: Iterable[dict], strategy: str, dataset: str, name: str | None = None,
+           source: str | Path | None = None, created_ts: int | None = None,
+           con: sqlite3.Connection | None = None) -> int:
+    """
+    Store one sweep (a batch of result dicts, e.g. backtest JSON merged with its env).
+    Re-recording the same `source` replaces the previous copy. Returns sweep_id.
+    """
+    own = con is None
+    con = con or connect()
+    try:
+        rows = [{k: _clean(v) for k, v in r.items()} for r in rows]
+        name = name or f"{strategy}_{time.strftime('%Y%m%d_%H%M%S')}"
+        if isinstance(source, Path):
+            source = _source(source)
+        if source is not None:
+            con.execute("DELETE FROM sweeps WHERE source=?", (source,))
+        cur = con.execute(
+            "INSERT INTO sweeps(name, strategy, dataset, source, created_ts, n_rows) VALUES (?,?,?,?,?,?)",
+            (name, strategy, dataset, source, created_ts or int(time.time() * 1000), len(rows)))
+        sid = int(cur.lastrowid)
+        out = []
+        for r in rows:
+            vals, params, extra = _split(r)
+            out.append((sid, strategy, dataset, *vals,
+                        json.dumps(params, sort_keys=True, default=str),
+                        json.dumps(extra, default=str) if extra else None))
+        con.executemany(
+            f"INSERT INTO results(sweep_id, strategy, dataset, {', '.join(METRICS)}, params, extra) "
+            f"VALUES ({', '.join('?' * (len(METRICS) + 5))})", out)
+        con.commit()
+        return sid
+    finally:
+        if own: con.close()
+
+def _order(metric: str) -> str:
+    col = metric.lstrip("-")
+    if col in METRICS:
+        expr = col
+    elif re.fullmatch(r"\w+", col):
+        expr = f"json_extract(extra, '$.{col}')"
+    else:
+        raise ValueError(f"bad metric: {metric}")
+    # "-max_drawdown_pct" = ascending; metrics default to descending
+    return f"{expr} {'ASC' if metric.startswith('-') else 'DESC'}"
+
+def top(strategy: str | None = None, dataset: str | None = None, metric="equity_multiple",
+        n: int = 10, min_trades: int = 0, latest: bool = False,
+        con: sqlite3.Connection | None = None) -> pd.DataFrame:
+    """
+    Top-N configs by `metric` (a name, or a list for tie-breaks; prefix "-" for ascending).
+    `latest` restricts to the newest sweep of the strategy/dataset.
+    Returns metrics + params expanded into columns, plus sweep name.
+    """
+    own = con is None
+    con = con or connect()
+    try:
+        where, args = ["1=1"], []
+        if min_trades:
+            where.append("r.trades >= ?"); args.append(int(min_trades))
+        if strategy is not None:
+            where.append("r.strategy = ?"); args.append(strategy)
+        if dataset is not None:
+            where.append("r.dataset = ?"); args.append(dataset)
+        if latest:
+            q = "SELECT sweep_id FROM sweeps WHERE 1=1"
+            a2 = []
+            if strategy is not None:
+                q += " AND strategy=?"; a2.append(strategy)
+            if dataset is not None:
+                q += " AND dataset=?"; a2.append(dataset)
+            row = con.execute(q + " ORDER BY created_ts DESC, sweep_id DESC LIMIT 1", a2).fetchone()
+            if row is None:
+                return pd.DataFrame()
+            where.append("r.sweep_id = ?"); args.append(row[0])
+        metrics = [metric] if isinstance(metric, str) else list(metric)
+        sql = (f"SELECT s.name, r.strategy, r.dataset, {', '.join('r.' + m for m in METRICS)}, r.params, r.extra "
+               f"FROM results r JOIN sweeps s USING(sweep_id) WHERE {' AND '.join(where)} "
+               f"ORDER BY {', '.join(_order(m) for m in metrics)} LIMIT ?")
+        rows = con.execute(sql, args + [int(n)]).fetchall()
+    finally:
+        if own: con.close()
+    out = []
+    for name, strat, ds, *rest in rows:
+        vals, params, extra = rest[:len(METRICS)], rest[-2], rest[-1]
+        d = {"sweep": name, "strategy": strat, "dataset": ds, **dict(zip(METRICS, vals))}
+        d.update(json.loads(extra) if extra else {})
+        d.update(json.loads(params))
+        out.append(d)
+    return pd.DataFrame(out)
+
+def best(strategy: str, dataset: str | None = None, metric="equity_multiple", **kw) -> dict | None:
+    df = top(strategy, dataset, metric, n=1, **kw)
+    return None if df.empty else df.iloc[0].to_dict()
+
+# ---- importing the existing CSVs ----
+_TS = re.compile(r"_(\d{8}_\d{6})$")
+
+def _infer(stem: str) -> tuple[str, str]:
+    """(strategy, dataset) from a data/backtests file stem."""
+    strategy = _TS.sub("", stem)
+    m = re.search(r"([A-Z]{3,}USDT?)_(\d+[mhd])", stem)
+    dataset = f"{m.group(1)}_{m.group(2)}" if m else "SOLUSDT_15m"
+    if m:
+        strategy = (strategy.replace(m.group(0), "").replace("__", "_").strip("_")) or strategy
+    return strategy, dataset
+
+def _source(path: Path) -> str:
+    p = Path(path).resolve()
+    return str(p.relative_to(ROOT)) if p.is_relative_to(ROOT) else str(p)
+
+def import_csv(path: Path, strategy: str | None = None, dataset: str | None = None,
+               con: sqlite3.Connection | None = None) -> int | None:
+    """Import one results CSV (needs an equity_multiple column). Returns sweep_id or None."""
+    path = Path(path)
+    try:
+        df = pd.read_csv(path)
+    except pd.errors.EmptyDataError:
+        return None
+    if "equity_multiple" not in df.columns:
+        return None
+    s, d = _infer(path.stem)
+    m = _TS.search(path.stem)
+    ts = time.mktime(time.strptime(m.group(1), "%Y%m%d_%H%M%S")) if m else path.stat().st_mtime
+    return record(df.to_dict("records"), strategy or s, dataset or d, name=path.stem,
+                  source=path, created_ts=int(ts * 1000), con=con)
+
+def main(argv: list[str]) -> int:
+    if argv and argv[0] == "import":
+        pats = argv[1:] or ["data/backtests/*.csv"]
+        con = connect()
+        try:
+            for p in sorted({f for pat in pats for f in glob.glob(pat)}):
+                sid = import_csv(Path(p), con=con)
+                print(f"[results_db] {'skip' if sid is None else 'sweep ' + str(sid)}: {p}")
+        finally:
+            con.close()
+        return 0
+    if argv and argv[0] == "top":
+        args = argv[1:]
+        opts = {"--dataset": None, "--metric": "equity_multiple", "-n": "10", "--min-trades": "0"}
+        pos = []
+        i = 0
+        while i < len(args):
+            if args[i] in opts and i + 1 < len(args):
+                opts[args[i]] = args[i + 1]; i += 2
+            else:
+                pos.append(args[i]); i += 1
+        df = top(pos[0] if pos else None, opts["--dataset"], opts["--metric"].split(","),
+                 n=int(opts["-n"]), min_trades=int(opts["--min-trades"]))
+        print(df.to_string(index=False) if not df.empty else "(no results)")
+        return 0
+    if argv and argv[0] == "sweeps":
+        con = connect()
+        try:
+            for r in con.execute("SELECT strategy, dataset, COUNT(*), SUM(n_rows) FROM sweeps "
+                                 "GROUP BY strategy, dataset ORDER BY strategy, dataset"):
+                print(f"{r[0]:<40} {r[1]:<18} sweeps={r[2]:<4} rows={r[3]}")
+        finally:
+            con.close()
+        return 0
+    print("Usage: python -m src.results_db import [GLOB ...] | top [STRATEGY] [--dataset D] "
+          "[--metric m1,-m2] [-n N] [--min-trades K] | sweeps")
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,126 @@
+from __future__ import annotations
+import os, sys, json, argparse
+import numpy as np
+import pandas as pd
+
+# Resampling of per-trade returns to see how much of a sweep winner's equity
+# multiple is luck of ordering/selection. All resamples are built as one
+# (sims x trades) index matrix and evaluated with cumprod / maximum.accumulate,
+# so thousands of paths take milliseconds.
+N_SIMS     = int(os.getenv("ROBUST_SIMS", "5000"))
+BLOCK      = int(os.getenv("ROBUST_BLOCK", "5"))        # block length for the block bootstrap
+RUIN_DD    = float(os.getenv("ROBUST_RUIN_DD", "0.5"))  # ruin = equity falls this far below start
+CI         = float(os.getenv("ROBUST_CI", "0.90"))
+METHODS    = ("block", "iid", "shuffle")
+TOP        = int(os.getenv("ROBUST_TOP", "1"))          # sweep winners resampled by src.sweep_*_fast
+ROW_KEYS   = ("eq_lo", "eq_med", "eq_hi", "mdd_hi_pct", "p_loss", "p_ruin")
+
+def resample_idx(n: int, sims: int, method: str = "block", block: int = BLOCK,
+                 rng: np.random.Generator | None = None) -> np.ndarray:
+    """
+    (sims, n) indices into the trade array.
+      block   circular block bootstrap (keeps streaks of `block` consecutive trades)
+      iid     plain bootstrap with replacement
+      shuffle permutation: same trades, new order (final equity is unchanged,
+              only the path/drawdown varies)
+    """
+    rng = rng or np.random.default_rng()
+    if method == "shuffle":
+        return rng.permuted(np.tile(np.arange(n), (sims, 1)), axis=1)
+    if method == "iid":
+        return rng.integers(0, n, size=(sims, n))
+    if method == "block":
+        b = max(1, min(int(block), n))
+        nb = -(-n // b)
+        starts = rng.integers(0, n, size=(sims, nb, 1))
+        return ((starts + np.arange(b)) % n).reshape(sims, nb * b)[:, :n]
+    raise ValueError(f"unknown method {method!r}; use one of {METHODS}")
+
+def paths(rets, idx: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(final equity, max drawdown, min equity) per resampled path."""
+    r = np.asarray(rets, dtype=float)[idx]
+    eq = np.cumprod(1.0 + r, axis=1)
+    peak = np.maximum(np.maximum.accumulate(eq, axis=1), 1.0)  # start equity 1.0 counts as a peak
+    mdd = np.max((peak - eq) / peak, axis=1)
+    return eq[:, -1], np.maximum(mdd, 0.0), np.min(eq, axis=1)
+
+def simulate(rets, sims: int = N_SIMS, method: str = "block", block: int = BLOCK,
+             seed: int | None = 0) -> dict:
+    """Raw distributions: {"equity": (sims,), "mdd": (sims,), "min_equity": (sims,)}."""
+    r = np.asarray(rets, dtype=float)
+    r = r[np.isfinite(r)]
+    if len(r) == 0:
+        z = np.ones(sims)
+        return {"equity": z, "mdd": z * 0.0, "min_equity": z}
+    eq, mdd, lo = paths(r, resample_idx(len(r), sims, method, block, np.random.default_rng(seed)))
+    return {"equity": eq, "mdd": mdd, "min_equity": lo}
+
+def summary(rets, sims: int = N_SIMS, method: str = "block", block: int = BLOCK,
+            ruin_dd: float = RUIN_DD, ci: float = CI, seed: int | None = 0) -> dict:
+    """
+    Headline numbers for one trade sequence: the realized equity/drawdown, CI bounds
+    of their resampled distributions, P(equity < 1) and P(ruin), where ruin means the
+    path touched 1 - ruin_dd at any point.
+    """
+    r = np.asarray(rets, dtype=float)
+    r = r[np.isfinite(r)]
+    d = simulate(r, sims, method, block, seed)
+    lo_q, hi_q = (1.0 - ci) / 2.0, 1.0 - (1.0 - ci) / 2.0
+    eq_q = np.quantile(d["equity"], [lo_q, 0.5, hi_q])
+    dd_q = np.quantile(d["mdd"], [0.5, hi_q])
+    real_eq, real_dd, _ = paths(r, np.arange(len(r))[None, :]) if len(r) else (np.ones(1), np.zeros(1), None)
+    return {
+        "trades": int(len(r)), "method": method, "sims": int(sims),
+        "block": int(block) if method == "block" else None, "ci": ci,
+        "equity_multiple": round(float(real_eq[0]), 6),
+        "max_drawdown_pct": round(100.0 * float(real_dd[0]), 2),
+        "eq_lo": round(float(eq_q[0]), 6), "eq_med": round(float(eq_q[1]), 6), "eq_hi": round(float(eq_q[2]), 6),
+        "mdd_med_pct": round(100.0 * float(dd_q[0]), 2), "mdd_hi_pct": round(100.0 * float(dd_q[1]), 2),
+        "p_loss": round(float(np.mean(d["equity"] < 1.0)), 4),
+        "p_ruin": round(float(np.mean(d["min_equity"] <= 1.0 - ruin_dd)), 4),
+        "ruin_dd": ruin_dd,
+    }
+
+def for_result(res: dict, **kw) -> dict:
+    """summary() over a backtest result's trade_list (uses the net per-trade `ret`)."""
+    return summary([t["ret"] for t in res.get("trade_list") or []], **kw)
+
+def for_winners(rows: list[dict], rerun, top: int = TOP, **kw) -> list[dict]:
+    """
+    Annotate the first `top` rows of a sorted sweep in place with robust_<ROW_KEYS>.
+    `rerun(row)` re-runs that row's config and returns a result with its trade_list.
+    """
+    for row in rows[:top]:
+        try:
+            s = for_result(rerun(row), **kw)
+        except Exception as e:
+            print(f"[robust] rerun failed: {e!r}")
+            continue
+        row.update({f"robust_{k}": s[k] for k in ROW_KEYS})
+    return rows
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(prog="python -m src.robustness",
+                                 description="Bootstrap / shuffle robustness of a trades CSV")
+    ap.add_argument("csv", help="trades CSV (e.g. data/backtests/regime_v2_best_trades_*.csv)")
+    ap.add_argument("--col", default="ret", help="per-trade return column (default: ret)")
+    ap.add_argument("--pct", action="store_true", help="column is in percent (divide by 100)")
+    ap.add_argument("--method", default="block", choices=METHODS + ("all",))
+    ap.add_argument("--sims", type=int, default=N_SIMS)
+    ap.add_argument("--block", type=int, default=BLOCK)
+    ap.add_argument("--ruin-dd", type=float, default=RUIN_DD)
+    args = ap.parse_args(argv)
+
+    df = pd.read_csv(args.csv)
+    if args.col not in df.columns:
+        ap.error(f"column {args.col!r} not in {list(df.columns)}")
+    rets = pd.to_numeric(df[args.col], errors="coerce").to_numpy(dtype=float)
+    if args.pct:
+        rets = rets / 100.0
+    methods = METHODS if args.method == "all" else (args.method,)
+    out = [summary(rets, args.sims, m, args.block, args.ruin_dd) for m in methods]
+    print(json.dumps(out if len(out) > 1 else out[0], indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
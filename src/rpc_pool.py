@@ -0,0 +1,173 @@
+from __future__ import annotations
+import os, time, threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, TypeVar
+import requests
+
+# One place for Solana RPC endpoints. RPC_ENDPOINTS (comma-separated) lists them in
+# preference order; the older single-endpoint names (RPC_URL, RPC_PRIMARY,
+# RPC_SECONDARY) are folded in after it, so existing .env files keep working.
+# Each endpoint keeps one persistent solana Client. A background thread probes
+# every endpoint with getSlot every RPC_PROBE_SEC and keeps an EWMA of latency and
+# error rate; endpoints lagging the best slot by more than RPC_MAX_SLOT_LAG, or
+# failing RPC_FAIL_THRESHOLD times in a row, sit out RPC_COOLDOWN_S. Reads go to the
+# best-scoring healthy endpoint and fail over down the ranking on errors. Callers
+# pass `prefer` only to pin an endpoint on purpose (RPC_PIN); the configured order is
+# just the ranking before the first probe.
+DEFAULT_RPC  = "https://api.mainnet-beta.solana.com"
+PROBE_SEC    = float(os.getenv("RPC_PROBE_SEC", "15"))
+PROBE_TIMEOUT_S = float(os.getenv("RPC_PROBE_TIMEOUT_S", "3"))
+MAX_SLOT_LAG = int(os.getenv("RPC_MAX_SLOT_LAG", "20"))
+FAIL_THRESHOLD = int(os.getenv("RPC_FAIL_THRESHOLD", "2"))
+COOLDOWN_S   = float(os.getenv("RPC_COOLDOWN_S", "30"))
+ALPHA = 0.3   # EWMA weight of the newest sample
+
+T = TypeVar("T")
+
+def endpoints() -> list[str]:
+    urls = [u.strip() for u in os.getenv("RPC_ENDPOINTS", "").split(",")]
+    urls += [os.getenv(k, "") for k in ("RPC_URL", "RPC_PRIMARY", "RPC_SECONDARY")]
+    out: list[str] = []
+    for u in urls:
+        if u and u not in out:
+            out.append(u)
+    return out or [DEFAULT_RPC]
+
+def pinned() -> str | None:
+    """RPC_PIN: an endpoint to prefer over the latency ranking while it is healthy."""
+    return os.getenv("RPC_PIN", "").strip() or None
+
+@dataclass
+class Node:
+    url: str
+    ms: float | None = None          # EWMA latency (probes + real calls)
+    err: float = 0.0                 # EWMA error rate
+    fails: int = 0                   # consecutive failures
+    slot: int = 0
+    down_until: float = 0.0
+    _client: object = field(default=None, repr=False)
+
+    @property
+    def client(self):
+        if self._client is None:
+            from solana.rpc.api import Client
+            self._client = Client(self.url)
+        return self._client
+
+    def ok(self, ms: float) -> None:
+        self.ms = ms if self.ms is None else (1 - ALPHA) * self.ms + ALPHA * ms
+        self.err *= 1 - ALPHA
+        self.fails = 0
+
+    def failed(self) -> None:
+        self.err = (1 - ALPHA) * self.err + ALPHA
+        self.fails += 1
+        if self.fails >= FAIL_THRESHOLD:
+            self.down_until = time.monotonic() + COOLDOWN_S
+
+    def score(self) -> float:
+        return (self.ms if self.ms is not None else 1e4) * (1 + 4 * self.err)
+
+class RpcPool:
+    def __init__(self, urls: list[str] | None = None):
+        self.nodes = [Node(u) for u in (urls or endpoints())]
+        self.session = requests.Session()
+        self._lock = threading.Lock()
+        self._probing = False
+
+    def node(self, url: str) -> Node:
+        for n in self.nodes:
+            if n.url == url:
+                return n
+        n = Node(url)
+        with self._lock:
+            self.nodes.append(n)
+        return n
+
+    def ranked(self, prefer: str | None = None) -> list[Node]:
+        """Healthy endpoints best first (`prefer` first if healthy), then the rest."""
+        now = time.monotonic()
+        top = max((n.slot for n in self.nodes), default=0)
+        healthy = lambda n: n.down_until <= now and not (n.slot and top - n.slot > MAX_SLOT_LAG)
+        good = sorted((n for n in self.nodes if healthy(n)), key=Node.score)
+        if prefer:
+            good.sort(key=lambda n: n.url != prefer)
+        return good + sorted((n for n in self.nodes if not healthy(n)), key=Node.score)
+
+    def client(self, prefer: str | None = None):
+        return self.ranked(prefer)[0].client
+
+    def call(self, fn: Callable[[object], T], prefer: str | None = None, attempts: int | None = None) -> T:
+        """fn(client) on the best endpoint, failing over down the ranking; last error re-raised."""
+        return self._failover(lambda n: fn(n.client), prefer, attempts)
+
+    def request(self, method: str, params: list, prefer: str | None = None, timeout: float = 10.0):
+        """Raw JSON-RPC call (plain dicts back, no solders types) with the same failover."""
+        def post(n: Node):
+            r = self.session.post(n.url, json={"jsonrpc": "2.0", "id": 1, "method": method, "params": params},
+                                  timeout=timeout)
+            r.raise_for_status()
+            j = r.json()
+            if "error" in j:
+                raise RuntimeError(f"{method}: {j['error']}")
+            return j.get("result")
+        return self._failover(post, prefer)
+
+    def _failover(self, fn: Callable[[Node], T], prefer: str | None, attempts: int | None = None) -> T:
+        err: Exception | None = None
+        for n in self.ranked(prefer)[: attempts or len(self.nodes)]:
+            t0 = time.perf_counter()
+            try:
+                out = fn(n)
+            except Exception as e:
+                n.failed()
+                err = e
+                continue
+            n.ok(1000.0 * (time.perf_counter() - t0))
+            return out
+        raise err if err else RuntimeError("no RPC endpoints configured")
+
+    # ---- probes ----
+    def probe(self, n: Node) -> None:
+        t0 = time.perf_counter()
+        try:
+            r = self.session.post(n.url, json={"jsonrpc": "2.0", "id": 1, "method": "getSlot",
+                                               "params": [{"commitment": "processed"}]}, timeout=PROBE_TIMEOUT_S)
+            r.raise_for_status()
+            n.slot = int(r.json()["result"])
+        except Exception:
+            n.failed()
+            return
+        n.ok(1000.0 * (time.perf_counter() - t0))
+
+    def probe_all(self) -> None:
+        with ThreadPoolExecutor(max_workers=len(self.nodes)) as ex:
+            list(ex.map(self.probe, self.nodes))
+
+    def start(self) -> None:
+        """Probe once now (to rank before the first call), then every PROBE_SEC in the background."""
+        if self._probing or len(self.nodes) < 2 or PROBE_SEC <= 0:
+            return
+        self._probing = True
+        self.probe_all()
+        def loop():
+            while True:
+                time.sleep(PROBE_SEC)
+                self.probe_all()
+        threading.Thread(target=loop, name="rpc-probe", daemon=True).start()
+
+    def status(self) -> list[dict]:
+        now = time.monotonic()
+        return [{"url": n.url, "ms": None if n.ms is None else round(n.ms, 1), "err": round(n.err, 3),
+                 "slot": n.slot, "down": n.down_until > now} for n in self.ranked()]
+
+_POOL: RpcPool | None = None
+
+def pool() -> RpcPool:
+    """Process-wide pool over endpoints(); probing starts on first use."""
+    global _POOL
+    if _POOL is None:
+        _POOL = RpcPool()
+        _POOL.start()
+    return _POOL
@@ -24,6 +24,7 @@ from src.jupiter_client import (
     ROOT, USDC_MINT, SOL_MINT,
     load_env, load_pubkey_base58,
 )
+from src.confirm_tracker import ensure_columns, NOT_FAILED_SQL
 
 PLAN_PATH = (ROOT / "data" / "sell_plan.json")
 
@@ -65,10 +66,11 @@ def main():
     # fetch last BUY to compute entry price
     db_path = ROOT / "data" / "trades.sqlite"
     conn = sqlite3.connect(db_path)
+    ensure_columns(conn)
     cur = conn.cursor()
-    cur.execute("""SELECT ts, in_amount, out_amount, tx_sig
+    cur.execute(f"""SELECT ts, in_amount, out_amount, tx_sig
                    FROM trades
-                   WHERE side IN ('BUY','BUY_SOL') AND tx_sig IS NOT NULL
+                   WHERE side IN ('BUY','BUY_SOL') AND tx_sig IS NOT NULL AND {NOT_FAILED_SQL}
                    ORDER BY ts DESC LIMIT 1""")
     row = cur.fetchone()
     conn.close()
@@ -109,6 +111,7 @@ def main():
 
     # quote SOL -> USDC now
     q0 = time.time()
+    quoted_at_ms = int(q0 * 1000)
     quote = jup_quote_sell(sell_qty_sol, slippage_bps)
     ms = int((time.time() - q0) * 1000)
     out_usdc_now = Decimal(quote["outAmount"]) / Decimal(10**6)
@@ -133,7 +136,8 @@ def main():
         "sl_target_usdc": str(sl_target.quantize(Decimal('0.0001'))),
         "quoted_out_usdc": str(out_usdc_now.quantize(Decimal('0.0001'))),
         "price_impact_pct": str(price_impact_pct),
-        "quote_raw": quote,  # executor can reuse this to avoid re-quoting if timely
+        "quote_raw": quote,  # executor reuses this within QUOTE_MAX_AGE_MS (src.quotes)
+        "quoted_at_ms": quoted_at_ms,
     })
 
     # ensure data dir exists
@@ -1,5 +1,5 @@
 from __future__ import annotations
-import os, sys, sqlite3, json, subprocess, time
+import os, sys, sqlite3, json, time
 from pathlib import Path
 from dataclasses import dataclass
 import requests
@@ -7,6 +7,8 @@ from solana.rpc.api import Client
 from solders.keypair import Keypair
 from solders.pubkey import Pubkey
 from src.jupiter_client import USDC_MINT, SOL_MINT
+from src.rpc_pool import pinned
+from src.confirm_tracker import ensure_columns, NOT_FAILED_SQL
 
 ROOT = Path(__file__).resolve().parents[1]
 DB_PATH = ROOT / "data" / "trades.sqlite"
@@ -19,7 +21,7 @@ SESSION.headers.update({
 
 @dataclass
 class Cfg:
-    rpc: str
+    rpc: str | None                  # pinned endpoint; None follows the pool's ranking
     keypair_path: Path
     sell_min_profit_bps: int
     min_sell_sol: float
@@ -27,7 +29,7 @@ class Cfg:
 
 def load_cfg() -> Cfg:
     return Cfg(
-        rpc=os.environ.get("RPC_URL", "https://api.mainnet-beta.solana.com"),
+        rpc=pinned(),
         keypair_path=Path(os.environ["KEYPAIR_PATH"]),
         sell_min_profit_bps=int(os.environ.get("SELL_MIN_PROFIT_BPS", "50")),
         min_sell_sol=float(os.environ.get("MIN_SELL_SOL", "0.010")),
@@ -43,58 +45,49 @@ def get_sol_balance(client: Client, pubkey: Pubkey) -> float:
     lamports = client.get_balance(pubkey).value
     return lamports / 1_000_000_000
 
-def get_usdc_per_sol(max_retries: int = 3) -> float | None:
-    # Try Jupiter QUOTE v6 with three sizes
-    amounts = [1_000_000_000, 500_000_000, 100_000_000]  # 1.0 / 0.5 / 0.1 SOL
-    for amount in amounts:
-        for _ in range(max_retries):
-            try:
-                r = SESSION.get(
-                    "https://quote-api.jup.ag/v6/quote",
-                    params={"inputMint": SOL_MINT, "outputMint": USDC_MINT, "amount": amount},
-                    timeout=12,
-                )
-                j = r.json()
-                data = j.get("data") or []
-                if data:
-                    px = int(data[0]["outAmount"]) / 1_000_000.0
-                    print(f"[sell_guard] price source=quote v6, size={amount/1e9:g} SOL -> {px:.4f} USDC/SOL")
-                    return px
-            except Exception:
-                time.sleep(0.4)
-                continue
-    # Fallback: Jupiter PRICE v4
-    try:
-        r = SESSION.get("https://price.jup.ag/v4/price", params={"ids": "SOL", "vsToken": "USDC"}, timeout=8)
-        px = float(r.json()["data"]["SOL"]["price"])
-        print(f"[sell_guard] price source=price v4 -> {px:.4f} USDC/SOL")
-        return px
-    except Exception:
-        pass
-    # Fallback: Jupiter PRICE v6
-    try:
-        r = SESSION.get("https://price.jup.ag/v6/price", params={"ids": "SOL", "vsToken": "USDC"}, timeout=8)
-        px = float(r.json()["data"]["SOL"]["price"])
-        print(f"[sell_guard] price source=price v6 -> {px:.4f} USDC/SOL")
-        return px
-    except Exception:
-        pass
-    # Final fallback: CoinGecko
-    try:
-        r = SESSION.get("https://api.coingecko.com/api/v3/simple/price", params={"ids": "solana", "vs_currencies": "usd"}, timeout=8)
-        px = float(r.json()["solana"]["usd"])
-        print(f"[sell_guard] price source=coingecko -> {px:.4f} USDC/SOL")
-        return px
-    except Exception:
-        return None
+def _quote_px(amount: int) -> float | None:
+    r = SESSION.get("https://quote-api.jup.ag/v6/quote",
+                    params={"inputMint": SOL_MINT, "outputMint": USDC_MINT, "amount": amount}, timeout=12)
+    j = r.json()
+    out = j.get("outAmount") or ((j.get("data") or [{}])[0]).get("outAmount")
+    return int(out) / 1_000_000.0 * (1_000_000_000 / amount) if out else None
+
+def _price_api_px(url: str) -> float:
+    r = SESSION.get(url, params={"ids": "SOL", "vsToken": "USDC"}, timeout=8)
+    return float(r.json()["data"]["SOL"]["price"])
+
+def _coingecko_px() -> float:
+    r = SESSION.get("https://api.coingecko.com/api/v3/simple/price", params={"ids": "solana", "vs_currencies": "usd"}, timeout=8)
+    return float(r.json()["solana"]["usd"])
+
+def price_sources() -> list[tuple[str, object]]:
+    """USDC/SOL sources, best first: Jupiter quote (1.0 / 0.5 / 0.1 SOL), price v4, v6, CoinGecko."""
+    return ([(f"quote v6, size={a/1e9:g} SOL", (lambda a=a: _quote_px(a)))
+             for a in (1_000_000_000, 500_000_000, 100_000_000)] +
+            [("price v4", lambda: _price_api_px("https://price.jup.ag/v4/price")),
+             ("price v6", lambda: _price_api_px("https://price.jup.ag/v6/price")),
+             ("coingecko", _coingecko_px)])
+
+def get_usdc_per_sol(until: float | None = None, extra: list | None = None, futs: list | None = None) -> float | None:
+    """All sources at once (src.pretrade); the best answer within the budget wins.
+    `extra` sources go first (e.g. the executor's quote for the plan size); pass `futs`
+    from pretrade.race() to collect sources that were started earlier."""
+    from src import pretrade
+    futs = futs if futs is not None else pretrade.race((extra or []) + price_sources())
+    name, px = pretrade.pick(futs, until or pretrade.deadline())
+    if px is not None:
+        print(f"[sell_guard] price source={name} -> {px:.4f} USDC/SOL")
+    return px
 
 def last_buy_price_usdc() -> float | None:
     conn = sqlite3.connect(DB_PATH)
+    ensure_columns(conn)
     cur = conn.cursor()
     for col in ("price_usdc", "price"):
         try:
             cur.execute(
-                f"SELECT {col} FROM trades WHERE side LIKE 'BUY%' AND tx_sig IS NOT NULL ORDER BY ts DESC LIMIT 1"
+                f"SELECT {col} FROM trades WHERE side LIKE 'BUY%' AND tx_sig IS NOT NULL AND {NOT_FAILED_SQL} "
+                "ORDER BY ts DESC LIMIT 1"
             )
             row = cur.fetchone()
             if row and row[0] is not None:
@@ -107,34 +100,10 @@ def last_buy_price_usdc() -> float | None:
     return None
 
 def main():
-    cfg = load_cfg()
-    print(f"[sell_guard] cfg: PROFIT_BPS={cfg.sell_min_profit_bps}, MIN_SELL_SOL={cfg.min_sell_sol}, RESERVE={cfg.min_sol_reserve}")
-
-    client = Client(cfg.rpc)
-    pubkey = pubkey_from_keypair(cfg.keypair_path)
-    bal = get_sol_balance(client, pubkey)
-    if bal - cfg.min_sol_reserve < cfg.min_sell_sol:
-        print(f"[sell_guard] SKIP: balance {bal:.6f} SOL too small after reserve {cfg.min_sol_reserve} (need >= {cfg.min_sell_sol}).")
-        return 2
-
-    last_buy = last_buy_price_usdc()
-    now_px = get_usdc_per_sol()
-    if now_px is None:
-        print("[sell_guard] SKIP: price unavailable (all sources failed); will retry next loop.")
-        return 2
-    if last_buy is None:
-        print(f"[sell_guard] WARN: no prior BUY price found; skipping SELL for safety. (now {now_px:.4f} USDC/SOL)")
-        return 2
-
-    need = last_buy * (1 + cfg.sell_min_profit_bps / 10_000.0)
-    if now_px < need:
-        print(f"[sell_guard] SKIP: now {now_px:.4f} < target {need:.4f} (last_buy {last_buy:.4f} + {cfg.sell_min_profit_bps}bps).")
-        return 2
-
-    print(f"[sell_guard] OK: now {now_px:.4f} >= target {need:.4f}; running sell_execute…")
-    rc = subprocess.call([sys.executable, "-m", "src.sell_execute"], cwd=str(ROOT))
-    print(f"[sell_guard] sell_execute exit {rc}")
-    return rc
+    # in-process: guard + sell_execute share one keypair/RPC client (src.execution)
+    from src.execution import pipeline
+    p = pipeline()
+    return p.settle(p.sell()).rc
 
 if __name__ == "__main__":
     sys.exit(main())
@@ -1,19 +1,29 @@
 from __future__ import annotations
 import os, json
+import pandas as pd
 from datetime import datetime, timezone
 from .backtest_combo_mtf import (
     fetch_klines, add_indicators, make_bias_series_1h, signals_15m_with_filters
 )
 
-def latest_signal() -> dict:
+def fetch_frames(closed_only: bool = False):
+    """(signal-interval klines, bias-interval klines) as configured by BB_*/MTF_* env.
+    Binance serves the still-forming bar last; `closed_only` drops it (bar-aligned runs)."""
+    sym   = os.getenv("BB_SYMBOL","SOLUSDT").upper()
+    df15 = fetch_klines(sym, os.getenv("BB_INTERVAL","15m"), int(os.getenv("BB_LIMIT","5000")))
+    df1h = fetch_klines(sym, os.getenv("MTF_BIAS_INTERVAL","1h"), int(os.getenv("MTF_BIAS_LIMIT","2000")))
+    if closed_only:
+        now = pd.Timestamp.now(tz="UTC").tz_localize(None)
+        df15, df1h = df15[df15["close_time"] < now], df1h[df1h["close_time"] < now]
+    return df15, df1h
+
+def latest_signal(frames=None, closed_only: bool = False) -> dict:
+    """`frames` = fetch_frames() output to reuse already-fetched bars (src.daemon); None fetches."""
     sym   = os.getenv("BB_SYMBOL","SOLUSDT").upper()
     t_int = os.getenv("BB_INTERVAL","15m")
-    t_lim = int(os.getenv("BB_LIMIT","5000"))
     b_int = os.getenv("MTF_BIAS_INTERVAL","1h")
-    b_lim = int(os.getenv("MTF_BIAS_LIMIT","2000"))
 
-    df15 = fetch_klines(sym, t_int, t_lim)
-    df1h = fetch_klines(sym, b_int, b_lim)
+    df15, df1h = frames if frames is not None else fetch_frames(closed_only)
 
     # indicators + bias
     df15i = add_indicators(df15)
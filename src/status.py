@@ -11,6 +11,7 @@ from solders.keypair import Keypair
 from solders.pubkey import Pubkey
 
 from src.pnl import get_mark_usdc_per_sol, iter_trades  # reuse helpers
+from src.rpc_pool import pool
 
 ROOT = Path(__file__).resolve().parents[1]
 ENV  = ROOT / "config" / ".env"
@@ -157,8 +158,7 @@ def compute_pnl():
 
 def main():
     load_env()
-    rpc = os.environ.get("RPC_URL", "https://api.mainnet-beta.solana.com")
-    client = Client(rpc)
+    rpc = pool()
     owner = load_pubkey()
 
     print("== Bot Status ==")
@@ -168,11 +168,11 @@ def main():
     print(fmt_cooldown("next BUY", COOLDOWN_BUY), " | ", fmt_cooldown("next SELL", COOLDOWN_SELL))
 
     try:
-        sol = sol_balance(client, owner)
+        sol = rpc.call(lambda c: sol_balance(c, owner))
     except Exception:
         sol = float("nan")
     try:
-        usdc = usdc_balance(client, owner)
+        usdc = rpc.call(lambda c: usdc_balance(c, owner))
     except Exception:
         usdc = float("nan")
     print(f"Balances → SOL={sol:.6f}, USDC={usdc:.2f}")
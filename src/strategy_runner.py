@@ -9,9 +9,15 @@ SELL_SCRIPT= os.getenv("SELL_SCRIPT", "src/sell_execute.py")
 STATE_FILE = Path(os.getenv("STATE_FILE", "data/last_action.json"))
 POLL_SECS  = int(os.getenv("POLL_SECS", "60"))
 TEST_ACTION= os.getenv("TEST_ACTION", "").strip().upper()  # optional, one-shot force
+STRATEGY_MODE = os.getenv("STRATEGY_MODE", "mtf").strip().lower()  # mtf | regime
+# bar: wake at each BB_INTERVAL close (+BAR_CLOCK_LAG_MS) and evaluate the closed bar once;
+# poll: re-evaluate the forming bar every POLL_SECS (previous behaviour)
+SCHEDULE   = os.getenv("SIGNAL_SCHEDULE", "bar").strip().lower()
 
 DB_PATH    = Path(os.getenv("SIGNALS_DB", "data/signals.sqlite"))
 
+import pandas as pd  # noqa: E402
+from src import bar_clock  # noqa: E402
 from src.signal_mtf import latest_signal  # noqa: E402
 
 def db_init():
@@ -33,8 +39,14 @@ def db_init():
     con.commit()
     con.close()
 
-def db_log(sig: dict):
-    con = sqlite3.connect(DB_PATH)
+def _f(x):
+    return None if x is None else float(x)
+
+def db_log(sig: dict, con: sqlite3.Connection | None = None):
+    """Append one signal row; pass `con` to reuse a long-lived connection (src.daemon)."""
+    own = con is None
+    if own:
+        con = sqlite3.connect(DB_PATH)
     cur = con.cursor()
     cur.execute("""
       INSERT INTO signals
@@ -45,13 +57,14 @@ def db_log(sig: dict):
     """, (
         sig["now_utc"], sig["symbol"], sig["interval"], sig["bias_interval"],
         str(sig["last_time"]), float(sig["last_price"]),
-        float(sig["ema9"]), float(sig["ema21"]), float(sig["rsi"]), float(sig["macd_hist"]),
-        float(sig["vol"]), float(sig["vol_sma20"]), float(sig["sma200"]),
+        _f(sig.get("ema9")), _f(sig.get("ema21")), _f(sig.get("rsi")), _f(sig.get("macd_hist")),
+        _f(sig.get("vol")), _f(sig.get("vol_sma20")), _f(sig.get("sma200")),
         1 if bool(sig["bias_ok"]) else 0, sig["signal"], sig["action"], sig["reason"],
         json.dumps(sig["filters"]), json.dumps(sig),
     ))
     con.commit()
-    con.close()
+    if own:
+        con.close()
 
 def read_state() -> dict:
     try:
@@ -93,9 +106,44 @@ def maybe_execute(action: str) -> None:
             else:
                 print(f"SELL script missing: {SELL_SCRIPT}")
 
-def loop_once() -> dict:
-    db_init()
-    sig = latest_signal()
+def get_signal(frames=None, closed_only: bool = False) -> dict:
+    if STRATEGY_MODE == "regime":
+        from src.regime_live import latest_signal as regime_signal
+        return regime_signal(read_state().get("last_action", "HOLD"))
+    return latest_signal(frames, closed_only)
+
+def bar_close_ms(sig: dict) -> int | None:
+    """Close time (epoch ms) of the bar `sig` was evaluated on."""
+    if not sig.get("last_time"):
+        return None
+    t = pd.Timestamp(sig["last_time"])
+    t = t.tz_localize("UTC") if t.tzinfo is None else t.tz_convert("UTC")
+    return int(t.value // 1_000_000)
+
+def run_bar_aligned() -> None:
+    """One evaluation per newly closed bar, right after it closes; idle in between."""
+    step = bar_clock.step_ms(os.getenv("BB_INTERVAL", "15m"))
+    gate = bar_clock.BarGate()
+    while True:
+        boundary = bar_clock.sleep_to_next(step)
+        for _ in range(bar_clock.RETRIES + 1):
+            sig = get_signal(closed_only=True)
+            close = bar_close_ms(sig)
+            if close is not None and close >= boundary - 1:
+                if gate.fresh(close):
+                    loop_once(sig)
+                break
+            time.sleep(bar_clock.RETRY_MS / 1000.0)
+        else:
+            print(f"bar closing {boundary} not served after {bar_clock.RETRIES} retries; waiting for the next")
+
+def loop_once(sig: dict | None = None, con: sqlite3.Connection | None = None, execute=maybe_execute) -> dict:
+    """One poll: signal -> log -> execute on action change. The daemon passes a
+    precomputed `sig`, its open signals connection and an in-process `execute`."""
+    if con is None:
+        db_init()
+    if sig is None:
+        sig = get_signal()
 
     # Optional one-shot forced action for wiring tests
     if TEST_ACTION in ("BUY_SOL", "SELL_SOL"):
@@ -103,21 +151,25 @@ def loop_once() -> dict:
         sig["reason"] = f"FORCED via TEST_ACTION={TEST_ACTION}"
 
     # Summary + JSON
-    print(f"{sig['now_utc']} | {sig['symbol']} {sig['interval']} | "
-          f"price={sig['last_price']:.3f} rsi={sig['rsi']:.1f} "
-          f"ema9/21={sig['ema9']:.2f}/{sig['ema21']:.2f} "
-          f"bias_ok={sig['bias_ok']} action={sig['action']} reason={sig['reason']}")
+    if STRATEGY_MODE == "regime":
+        print(f"{sig['now_utc']} | {sig['symbol']} {sig['interval']} | "
+              f"price={sig['last_price']:.3f} action={sig['action']} reason={sig['reason']}")
+    else:
+        print(f"{sig['now_utc']} | {sig['symbol']} {sig['interval']} | "
+              f"price={sig['last_price']:.3f} rsi={sig['rsi']:.1f} "
+              f"ema9/21={sig['ema9']:.2f}/{sig['ema21']:.2f} "
+              f"bias_ok={sig['bias_ok']} action={sig['action']} reason={sig['reason']}")
     print(json.dumps(sig))
 
     # Log to SQLite
-    db_log(sig)
+    db_log(sig, con)
 
     # Fire only on action change
     state = read_state()
     last_action = state.get("last_action", "HOLD")
     if sig["action"] in ("BUY_SOL", "SELL_SOL") and sig["action"] != last_action:
         print(f"✳️ action changed: {last_action} → {sig['action']}")
-        maybe_execute(sig["action"])
+        execute(sig["action"])
         state = {"last_action": sig["action"],
                  "last_time": sig.get("last_time"),
                  "updated_utc": datetime.now(timezone.utc).isoformat()}
@@ -133,7 +185,10 @@ def main():
     if once:
         loop_once()
         return
-    print("strategy_runner starting… (Ctrl+C to stop)")
+    print(f"strategy_runner starting… schedule={SCHEDULE} (Ctrl+C to stop)")
+    if SCHEDULE == "bar":
+        run_bar_aligned()
+        return
     while True:
         loop_once()
         time.sleep(POLL_SECS)
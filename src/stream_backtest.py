@@ -0,0 +1,158 @@
+from __future__ import annotations
+import sys, json
+from typing import Iterable, Optional
+import numpy as np
+import pandas as pd
+
+from src import backtest_hybrid as bh, ohlcv_store, profiling as prof
+from src.indicators import EMA, RSI, ATR, RollingBands, RollingMean
+
+# Streaming version of backtest_hybrid.run_backtest: bars are read from the OHLCV store
+# in fixed-size chunks and pushed through incremental indicators, so memory does not
+# grow with history length. Strategy parameters come from backtest_hybrid's globals
+# (same env vars), and the trade rules are the same bar-for-bar.
+
+class BBATRState:
+    """Indicator + position state for run_backtest rules; survives chunk boundaries."""
+    def __init__(self):
+        self.bands = RollingBands(bh.BB_PERIOD, bh.BB_K)
+        self.rsi = RSI(bh.RSI_PERIOD)
+        self.atr = ATR(bh.ATR_PERIOD)
+        self.ema_trend = EMA(bh.EMA_TREND_N)
+        self.vol_ma = RollingMean(bh.VOL_MA_N)
+        self.start = max(bh.BB_PERIOD, bh.RSI_PERIOD, bh.ATR_PERIOD, bh.EMA_TREND_N, bh.VOL_MA_N) + 2
+        self.i = -1
+        self.prev: Optional[tuple] = None  # (close, upper, lower, ema_trend) of previous bar
+
+        self.in_pos = False
+        self.entry_price = self.stop_lvl = self.tp_lvl = None
+        self.entry_idx: Optional[int] = None
+        self.cooldown = 0
+        self.last_close: Optional[float] = None
+
+        # running results; only per-trade returns (and entry bar) are kept
+        self.rets: list[float] = []
+        self.entries: list[int] = []
+        self.reasons: dict[str, int] = {}
+        self.equity = 1.0
+        self.peak = 1.0
+        self.mdd = 0.0
+
+    def _mark(self, v: float) -> None:
+        if v > self.peak:
+            self.peak = v
+        dd = (self.peak - v) / self.peak if self.peak > 0 else 0.0
+        if dd > self.mdd:
+            self.mdd = dd
+
+    def update(self, h: float, l: float, c: float, v: float) -> None:
+        self.i += 1
+        i = self.i
+        self.bands.update(c)
+        r_now = self.rsi.update(c)
+        a_now = self.atr.update(h, l, c)
+        ema_now = self.ema_trend.update(c)
+        v_avg = self.vol_ma.update(v)
+        up, lo = self.bands.upper, self.bands.lower
+        prev, self.prev = self.prev, (c, up, lo, ema_now)
+        self.last_close = c
+        if i < self.start:
+            return
+        c_prev, up_prev, lo_prev, ema_prev = prev
+
+        if not self.in_pos:
+            if self.cooldown > 0:
+                self.cooldown -= 1
+            else:
+                entry_cross = (c_prev < lo_prev) and (c > lo)
+                rsi_gate = r_now <= bh.RSI_BUY_MAX
+                vol_gate = (v > v_avg * bh.VOL_MULT) if v_avg is not None else False
+                trend_gate = True
+                if bh.REQUIRE_TREND:
+                    trend_gate = (c > ema_now) and (ema_now > ema_prev)
+                if entry_cross and rsi_gate and vol_gate and trend_gate:
+                    self.in_pos = True
+                    self.entry_price = c * (1.0 + bh.COST_BPS_PER_SIDE)
+                    self.entry_idx = i
+                    self.stop_lvl = c - bh.ATR_STOP_MULT * a_now
+                    self.tp_lvl = c + bh.ATR_TP_MULT * a_now
+        else:
+            reason = None
+            if c <= self.stop_lvl:
+                reason = "STOP_ATR"
+            elif c >= self.tp_lvl:
+                reason = "TAKE_PROFIT_ATR"
+            elif r_now >= bh.RSI_SELL_MIN:
+                reason = "RSI_EXIT"
+            elif (c_prev > up_prev) and (c < up):
+                reason = "BB_UP_CROSSDOWN"
+            if reason:
+                exit_price = c * (1.0 - bh.COST_BPS_PER_SIDE)
+                ret = (exit_price - self.entry_price) / self.entry_price
+                self.rets.append(float(ret))
+                self.entries.append(self.entry_idx)
+                self.reasons[reason] = self.reasons.get(reason, 0) + 1
+                self.equity *= (1.0 + ret)
+                self.in_pos = False
+                self.entry_price = self.entry_idx = self.stop_lvl = self.tp_lvl = None
+                self.cooldown = bh.COOLDOWN_BARS
+        # run_backtest appends the equity point once per bar from `start` on
+        self._mark(self.equity)
+
+    @prof.timed("stream.feed")
+    def feed(self, chunk: pd.DataFrame) -> None:
+        prof.count("chunks"); prof.count("bars", len(chunk))
+        h = chunk["high"].to_numpy(dtype=float).tolist()
+        l = chunk["low"].to_numpy(dtype=float).tolist()
+        c = chunk["close"].to_numpy(dtype=float).tolist()
+        v = chunk["volume"].to_numpy(dtype=float).tolist()
+        upd = self.update
+        for k in range(len(c)):
+            upd(h[k], l[k], c[k], v[k])
+
+def frame_chunks(df: pd.DataFrame, chunk: int) -> Iterable[pd.DataFrame]:
+    """Split an in-memory frame the same way iter_chunks splits the store (for parity checks)."""
+    for a in range(0, len(df), chunk):
+        yield df.iloc[a:a + chunk]
+
+def run(symbol: str = bh.SYMBOL, interval: str = bh.INTERVAL, chunk: int = 250_000,
+        start_ms=None, end_ms=None, chunks: Iterable[pd.DataFrame] | None = None) -> dict:
+    """run_backtest over the whole store (or `chunks`), in constant memory."""
+    st = BBATRState()
+    if chunks is None:
+        chunks = ohlcv_store.iter_chunks(symbol, interval, chunk, start_ms, end_ms)
+    for ck in chunks:
+        st.feed(ck)
+
+    open_ret = None
+    if st.in_pos and st.entry_price is not None:
+        last_c = st.last_close * (1.0 - bh.COST_BPS_PER_SIDE)
+        open_ret = (last_c - st.entry_price) / st.entry_price
+
+    n = len(st.rets)
+    wins = sum(1 for r in st.rets if r > 0)
+    avg_ret = float(np.mean(st.rets)) if st.rets else 0.0
+    return {
+        "symbol": symbol, "interval": interval,
+        "bb_period": bh.BB_PERIOD, "bb_k": bh.BB_K,
+        "rsi_period": bh.RSI_PERIOD, "atr_period": bh.ATR_PERIOD,
+        "rsi_buy_max": bh.RSI_BUY_MAX, "rsi_sell_min": bh.RSI_SELL_MIN,
+        "atr_stop_mult": bh.ATR_STOP_MULT, "atr_tp_mult": bh.ATR_TP_MULT,
+        "fee_bps_per_side": bh.FEE_BPS, "slip_bps_per_side": bh.SLIP_BPS,
+        "vol_ma_n": bh.VOL_MA_N, "vol_mult": bh.VOL_MULT,
+        "ema_trend_n": bh.EMA_TREND_N, "require_trend": bh.REQUIRE_TREND,
+        "bars": int(st.i + 1), "trades": int(n),
+        "wins": int(wins), "losses": int(n - wins),
+        "win_rate_pct": round(100.0 * wins / max(1, n), 2),
+        "avg_trade_ret_pct": round(100.0 * avg_ret, 4),
+        "equity_multiple": round(float(st.equity), 6),
+        "max_drawdown_pct": round(100.0 * st.mdd, 2),
+        "open_position_ret_pct": round(100.0 * open_ret, 4) if open_ret is not None else None,
+        "exit_reasons": st.reasons,
+        "engine": "stream",
+    }
+
+if __name__ == "__main__":
+    sym = sys.argv[1].upper() if len(sys.argv) > 1 else bh.SYMBOL
+    itv = sys.argv[2] if len(sys.argv) > 2 else bh.INTERVAL
+    print(json.dumps(run(sym, itv), indent=2))
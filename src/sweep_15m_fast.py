@@ -2,6 +2,7 @@
 import os, json, csv, subprocess, sys
 from pathlib import Path
 from itertools import product
+from src import profiling as prof
 
 DATA = Path("data/SOLUSDT_15m_5000.json")
 OUTDIR = Path("data/backtests"); OUTDIR.mkdir(parents=True, exist_ok=True)
@@ -23,6 +24,8 @@ def need_cache():
               "python3 -m src.backtest_hybrid")
         sys.exit(2)
 
+PROFILES = []  # per-child stage breakdowns when BT_PROFILE=1
+
 def run_once(env):
     # Use the cached JSON; no network
     child_env = os.environ.copy()
@@ -33,10 +36,11 @@ def run_once(env):
     for k,v in env.items():
         child_env[k] = str(v)
 
-    proc = subprocess.run(
-        [sys.executable, "-m", "src.backtest_hybrid"],
-        env=child_env, capture_output=True, text=True
-    )
+    with prof.stage("sweep.child"):
+        proc = subprocess.run(
+            [sys.executable, "-m", "src.backtest_hybrid"],
+            env=child_env, capture_output=True, text=True
+        )
     out = proc.stdout.strip().splitlines()[-1] if proc.stdout.strip() else ""
     try:
         res = json.loads(out) if out else {}
@@ -45,27 +49,33 @@ def run_once(env):
 
     row = {}
     if isinstance(res, dict):
+        if "profile" in res:
+            PROFILES.append(res.pop("profile"))
         row.update(res)
     row.update(env)
     return row
 
-def main():
-    need_cache()
-    combos = list(product(
+def grid():
+    """Env overrides for every combo (also used by src.purged_cv)."""
+    combos = product(
         BB_K_vals, RSI_BUY_MAX_vals, RSI_SELL_MIN_vals, VOL_MULT_vals,
         EMA_TREND_N_vals, REQUIRE_TREND_vals, BB_COOLDOWN_vals
-    ))
+    )
+    return [{
+        "BB_K":k, "RSI_BUY_MAX":rbu, "RSI_SELL_MIN":rse,
+        "VOL_MA_N":20, "VOL_MULT":volx,
+        "EMA_TREND_N":ema, "REQUIRE_TREND":req,
+        "BB_COOLDOWN_BARS":cd,
+        "FEE_BPS":12.5, "SLIP_BPS":12.5,
+    } for k,rbu,rse,volx,ema,req,cd in combos]
+
+def main():
+    need_cache()
+    combos = grid()
     print(f"Sweeping {len(combos)} combos on cached 15m data...")
 
     rows = []
-    for i,(k,rbu,rse,volx,ema,req,cd) in enumerate(combos,1):
-        env = {
-            "BB_K":k, "RSI_BUY_MAX":rbu, "RSI_SELL_MIN":rse,
-            "VOL_MA_N":20, "VOL_MULT":volx,
-            "EMA_TREND_N":ema, "REQUIRE_TREND":req,
-            "BB_COOLDOWN_BARS":cd,
-            "FEE_BPS":12.5, "SLIP_BPS":12.5,
-        }
+    for i,env in enumerate(combos,1):
         rows.append(run_once(env))
         if i % 20 == 0 or i == len(combos):
             print(f"{i}/{len(combos)} done...")
@@ -80,9 +90,13 @@ def main():
          f(r.get("max_drawdown_pct"), 1e9),
     ))
 
+    # bootstrap the winner's trades (src.robustness): re-run it with its trade list
+    from src import robustness
+    robustness.for_winners(rows, lambda r: run_once({**{k: r[k] for k in combos[0]}, "BT_TRADES": 1}))
+
     # write CSV
     keys = sorted({k for r in rows for k in r.keys()})
-    with OUTCSV.open("w", newline="", encoding="utf-8") as f:
+    with prof.stage("sweep.write"), OUTCSV.open("w", newline="", encoding="utf-8") as f:
         w = csv.DictWriter(f, fieldnames=keys); w.writeheader(); w.writerows(rows)
 
     print("\nTop 10 preview:")
@@ -98,8 +112,22 @@ def main():
             "EMA_TREND_N": r.get("EMA_TREND_N"),
             "REQ_TREND": r.get("REQUIRE_TREND"),
             "COOLDOWN": r.get("BB_COOLDOWN_BARS"),
+            "p_loss": r.get("robust_p_loss"),
         })
     print(f"\nWrote {OUTCSV}")
 
+    from src import results_db
+    sid = results_db.record(rows, "bb_atr", "SOLUSDT_15m_5000", name=OUTCSV.stem, source=OUTCSV)
+    print(f"Recorded sweep {sid} in {results_db.DB_PATH}")
+
+    if prof.ENABLED:
+        print("\nProfile (children summed):")
+        print(prof.format_table(prof.merge(PROFILES)))
+        print("\nProfile (sweep process):")
+        print(prof.format_table(prof.snapshot()))
+        prof_path = OUTCSV.with_suffix(".profile.json")
+        prof_path.write_text(json.dumps({"children": prof.merge(PROFILES), "sweep": prof.snapshot()}, indent=2))
+        print(f"Wrote {prof_path}")
+
 if __name__ == "__main__":
     main()
@@ -1,5 +1,9 @@
 import os, json, itertools, subprocess, time
 from pathlib import Path
+try:
+    from src import robustness, results_db
+except ModuleNotFoundError:  # run as `python3 src/sweep_4h_fast.py`
+    import robustness, results_db
 
 DATA_FILE = "data/SOLUSDT_4h_5000.json"
 OUT_CSV   = Path("data/backtests/sweep_4h_fast_"+time.strftime("%Y%m%d_%H%M%S")+".csv")
@@ -17,11 +21,8 @@ def run_once(env):
     out = subprocess.check_output(["python3", "src/backtest_hybrid.py"], env=e, timeout=90)
     return json.loads(out.decode())
 
-rows = []
-grid = list(itertools.product(Ks, EMAs, RSIs, CDs))
-total = len(grid)
-for i, (K, EMA, RSI, CD) in enumerate(grid, 1):
-    env = {
+def env_for(K, EMA, RSI, CD):
+    return {
         "DATA_FILE": DATA_FILE,
         "BB_SYMBOL":"SOLUSDT", "BB_INTERVAL":"4h", "BB_LIMIT":"5000",
         "BB_PERIOD":"20", "BB_K":str(K),
@@ -32,6 +33,12 @@ for i, (K, EMA, RSI, CD) in enumerate(grid, 1):
         "FEE_BPS_PER_SIDE":"12.5",
         "SLIP_BPS_PER_SIDE":"12.5",
     }
+
+rows = []
+grid = list(itertools.product(Ks, EMAs, RSIs, CDs))
+total = len(grid)
+for i, (K, EMA, RSI, CD) in enumerate(grid, 1):
+    env = env_for(K, EMA, RSI, CD)
     try:
         res = run_once(env)
         res.update({"BB_K":K, "EMA_N":EMA, "RSI_EXIT":RSI, "COOLDOWN_BARS":CD})
@@ -51,10 +58,15 @@ def keyf(r):
 
 rows.sort(key=keyf)
 
+# Bootstrap the winner's trades (src.robustness): re-run it with its trade list
+robustness.for_winners(rows, lambda r: run_once({
+    **env_for(r["BB_K"], r["EMA_N"], r["RSI_EXIT"], r["COOLDOWN_BARS"]), "BT_TRADES": "1"}))
+
 # Write CSV
 import pandas as pd
 keep = ["equity_multiple","win_rate_pct","trades","wins","losses",
-        "max_drawdown_pct","profit_factor","BB_K","EMA_N","RSI_EXIT","COOLDOWN_BARS"]
+        "max_drawdown_pct","profit_factor","BB_K","EMA_N","RSI_EXIT","COOLDOWN_BARS",
+        "robust_eq_lo","robust_eq_med","robust_p_loss","robust_p_ruin"]
 df = pd.DataFrame(rows)
 if df.empty:
     print("No sweep results captured. Check backtest_hybrid.py JSON output or env var names.")
@@ -64,5 +76,7 @@ else:
             df[col] = None
     df[keep].to_csv(OUT_CSV, index=False)
     print(f"WROTE: {OUT_CSV}")
+    sid = results_db.record(rows, "bb_atr", "SOLUSDT_4h_5000", name=OUT_CSV.stem, source=OUT_CSV)
+    print(f"Recorded sweep {sid} in {results_db.DB_PATH}")
     print("Top 10 preview:")
     print(df[keep].head(10).to_string(index=False))
@@ -27,16 +27,9 @@ df=df.dropna(subset=["close"]).sort_values("timestamp").reset_index(drop=True)
 df["ym"]=df["timestamp"].dt.strftime("%Y-%m")
 df["ret"]=df["close"].pct_change()
 
-# ==== Per-month stats (no deprecated warnings) ====
-# Only keep needed cols before groupby
-gdf = df[["ym","timestamp","close","ret"]].copy()
-def _mstat(g):
-    g=g.sort_values("timestamp")
-    bars=len(g)
-    vol = g["ret"].dropna().std(ddof=0) if bars>1 else 0.0
-    trend = (g["close"].iat[-1]/g["close"].iat[0]-1.0) if bars>0 else 0.0
-    return pd.Series({"vol":vol,"trend":trend,"bars":bars})
-mstats = gdf.groupby("ym", sort=True, group_keys=False).apply(_mstat).reset_index()
+# ==== Per-month stats (vectorized, shared with regime_pick) ====
+from src.regime_pick import month_stats
+mstats = month_stats(df)
 
 # ==== Module + runners ====
 bh=importlib.import_module("src.backtest_hybrid")
@@ -5,6 +5,8 @@ from solders.pubkey import Pubkey
 from solana.rpc.api import Client
 from solana.rpc.types import TokenAccountOpts
 
+from src.rpc_pool import pinned, pool
+
 USDC_MINT = Pubkey.from_string("EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v")
 
 def _env_path():
@@ -12,7 +14,7 @@ def _env_path():
 
 def load_env():
     load_dotenv(_env_path())
-    rpc = os.getenv("RPC_PRIMARY") or "https://api.mainnet-beta.solana.com"
+    rpc = pinned()
     key_path = os.getenv("KEYPAIR_PATH")
     return rpc, key_path
 
@@ -25,8 +27,9 @@ def load_keypair(path: str) -> Keypair:
         return Keypair.from_base58_string(raw)
     raise ValueError("Unsupported key format in keypair file")
 
-def client_for(rpc_url: str) -> Client:
-    return Client(rpc_url)
+def client_for(rpc_url: str | None = None) -> Client:
+    """Persistent pooled client for rpc_url (or the best healthy endpoint)."""
+    return pool().node(rpc_url).client if rpc_url else pool().client()
 
 def sol_balance_lamports(c: Client, pub: Pubkey) -> int:
     return c.get_balance(pub).value